@@ -0,0 +1,82 @@
+"""
+ランキングページ1枚あたりの文字コード判定とパースの CPU 時間を比べる。
+  旧: resp.encoding = resp.apparent_encoding（本文全体で推定）→ resp.text（str のコピー）→ BeautifulSoup(str)
+  新: _detect_encoding（BOM / Content-Type / 先頭の <meta charset>、宣言がなければ推定）→ BeautifulSoup(bytes, from_encoding)
+UTF-8 と Shift_JIS のページを、Content-Type に charset がある場合・ない場合（<meta> だけ）・どちらもない場合で測る。
+
+    python bench/bench_decode.py
+    python bench/bench_decode.py --pages 100
+"""
+import argparse
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+from ranking_fixture import page_html
+from main import _detect_encoding, _find_ranking_table, _soup_from_bytes
+
+
+def _response(body: bytes, content_type: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.headers["Content-Type"] = content_type
+    return resp
+
+
+def _legacy_soup(resp: requests.Response) -> BeautifulSoup:
+    """変更前の _get_soup（比較用）。"""
+    resp.encoding = resp.apparent_encoding or "utf-8"
+    return BeautifulSoup(resp.text, "html.parser")
+
+
+def _new_soup(resp: requests.Response) -> BeautifulSoup:
+    return _soup_from_bytes(resp.content, resp.headers.get("Content-Type"))
+
+
+def _cases() -> list[tuple[str, bytes, str]]:
+    utf8 = page_html(1)
+    sjis = utf8.replace('charset="utf-8"', 'charset="Shift_JIS"')
+    no_meta = utf8.replace('<meta charset="utf-8">', "")
+    return [
+        ("UTF-8 / header", utf8.encode("utf-8"), "text/html; charset=utf-8"),
+        ("UTF-8 / meta", utf8.encode("utf-8"), "text/html"),
+        ("UTF-8 / 宣言なし", no_meta.encode("utf-8"), "text/html"),
+        ("Shift_JIS / header", sjis.encode("cp932"), "text/html; charset=Shift_JIS"),
+        ("Shift_JIS / meta", sjis.encode("cp932"), "text/html"),
+    ]
+
+
+def _cpu_ms(fn, pages: int) -> float:
+    t0 = time.process_time()
+    for _ in range(pages):
+        fn()
+    return (time.process_time() - t0) / pages * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50, help="1ケースあたりのページ数")
+    args = parser.parse_args()
+
+    print(f"{'ケース':<20}{'判定':>14}{'旧 判定(ms)':>12}{'新 判定(ms)':>12}{'旧 全体(ms)':>12}{'新 全体(ms)':>12}")
+    for label, body, content_type in _cases():
+        encoding, source = _detect_encoding(body, content_type)
+        # 判定方法が変わっても読み取る表は同じであること
+        table_old, _ = _find_ranking_table(_legacy_soup(_response(body, content_type)))
+        table_new, _ = _find_ranking_table(_new_soup(_response(body, content_type)))
+        assert table_old.get_text() == table_new.get_text(), label
+        detect_old = _cpu_ms(lambda: _response(body, content_type).apparent_encoding, args.pages)
+        detect_new = _cpu_ms(lambda: _detect_encoding(body, content_type), args.pages)
+        total_old = _cpu_ms(lambda: _legacy_soup(_response(body, content_type)), args.pages)
+        total_new = _cpu_ms(lambda: _new_soup(_response(body, content_type)), args.pages)
+        print(
+            f"{label:<20}{source + ':' + encoding:>14}{detect_old:>10.2f}{detect_new:>12.2f}"
+            f"{total_old:>12.2f}{total_new:>12.2f}"
+        )
+    print(f"1ページ {len(_cases()[0][1]) / 1024:.0f} KiB（50行）あたりの CPU 時間")
+
+
+if __name__ == "__main__":
+    main()
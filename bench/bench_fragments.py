@@ -0,0 +1,299 @@
+"""
+ランキングページの操作ごとの応答時間を、実際の Streamlit サーバーにブラウザと同じ WebSocket で接続して測る。
+スタブサーバーから 9999 件を取得したあと、ページ移動・行の選択・既存リストへの追加・ソートの適用・絞り込みを
+繰り返し、操作ごとに「送信してから画面の更新が終わるまで」の時間・受信バイト数・スクリプト実行回数を表示する。
+フラグメント内のウィジェットはブラウザと同じくフラグメントIDを付けて再実行を依頼する。
+run_every 付きのフラグメント（取得ジョブの進捗）も、ブラウザと同じくサーバーから届いた間隔で再実行を依頼する。
+
+    python bench/bench_fragments.py                          # 現在の src/app.py
+    git show 7f60476:src/app.py > /tmp/app_before.py        # フラグメント化（user-043）の前の app.py
+    python bench/bench_fragments.py --app /tmp/app_before.py  # 変更前の app.py と比べる
+
+ベンチマーク用の依存パッケージ（websockets）が必要（pip install -r bench/requirements.txt）。
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+import ranking_fixture
+
+APP_PATH = ranking_fixture.SRC_DIR / "app.py"
+SERVER_START_TIMEOUT = 30.0
+FETCH_TIMEOUT = 300.0
+
+
+def _serve(app: str, port: str) -> None:
+    """サーバー側（子プロセス）: 取得のマナー待機をなくしてから streamlit run と同じ起動をする。"""
+    import main
+
+    main.REQUEST_INTERVAL = 0.0
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", app, "--server.headless", "true", "--server.port", port,
+        "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+    ]
+    cli.main()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BrowserSession:
+    """ブラウザの代わりにウィジェットの状態を持ち、再実行を依頼して画面の更新（ForwardMsg）を受け取る。"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets: dict[str, tuple[str, object, str]] = {}  # ウィジェットID → (種類, proto, フラグメントID)
+        self.states: dict[str, object] = {}  # ブラウザが送り続けるウィジェットの値
+        self.auto_reruns: dict[str, float] = {}  # run_every 付きフラグメントのID → 再実行の間隔（秒）
+
+    def run(self, widget_id: str | None = None, timeout: float = 60.0, fragment_id: str | None = None) -> dict:
+        """
+        再実行を依頼し、スクリプトが（サーバー側の st.rerun の連鎖も含めて）終わるまで待つ。
+        widget_id を渡すと、そのウィジェットのフラグメントだけの再実行として依頼する（ブラウザと同じ）。
+        fragment_id を渡すと、そのフラグメントだけの再実行を依頼する（run_every の自動再実行）。
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        if fragment_id is None:
+            fragment_id = self.widgets[widget_id][2] if widget_id is not None else ""
+        if not fragment_id:
+            # 画面全体の再実行では、描画されたフラグメントが自動再実行を登録し直す
+            self.auto_reruns.clear()
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        msg.rerun_script.fragment_id = fragment_id
+        # ボタンの押下は1回だけ送る
+        self.states = {k: v for k, v in self.states.items() if not v.HasField("trigger_value")}
+
+        t0 = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        received = runs = 0
+        seen = set()
+        deadline = time.time() + timeout
+        while True:
+            raw = self.ws.recv(timeout=max(0.1, deadline - time.time()))
+            received += len(raw)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                name = element.WhichOneof("type")
+                proto = getattr(element, name)
+                if getattr(proto, "id", ""):
+                    self.widgets.pop(proto.id, None)
+                    self.widgets[proto.id] = (name, proto, fwd.delta.fragment_id)
+                    seen.add(proto.id)
+            elif kind == "auto_rerun":
+                self.auto_reruns[fwd.auto_rerun.fragment_id] = fwd.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                for stopped in fwd.stop_auto_rerun.fragment_ids:
+                    self.auto_reruns.pop(stopped, None)
+            elif kind == "script_finished":
+                runs += 1
+                if fwd.script_finished != fwd.FINISHED_EARLY_FOR_RERUN:
+                    break
+        if not fragment_id:
+            # 画面全体の再実行で消えたウィジェットの値は、ブラウザと同じく送らない
+            self.widgets = {k: v for k, v in self.widgets.items() if k in seen}
+            self.states = {k: v for k, v in self.states.items() if k in seen}
+        return {"seconds": time.perf_counter() - t0, "bytes": received, "runs": runs}
+
+    def find(self, key: str | None = None, label: str | None = None, kind: str | None = None) -> str:
+        """キー（の接頭辞）・ラベル（の接頭辞）・種類でウィジェットIDを探す（最後に描画されたもの）。"""
+        for widget_id, (name, proto, _) in reversed(list(self.widgets.items())):
+            if kind and name != kind:
+                continue
+            if key and not widget_id.split("-", 2)[-1].startswith(key):
+                continue
+            if label and not getattr(proto, "label", "").startswith(label):
+                continue
+            return widget_id
+        raise LookupError(f"ウィジェットが見つかりません: key={key} label={label} kind={kind}")
+
+    def set(self, widget_id: str, value) -> None:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        name, proto, _ = self.widgets[widget_id]
+        state = WidgetState(id=widget_id)
+        if name in ("radio", "selectbox"):
+            # 新しい Streamlit は選択肢の文字列、古い版は位置で送る
+            if hasattr(proto, "raw_value"):
+                state.string_value = proto.options[value]
+            else:
+                state.int_value = value
+        elif name == "number_input":
+            if proto.data_type == proto.INT:
+                state.int_value = int(value)
+            else:
+                state.double_value = float(value)
+        elif name == "checkbox":
+            state.bool_value = bool(value)
+        elif name == "text_input":
+            state.string_value = value
+        elif name in ("arrow_data_frame", "dataframe"):
+            state.string_value = json.dumps({"selection": {"rows": [value], "columns": []}})
+        else:
+            raise ValueError(f"未対応のウィジェット: {name}")
+        self.states[widget_id] = state
+
+    def click(self, widget_id: str) -> None:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self.states[widget_id] = WidgetState(id=widget_id, trigger_value=True)
+
+    def has_table(self) -> bool:
+        return any(name in ("arrow_data_frame", "dataframe") for name, _, _ in self.widgets.values())
+
+    def wait_until(self, done, timeout: float) -> bool:
+        """
+        done() が真になるまで、run_every 付きのフラグメントをサーバーが指定した間隔で再実行する（ブラウザのタイマーと同じ）。
+        自動再実行がなくなったとき・timeout 秒を過ぎたときは done() の結果を返す。
+        """
+        deadline = time.time() + timeout
+        while not done():
+            if not self.auto_reruns or time.time() > deadline:
+                return done()
+            fragment_id, interval = min(self.auto_reruns.items(), key=lambda item: item[1])
+            time.sleep(interval)
+            self.run(fragment_id=fragment_id, timeout=max(1.0, deadline - time.time()))
+        return True
+
+
+def _fetch(session: BrowserSession, ranking_url: str) -> float:
+    """URLを直接入力して全ページ取得し、表が出るまでの秒数を返す。"""
+    session.run()
+    session.set(session.find(label="取得方法", kind="radio"), 1)
+    session.run()
+    session.set(session.find(label="ランキングURL", kind="text_input"), ranking_url)
+    session.set(session.find(key="fetch_all_pages"), True)
+    session.run()
+    fetch_button = next(
+        widget_id for widget_id, (name, proto, _) in session.widgets.items()
+        if name == "button" and proto.label == "ランキングを取得" and proto.type == "primary"
+    )
+    session.click(fetch_button)
+    t0 = time.perf_counter()
+    session.run(timeout=FETCH_TIMEOUT)
+    # 取得はバックグラウンドのジョブ。進捗のフラグメントが終了を見つけて画面全体を再実行するまで待つ
+    if not session.wait_until(session.has_table, FETCH_TIMEOUT):
+        raise RuntimeError("ランキングの表が表示されませんでした")
+    seconds = time.perf_counter() - t0
+    session.run()  # フラグメントの再実行の途中で描画された画面から、ウィジェットの一覧を揃え直す
+    return seconds
+
+
+def _interact(session: BrowserSession, rounds: int) -> dict[str, list[dict]]:
+    results: dict[str, list[dict]] = defaultdict(list)
+
+    def timed(op: str, widget_id: str) -> None:
+        results[op].append(session.run(widget_id))
+
+    # 行を選んで新規リストを作っておく（既存リストへの追加を測るため）
+    table = session.find(key="ranking_df_selection_")
+    session.set(table, 0)
+    session.run(table)
+    session.set(session.find(key="opt_new_name"), "ベンチマーク")
+    new_list = session.find(label="作成して追加", kind="button")
+    session.click(new_list)
+    session.run(new_list)
+
+    for r in range(rounds):
+        page = session.find(key="ranking_page")
+        session.set(page, r % 10 + 2)
+        timed("ページ移動", page)
+        table = session.find(key="ranking_df_selection_")
+        session.set(table, r % 20 + 1)
+        timed("行を選択", table)
+        add = session.find(label="追加", kind="button")
+        session.click(add)
+        timed("既存リストに追加", add)
+        table = session.find(key="ranking_df_selection_")
+        session.set(table, r % 20)
+        session.run(table)
+        session.set(session.find(key="sort_choice"), r % 4)
+        session.run(session.find(key="sort_choice"))
+        apply = session.find(key="sort_apply_btn")
+        session.click(apply)
+        timed("ソートを適用", apply)
+        y_min = session.find(key="y_min")
+        session.set(y_min, (r % 5) * 0.5)
+        timed("絞り込み", y_min)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default=str(APP_PATH), help="計測する app.py（変更前の版と比べるとき）")
+    parser.add_argument("--rounds", type=int, default=10, help="操作を繰り返す回数")
+    parser.add_argument("--rows", type=int, default=ranking_fixture.TOTAL_ROWS, help="スタブのランキング総件数")
+    parser.add_argument("--serve", nargs=2, metavar=("APP", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        _serve(*args.serve)
+        return
+
+    stub, ranking_url = ranking_fixture.start_stub_server(args.rows)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PORTFOLIO_DATA_DIR": tempfile.mkdtemp(prefix="bench_fragments_"),
+        "PYTHONPATH": os.pathsep.join([str(ranking_fixture.SRC_DIR), os.environ.get("PYTHONPATH", "")]),
+    }
+    server = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve", str(Path(args.app).resolve()), str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + SERVER_START_TIMEOUT
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("Streamlit サーバーが起動しませんでした")
+                time.sleep(0.2)
+        try:
+            from websockets.sync.client import connect
+        except ImportError as e:
+            raise ImportError("websockets が必要です（pip install -r bench/requirements.txt）") from e
+
+        with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+            session = BrowserSession(ws)
+            fetch_seconds = _fetch(session, ranking_url)
+            results = _interact(session, args.rounds)
+    finally:
+        server.terminate()
+        server.wait()
+        stub.shutdown()
+
+    print(f"app={args.app} rows={args.rows} rounds={args.rounds} 取得 {fetch_seconds:.1f}s")
+    print(f"{'操作':<12}{'p50(ms)':>10}{'平均(ms)':>10}{'受信(KB)':>10}{'実行回数':>8}")
+    for op, samples in results.items():
+        seconds = [s["seconds"] * 1000 for s in samples]
+        print(
+            f"{op:<12}{statistics.median(seconds):>10.1f}{statistics.fmean(seconds):>10.1f}"
+            f"{statistics.fmean(s['bytes'] for s in samples) / 1024:>10.1f}"
+            f"{statistics.fmean(s['runs'] for s in samples):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+_parse_table_rows の行の組み立て方式を比較する（9999行 = 200ページ分）。
+  旧: 行ごとに辞書を作り pd.DataFrame(list[dict]) でスキーマを推論
+  新: ページごとに決めた列スキーマで列リストへ追記し、列から DataFrame を作る（RowColumns）
+各方式のピークメモリ（tracemalloc）と所要時間を表示する。全体の時間は HTML の解析（BeautifulSoup）がほとんどを占めるため、
+行の組み立ての差は「組み立てのみ」（セル文字列 → DataFrame）の比較で見る。
+
+    python bench/bench_parse_rows.py
+"""
+import time
+import tracemalloc
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from ranking_fixture import HEADERS, PAGE_SIZE, TOTAL_ROWS, page_html, row_cells
+from main import (
+    _extract_code_from_name_cell,
+    _find_ranking_table,
+    _normalize_cell,
+    _parse_table_rows,
+    RowColumns,
+)
+
+
+def _legacy_parse_table_rows(table, header_texts: list) -> list[dict]:
+    """変更前の実装（比較用）。"""
+    rows_data = []
+    tbody = table.find("tbody") or table
+    for tr in tbody.find_all("tr"):
+        cells = tr.find_all(["td", "th"])
+        if not cells:
+            continue
+        cell_texts = [_normalize_cell(c.get_text()) for c in cells]
+        if cell_texts and cell_texts[0] == "順位":
+            continue
+        n = min(len(header_texts), len(cell_texts))
+        if n == 0:
+            continue
+        row_dict = {}
+        for i in range(n):
+            row_dict[header_texts[i] or f"col_{i}"] = cell_texts[i]
+        for i in range(n, len(cell_texts)):
+            row_dict[f"col_{i}"] = cell_texts[i]
+        symbol = ""
+        a = cells[0].find("a", href=True)
+        if a and "quote/" in a["href"]:
+            symbol = a["href"].rstrip("/").split("quote/")[-1].split("?")[0] or ""
+        if not symbol:
+            for i, h in enumerate(header_texts):
+                if "名称" in (h or "") and "コード" in (h or ""):
+                    code = _extract_code_from_name_cell(cell_texts[i] if i < len(cell_texts) else "")
+                    if code:
+                        symbol = f"{code}.T"
+                    break
+        row_dict["symbol"] = symbol
+        rows_data.append(row_dict)
+    return rows_data
+
+
+def _legacy(tables) -> pd.DataFrame:
+    all_rows: list[dict] = []
+    for table, headers in tables:
+        all_rows.extend(_legacy_parse_table_rows(table, headers))
+    return pd.DataFrame(all_rows)
+
+
+def _columnar(tables) -> pd.DataFrame:
+    merged = None
+    for table, headers in tables:
+        chunk = _parse_table_rows(table, headers)
+        if merged is None:
+            merged = chunk
+        else:
+            merged.extend(chunk)
+    return merged.to_frame()
+
+
+def _legacy_build(pages) -> pd.DataFrame:
+    all_rows: list[dict] = []
+    for headers, cell_rows in pages:
+        for cell_texts, symbol in cell_rows:
+            row_dict = {headers[i]: cell_texts[i] for i in range(len(headers))}
+            row_dict["symbol"] = symbol
+            all_rows.append(row_dict)
+    return pd.DataFrame(all_rows)
+
+
+def _columnar_build(pages) -> pd.DataFrame:
+    merged = None
+    for headers, cell_rows in pages:
+        chunk = RowColumns(headers)
+        for cell_texts, symbol in cell_rows:
+            chunk.append(cell_texts, symbol)
+        if merged is None:
+            merged = chunk
+        else:
+            merged.extend(chunk)
+    return merged.to_frame()
+
+
+def _measure(fn, tables, repeat: int = 3) -> tuple[pd.DataFrame, float, float]:
+    best = float("inf")
+    df = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = fn(tables)
+        best = min(best, time.perf_counter() - t0)
+    del df
+    tracemalloc.start()
+    df = fn(tables)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, best, peak / 1024 / 1024
+
+
+def main() -> None:
+    n_pages = -(-TOTAL_ROWS // PAGE_SIZE)
+    soups = [BeautifulSoup(page_html(p), "html.parser") for p in range(1, n_pages + 1)]
+    tables = [_find_ranking_table(soup) for soup in soups]
+
+    legacy_df, legacy_sec, legacy_mb = _measure(_legacy, tables)
+    col_df, col_sec, col_mb = _measure(_columnar, tables)
+    pd.testing.assert_frame_equal(legacy_df, col_df)
+
+    print(f"rows: {len(col_df)} / pages: {n_pages}")
+    print(f"{'方式':<10}{'時間(s)':>10}{'ピーク(MiB)':>14}")
+    print(f"{'legacy':<10}{legacy_sec:>10.3f}{legacy_mb:>14.2f}")
+    print(f"{'columnar':<10}{col_sec:>10.3f}{col_mb:>14.2f}")
+    print(f"時間 {col_sec / legacy_sec:.2f}x / ピークメモリ {col_mb / legacy_mb:.2f}x")
+
+    # HTML 解析を除いた「セル文字列 → DataFrame」の組み立て部分だけを比較
+    pages = []
+    for p in range(1, n_pages + 1):
+        start = (p - 1) * PAGE_SIZE
+        cell_rows = [(row_cells(i), f"{row_cells(i)[1].split()[1]}.T") for i in range(start, min(TOTAL_ROWS, start + PAGE_SIZE))]
+        pages.append((HEADERS, cell_rows))
+    legacy_df, legacy_sec, legacy_mb = _measure(_legacy_build, pages)
+    col_df, col_sec, col_mb = _measure(_columnar_build, pages)
+    pd.testing.assert_frame_equal(legacy_df, col_df)
+    print("\n[組み立てのみ]")
+    print(f"{'legacy':<10}{legacy_sec:>10.3f}{legacy_mb:>14.2f}")
+    print(f"{'columnar':<10}{col_sec:>10.3f}{col_mb:>14.2f}")
+    print(f"時間 {col_sec / legacy_sec:.2f}x / ピークメモリ {col_mb / legacy_mb:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+全ページ取得（既定 9999 件 = 200 ページ）のスループットを、パースの実行方法ごとに比べる。
+  逐次       : 1ページずつ取得してその場でパース（PAGE_FETCH_CONCURRENCY=1, PARSE_PROCESSES=0）
+  スレッド    : 取得を並行（--fetch-workers）、パースは各スレッドで（GIL のため1コア分しか進まない）
+  パイプライン : 取得スレッド → 上限付きキュー → プロセスプールでパース（PARSE_PROCESSES=1, 2, 4, ... CPU数まで）
+スタブサーバーから取得し、マナー待機（REQUEST_INTERVAL）は 0 にする。どの方式でも同じ DataFrame になることも確かめる。
+
+    python bench/bench_pipeline.py
+    python bench/bench_pipeline.py --rows 5000 --fetch-workers 8
+"""
+import argparse
+import os
+import time
+
+import ranking_fixture
+import main
+
+
+def _pull(url: str, limit: int, fetch_workers: int, processes: int):
+    main.clear_checkpoint()
+    main.PAGE_FETCH_CONCURRENCY = fetch_workers
+    main.PARSE_PROCESSES = processes
+    t0 = time.perf_counter()
+    df = main.hunt_high_dividend(url, limit)
+    return df, time.perf_counter() - t0
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=ranking_fixture.TOTAL_ROWS)
+    parser.add_argument("--fetch-workers", type=int, default=4, help="スレッド・パイプラインでの取得の並行数")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    main.REQUEST_INTERVAL = 0.0
+    server, url = ranking_fixture.start_stub_server(args.rows)
+    limit = min(args.rows, 9999)
+    setups = [("逐次", 1, 0), (f"スレッド×{args.fetch_workers}", args.fetch_workers, 0)]
+    processes = 1
+    while processes <= max(1, args.max_processes):
+        setups.append((f"パイプライン P={processes}", args.fetch_workers, processes))
+        processes *= 2
+
+    print(f"rows={limit} CPU={os.cpu_count()}")
+    print(f"{'方式':<18}{'時間(s)':>9}{'ページ/秒':>10}{'行/秒':>10}{'起動(s)':>9}  結果")
+    baseline = None
+    for label, fetch_workers, n_processes in setups:
+        startup = 0.0
+        if n_processes:
+            # プロセスプールの起動（spawn と import）は初回だけなので、別に測る
+            t0 = time.perf_counter()
+            _pull(url, 100, fetch_workers, n_processes)
+            startup = time.perf_counter() - t0
+        df, elapsed = _pull(url, limit, fetch_workers, n_processes)
+        report = main.get_fetch_report(df)
+        if baseline is None:
+            baseline = df
+        same = df.equals(baseline)
+        print(
+            f"{label:<18}{elapsed:>9.2f}{report.pages_fetched / elapsed:>10.1f}{len(df) / elapsed:>10.0f}"
+            f"{startup:>9.2f}  {'OK' if same and report.complete else 'NG'} ({report.summary()})"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run()
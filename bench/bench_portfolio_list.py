@@ -0,0 +1,99 @@
+"""
+My Portfolio 一覧の1回の描画にかかるデータ側の時間を比べる。
+  旧: load_portfolios() で全件を読み、並び替えの選択肢ごとに全件を sorted する
+  新: get_portfolio_index() から表示するページ（MP_PAGE_SIZE 件）だけを引く（保存先が変わっていなければ読み直さない）
+閲覧回数の加算（1件だけ変わる）の後の差分反映の時間も測る。どの並び・ページでも旧と同じ結果になることも確かめる。
+
+    python bench/bench_portfolio_list.py
+    python bench/bench_portfolio_list.py --portfolios 50000 --symbols 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import ranking_fixture  # noqa: F401  (src/ を import パスに追加する)
+
+# ポートフォリオの保存先は一時ディレクトリ（src のモジュールを import する前に設定する）
+os.environ.setdefault("PORTFOLIO_DATA_DIR", tempfile.mkdtemp(prefix="bench_portfolio_list_"))
+
+from portfolio_data import increment_view_count, load_portfolios, save_portfolios  # noqa: E402
+from portfolio_index import SORT_CREATED_AT, SORT_SYMBOLS, SORT_VIEW_COUNT, get_portfolio_index  # noqa: E402
+
+PAGE_SIZE = 20
+SORTS = [
+    (SORT_CREATED_AT, lambda p: p.get("created_at", "")),
+    (SORT_VIEW_COUNT, lambda p: p.get("view_count", 0)),
+    (SORT_SYMBOLS, lambda p: len(p.get("symbols") or [])),
+]
+
+
+def _make(n: int, max_symbols: int, rng: random.Random) -> list[dict]:
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"ポートフォリオ{i}",
+            "symbols": [f"銘柄{j}|{1300 + j}.T" for j in range(rng.randint(0, max_symbols))],
+            "created_at": (base + timedelta(minutes=rng.randint(0, 100000))).isoformat(),
+            "view_count": rng.randint(0, 50),
+        }
+        for i in range(n)
+    ]
+
+
+def _ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--portfolios", type=int, default=20000)
+    parser.add_argument("--symbols", type=int, default=30, help="1ポートフォリオあたりの最大銘柄数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    portfolios = _make(args.portfolios, args.symbols, rng)
+    save_portfolios(portfolios)
+    n_pages = max(1, args.portfolios // PAGE_SIZE)
+
+    def legacy(key_fn, descending, page):
+        ordered = sorted(load_portfolios(), key=key_fn, reverse=descending)
+        return ordered[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
+    t0 = time.perf_counter()
+    index = get_portfolio_index()
+    build = time.perf_counter() - t0
+    for key, key_fn in SORTS:
+        for descending in (True, False):
+            for page in (1, n_pages // 2, n_pages):
+                got = [p["id"] for p in index.page(key, descending, page, PAGE_SIZE)[0]]
+                assert got == [p["id"] for p in legacy(key_fn, descending, page)], (key, descending, page)
+
+    print(f"portfolios={args.portfolios} 最大銘柄数={args.symbols} 索引の作成 {build:.2f}s")
+    print(f"{'並び替え':<12}{'旧(ms)':>10}{'新(ms)':>10}")
+    for key, key_fn in SORTS:
+        page = rng.randint(1, n_pages)
+        old = _ms(lambda: legacy(key_fn, True, page), args.repeat)
+        new = _ms(lambda: get_portfolio_index().page(key, True, page, PAGE_SIZE), args.repeat)
+        print(f"{key:<12}{old:>10.1f}{new:>10.2f}")
+
+    def view_then_list():
+        increment_view_count(rng.choice(portfolios)["id"])
+        get_portfolio_index().page(SORT_VIEW_COUNT, True, 1, PAGE_SIZE)
+
+    print(f"閲覧回数の加算（保存）→ 一覧（読み直し + 差分反映）: {_ms(view_then_list, args.repeat):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
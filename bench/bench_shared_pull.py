@@ -0,0 +1,71 @@
+"""
+同じURLの取得に、件数の多い呼び出しが後から合流したときのリクエスト数を数える（スタブサーバーへのページ別の回数）。
+  合流: 先の取得（--leader 件）が保存したページは再利用し、続きのページだけを取得する（各ページ1回）
+  取り直し: 取得が終わった後の新しい呼び出しは、保存済みのページを使わずすべて取得し直す
+どちらも期待どおりでなければ AssertionError で止まる。
+
+    python bench/bench_shared_pull.py
+    python bench/bench_shared_pull.py --total 2000 --leader 200 --follower 1000
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from ranking_fixture import PAGE_SIZE, start_stub_server
+
+import main
+
+
+def _pages(n_rows: int) -> int:
+    return -(-n_rows // PAGE_SIZE)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=500)
+    parser.add_argument("--leader", type=int, default=100)
+    parser.add_argument("--follower", type=int, default=300)
+    parser.add_argument("--interval", type=float, default=0.2, help="REQUEST_INTERVAL（秒）")
+    args = parser.parse_args()
+
+    main.REQUEST_INTERVAL = args.interval
+    server, url = start_stub_server(args.total)
+    results = {}
+
+    def pull(name: str, limit: int) -> None:
+        t0 = time.perf_counter()
+        df = main.hunt_high_dividend(url, limit)
+        results[name] = (df, time.perf_counter() - t0)
+
+    leader = threading.Thread(target=pull, args=("leader", args.leader))
+    follower = threading.Thread(target=pull, args=("follower", args.follower))
+    leader.start()
+    time.sleep(args.interval / 2)  # 先の取得が始まってから合流する
+    follower.start()
+    leader.join()
+    follower.join()
+
+    hits = Counter(server.requested_pages)
+    print(f"合流: リクエスト {sum(hits.values())} 件（ページ別 {dict(sorted(hits.items()))}）")
+    for name in ("leader", "follower"):
+        df, sec = results[name]
+        report = main.get_fetch_report(df)
+        print(f"  {name:<9}{len(df):>6} 件 {sec:6.2f}s  取得 {report.pages_fetched} / 再利用 {report.pages_resumed} ページ")
+    follower_report = main.get_fetch_report(results["follower"][0])
+    assert len(results["follower"][0]) == min(args.follower, args.total)
+    assert all(n == 1 for n in hits.values()), f"同じページを2回以上取得しました: {hits}"
+    assert sum(hits.values()) == _pages(min(args.follower, args.total))
+    assert follower_report.pages_resumed == _pages(min(args.leader, args.total))
+
+    server.requested_pages.clear()
+    pull("again", args.follower)
+    hits = Counter(server.requested_pages)
+    report = main.get_fetch_report(results["again"][0])
+    print(f"取り直し: リクエスト {sum(hits.values())} 件  取得 {report.pages_fetched} / 再利用 {report.pages_resumed} ページ")
+    assert report.pages_resumed == 0 and sum(hits.values()) == _pages(min(args.follower, args.total))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,116 @@
+"""
+共有保存先（STATE_BACKEND_URL）を使って、複数のレプリカ（プロセス）から同時に書き込んでも
+ポートフォリオとランキングが食い違わないことを確かめ、1レプリカとのスループットを比べる。
+
+各レプリカは共有のポートフォリオに自分の銘柄を追加し、閲覧回数を加算し、ランキングを登録する。
+最後に「追加した銘柄がすべて残っているか」「閲覧回数の合計が合うか」「他のレプリカが登録したランキングを
+ハンドルから読めるか」を確認する。
+
+    python bench/bench_state_backend.py                      # SQLite 共有ファイル と JSON ファイル（ファイルロック）
+    python bench/bench_state_backend.py --replicas 8 --ops 300
+    python bench/bench_state_backend.py --redis redis://localhost:6379/15
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import ranking_fixture  # noqa: F401  (src/ を import パスに追加する)
+
+
+def _replica(idx: int, n_ops: int, shared_id: str, env: dict, file_path: str | None, start, handles, out) -> None:
+    """1レプリカ分の操作。環境変数を設定してから src のモジュールを読み込む。"""
+    os.environ.update(env)
+    import pandas as pd
+
+    from dataset_registry import get_registry
+    from portfolio_data import add_symbol_to_portfolio, increment_view_count, load_portfolios
+
+    registry = get_registry()
+    df = pd.DataFrame({"順位": [str(i) for i in range(1, 101)], "symbol": [f"{idx}{i:03d}.T" for i in range(100)]})
+    handles.put(registry.put(df, f"replica-{idx}"))
+    start.wait()
+    t0 = time.perf_counter()
+    for i in range(n_ops):
+        if i % 3 == 0:
+            add_symbol_to_portfolio(shared_id, f"R{idx}-{i}.T", f"レプリカ{idx}-{i}", file_path=file_path)
+        elif i % 3 == 1:
+            increment_view_count(shared_id, file_path=file_path)
+        else:
+            load_portfolios(file_path)
+    elapsed = time.perf_counter() - t0
+    out.put((time.time(), elapsed))
+
+
+def _run(label: str, n_replicas: int, n_ops: int, env: dict, file_path: str | None) -> float:
+    os.environ.update(env)
+    from portfolio_data import create_portfolio, load_portfolios
+
+    shared = create_portfolio(f"共有-{label}-{n_replicas}", file_path=file_path)
+    ctx = mp.get_context("spawn")
+    start, handles, out = ctx.Event(), ctx.Queue(), ctx.Queue()
+    procs = [
+        ctx.Process(target=_replica, args=(i, n_ops, shared["id"], env, file_path, start, handles, out))
+        for i in range(n_replicas)
+    ]
+    for p in procs:
+        p.start()
+    # 全レプリカの準備（import・ランキング登録）が済んでから一斉に開始する
+    replica_handles = [handles.get() for _ in procs]
+    t0 = time.time()
+    start.set()
+    results = [out.get() for _ in procs]
+    wall = max(end for end, _ in results) - t0
+    for p in procs:
+        p.join()
+
+    current = next(p for p in load_portfolios(file_path) if p["id"] == shared["id"])
+    expected_symbols = {f"R{i}-{j}.T" for i in range(n_replicas) for j in range(0, n_ops, 3)}
+    got_symbols = {s.split("|", 1)[-1] for s in current["symbols"]}
+    expected_views = n_replicas * len(range(1, n_ops, 3))
+    consistent = got_symbols == expected_symbols and current["view_count"] == expected_views
+
+    shared_datasets = "-"
+    if env.get("STATE_BACKEND_URL"):
+        from dataset_registry import DatasetRegistry
+        from state_backend import get_backend
+
+        # このプロセスには登録していないハンドルを、共有保存先から読めるか
+        reader = DatasetRegistry(backend=get_backend())
+        shared_datasets = f"{sum(reader.get(h) is not None for h in replica_handles)}/{len(replica_handles)}"
+
+    total_ops = n_replicas * n_ops
+    print(
+        f"{label:<8}{n_replicas:>9}{total_ops:>8}{wall:>9.2f}{total_ops / wall:>11.0f}"
+        f"{max(e for _, e in results):>12.2f}  {'OK' if consistent else 'NG'}"
+        f" (銘柄 {len(got_symbols)}/{len(expected_symbols)}, 閲覧 {current['view_count']}/{expected_views}, 共有ランキング {shared_datasets})"
+    )
+    return total_ops / wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=150, help="レプリカごとの操作数（追加・閲覧・一覧を順に繰り返す）")
+    parser.add_argument("--redis", default=None, help="Redis の URL（指定時のみ計測）")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench_state_"))
+    setups = [
+        ("sqlite", {"STATE_BACKEND_URL": f"sqlite:///{work / 'state.db'}"}, None),
+        ("json", {"STATE_BACKEND_URL": ""}, str(work / "portfolios.json")),
+    ]
+    if args.redis:
+        setups.insert(1, ("redis", {"STATE_BACKEND_URL": args.redis}, None))
+
+    print(f"{'保存先':<6}{'レプリカ':>8}{'操作数':>8}{'時間(s)':>9}{'操作/秒':>10}{'最遅(s)':>10}  整合性")
+    for label, env, file_path in setups:
+        single = _run(label, 1, args.ops, env, file_path)
+        multi = _run(label, args.replicas, args.ops, env, file_path)
+        print(f"  → {args.replicas} レプリカ合計のスループットは 1 レプリカの {multi / single:.2f} 倍")
+
+
+if __name__ == "__main__":
+    main()
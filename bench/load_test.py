@@ -0,0 +1,165 @@
+"""
+同時に使うユーザー数の目安を測る負荷試験。
+アプリと同じく1プロセス内のスレッドを「セッション」とみなし、各セッションが
+ランキング取得（ローカルのスタブサーバーから）→ 絞り込み → 並び替え → 検索 → ページ表示 →
+ポートフォリオへの追加 → 閲覧回数の加算 を繰り返す。
+操作ごとのスループットと p50 / p95 / p99 レイテンシ、プロセスのピーク RSS を表示する。
+
+    python bench/load_test.py                         # 20 セッション × 10 ラウンド、1セッション 500 件取得
+    python bench/load_test.py --sessions 50 --rounds 20 --limit 2000 --urls 5
+    python bench/load_test.py --interval 0.05          # 取得のマナー待機を短く入れて、待機込みで測る
+
+--urls はセッションが取得するランキングURLの種類数（同じURLは取得が1回にまとめられ、チェックポイントも共有される）。
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import ranking_fixture
+
+# ポートフォリオの保存先は一時ディレクトリ（src のモジュールを import する前に設定する）
+os.environ.setdefault("PORTFOLIO_DATA_DIR", tempfile.mkdtemp(prefix="load_test_"))
+
+import numpy as np  # noqa: E402
+
+import main  # noqa: E402
+from dataset_registry import get_registry  # noqa: E402
+from facet_index import FACET_MARKET, FACET_SETTLEMENT, FacetIndex  # noqa: E402
+from portfolio_data import add_symbol_to_portfolio, create_portfolio, increment_view_count, load_portfolios  # noqa: E402
+from ranking_view import build_row_labels, get_page  # noqa: E402
+from search_index import RankingSearch  # noqa: E402
+from sort_index import SortIndex  # noqa: E402
+
+SORT_CHOICES = [("配当利回り", False), ("順位", True), ("名称・コード・市場", True), ("1株配当", False), ("取引値", True)]
+SEARCH_WORDS = ["会社1", "12", "東証", "7", "会社99"]
+
+
+def _peak_rss_mib() -> float:
+    """このプロセスのピーク RSS（Linux の ru_maxrss は KiB）。"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Recorder:
+    """操作名 → レイテンシ（秒）の一覧。スレッドセーフ。"""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timed(self, op: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors[op] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.samples[op].append(elapsed)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _session(idx: int, args, urls: list[str], rec: Recorder, start: threading.Event) -> None:
+    rng = random.Random(idx)
+    sid = f"load-{idx}"
+    registry = get_registry()
+    portfolio = create_portfolio(f"負荷試験 {idx}")
+    start.wait()
+
+    df = rec.timed("fetch", main.hunt_high_dividend, urls[idx % len(urls)], args.limit)
+    if df.empty:
+        rec.errors["fetch"] += 1
+        return
+    handle = rec.timed("register", registry.put, df, sid)
+    for _ in range(args.rounds):
+        data = registry.get(handle, sid)
+        facets = rec.timed("index", registry.derived, handle, "facet_index", FacetIndex.build)
+        markets = facets.options(FACET_MARKET)
+        months = facets.options(FACET_SETTLEMENT)
+        mask = rec.timed(
+            "filter",
+            facets.filter_mask,
+            yield_min=rng.choice([None, 1.0, 3.0]),
+            markets=rng.sample(markets, k=min(2, len(markets))) if markets and rng.random() < 0.5 else None,
+            settlement_months=[rng.choice(months)] if months and rng.random() < 0.3 else None,
+        )
+        sorter = rec.timed("index", registry.derived, handle, "sort_index", SortIndex.build)
+        col, asc = rng.choice(SORT_CHOICES)
+        if sorter.supports(col):
+            positions = rec.timed("sort", sorter.order, mask, col, asc)
+        else:
+            positions = np.flatnonzero(mask)
+        if rng.random() < 0.3:
+            search = rec.timed("index", registry.derived, handle, "search_index", RankingSearch)
+            hits = rec.timed("search", search.positions, rng.choice(SEARCH_WORDS))
+            positions = positions[np.isin(positions, hits)]
+        view = data.iloc[positions]
+        page_df = rec.timed("page", get_page, view, rng.randint(1, max(1, len(view) // 50)), 50)
+        rec.timed("page", build_row_labels, page_df)
+        if not page_df.empty:
+            row = page_df.iloc[rng.randrange(len(page_df))]
+            rec.timed("add_to_portfolio", add_symbol_to_portfolio, portfolio["id"], row["symbol"], str(row["名称・コード・市場"]))
+        rec.timed("view_count", increment_view_count, portfolio["id"])
+        rec.timed("list_portfolios", load_portfolios)
+    registry.release(handle, sid)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10, help="セッションごとの操作ラウンド数（取得は最初の1回）")
+    parser.add_argument("--limit", type=int, default=500, help="各セッションの取得件数")
+    parser.add_argument("--rows", type=int, default=ranking_fixture.TOTAL_ROWS, help="スタブのランキング総件数")
+    parser.add_argument("--urls", type=int, default=0, help="ランキングURLの種類数（0 = セッションごとに別URL）")
+    parser.add_argument("--interval", type=float, default=0.0, help="リクエスト前のマナー待機秒数（本番は1秒）")
+    args = parser.parse_args()
+
+    main.REQUEST_INTERVAL = args.interval
+    server, base_url = ranking_fixture.start_stub_server(args.rows)
+    n_urls = args.urls or args.sessions
+    urls = [f"{base_url}?variant={i}" for i in range(n_urls)]
+
+    rec = Recorder()
+    start = threading.Event()
+    threads = [threading.Thread(target=_session, args=(i, args, urls, rec, start)) for i in range(args.sessions)]
+    for t in threads:
+        t.start()
+    t0 = time.perf_counter()
+    start.set()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    server.shutdown()
+
+    print(
+        f"sessions={args.sessions} rounds={args.rounds} limit={args.limit} urls={n_urls} "
+        f"interval={args.interval}s wall={wall:.2f}s"
+    )
+    print(f"{'操作':<18}{'件数':>7}{'件/秒':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'エラー':>7}")
+    total = 0
+    for op, values in rec.samples.items():
+        total += len(values)
+        print(
+            f"{op:<18}{len(values):>7}{len(values) / wall:>9.1f}"
+            f"{_percentile(values, 50) * 1000:>10.1f}{_percentile(values, 95) * 1000:>10.1f}"
+            f"{_percentile(values, 99) * 1000:>10.1f}{rec.errors.get(op, 0):>7}"
+        )
+    all_values = [v for op, values in rec.samples.items() if op != "fetch" for v in values]
+    print(f"全操作（取得を除く） p50={statistics.median(all_values) * 1000:.1f}ms / 合計 {total / wall:.1f} 件/秒")
+    print(f"ピーク RSS: {_peak_rss_mib():.1f} MiB / 共有データセット: {get_registry().stats()}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,86 @@
+"""
+ベンチマーク用の合成ランキングページと、ローカルで配信するスタブサーバー。
+Yahoo!ファイナンスのランキング表と同じ列構成（順位 / 名称・コード・市場 / 取引値 / 決算年月 / 1株配当 / 配当利回り / 掲示板）を返す。
+"""
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# bench/ から src/ のモジュールを import できるようにする
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+PAGE_SIZE = 50
+TOTAL_ROWS = 9999
+HEADERS = ["順位", "名称・コード・市場", "取引値", "決算年月", "1株配当", "配当利回り", "掲示板"]
+MARKETS = ["東証PRM", "東証STD", "東証グロース", "名証MN", "福証"]
+
+
+def row_cells(i: int) -> list[str]:
+    """i 番目（0始まり）の行のセル文字列。"""
+    code = 1300 + i % 8600
+    return [
+        str(i + 1),
+        f"銘柄{i} {code} {MARKETS[i % len(MARKETS)]}",
+        f"{(i * 37) % 5000 + 100:,} 15:00",
+        f"2025/{i % 12 + 1:02d}",
+        f"{(i * 7) % 300}.00",
+        f"+{(i * 13) % 900 / 100:.2f}%",
+        "掲示板",
+    ]
+
+
+def page_html(page: int, total: int = TOTAL_ROWS, page_size: int = PAGE_SIZE) -> str:
+    """page ページ目（1始まり）のHTML。範囲外のページは表なしのHTMLを返す。"""
+    start = (page - 1) * page_size
+    end = min(total, start + page_size)
+    if start >= total:
+        return "<html><body><p>該当するデータがありません</p></body></html>"
+    body_rows = []
+    for i in range(start, end):
+        cells = row_cells(i)
+        code = cells[1].split()[1]
+        first = f'<td><a href="https://finance.yahoo.co.jp/quote/{code}.T">{cells[0]}</a></td>'
+        body_rows.append("<tr>" + first + "".join(f"<td>{c}</td>" for c in cells[1:]) + "</tr>")
+    head = "".join(f"<th>{h}</th>" for h in HEADERS)
+    return (
+        '<html><head><meta charset="utf-8"><title>配当利回りランキング</title></head><body>'
+        f"<p>{start + 1}～{end}件 / {total:,}件中</p>"
+        f"<table><thead><tr>{head}</tr></thead><tbody>{''.join(body_rows)}</tbody></table>"
+        "</body></html>"
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    total = TOTAL_ROWS
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query.get("page", ["1"])[0])
+        with self.server.lock:
+            self.server.requested_pages.append(page)
+        body = page_html(page, self.total).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(total: int = TOTAL_ROWS) -> tuple[ThreadingHTTPServer, str]:
+    """
+    スタブサーバーをバックグラウンドで起動し、(server, ランキングURL) を返す。
+    受けたリクエストのページ番号は server.requested_pages に順に記録する。
+    """
+    handler = type("Handler", (_Handler,), {"total": total})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.requested_pages = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/stocks/ranking/dividendYield"
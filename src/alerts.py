@@ -0,0 +1,398 @@
+"""
+ポートフォリオ銘柄のアラート（配当利回りが閾値をまたいだ・上位N位に入った／外れた）。
+ルールはポートフォリオと同じ場所（alerts.json、または STATE_BACKEND_URL の共有保存先）に保存し、銘柄コードで索引する。
+ランキングを取得するたびに、取得元ごとの前回のスナップショット（銘柄 → 順位・利回り）と比べて
+変わった銘柄だけをルールと照合し、発火したアラートを出力先（NDJSON ファイル・Webhook）に送る。
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import requests
+
+from main import parse_numeric_series
+from portfolio_analytics import entry_code, normalize_code
+from portfolio_data import DEFAULT_PATH, _ensure_dir, _file_lock, _shared_backend, load_portfolios
+from state_backend import SQLiteBackend, StateBackend, get_backend
+
+ALERT_YIELD_ABOVE = "yield_above"  # 配当利回りが閾値以上になった
+ALERT_YIELD_BELOW = "yield_below"  # 配当利回りが閾値を下回った
+ALERT_ENTER_TOP = "enter_top"  # 上位N位に入った
+ALERT_LEAVE_TOP = "leave_top"  # 上位N位から外れた
+ALERT_KIND_LABELS = {
+    ALERT_YIELD_ABOVE: "配当利回りが {threshold}% 以上になった",
+    ALERT_YIELD_BELOW: "配当利回りが {threshold}% を下回った",
+    ALERT_ENTER_TOP: "上位 {threshold} 位に入った",
+    ALERT_LEAVE_TOP: "上位 {threshold} 位から外れた",
+}
+RANK_KINDS = (ALERT_ENTER_TOP, ALERT_LEAVE_TOP)
+
+ALERT_RULES_PATH = DEFAULT_PATH.parent / "alerts.json"
+ALERT_LOG_PATH = DEFAULT_PATH.parent / "alerts.ndjson"  # FileSink の既定の出力先
+ALERT_STATE_PATH = DEFAULT_PATH.parent / "alert_state.db"  # STATE_BACKEND_URL 未設定時のスナップショット
+ALERT_WEBHOOK_ENV = "ALERT_WEBHOOK_URL"  # 設定すると発火したアラートをこの URL にも POST する
+ALERT_RULES_KEY = "alert_rules"  # 共有保存先でのキー
+SNAPSHOT_KEY_PREFIX = "alert_snapshot:"
+WEBHOOK_TIMEOUT = 5.0
+LOG_READ_BLOCK = 64 * 1024  # recent_alerts がログを末尾から読むときのブロックサイズ（バイト）
+
+
+# --- ルールの保存（portfolio_data と同じく、共有保存先があればそちら、なければ JSON ファイル） ---
+
+def _rules_path(file_path: Path | str | None) -> Path:
+    return Path(file_path) if file_path else ALERT_RULES_PATH
+
+
+def _decode_rules(value: bytes | str | None) -> dict:
+    if not value:
+        return {"revision": 0, "rules": []}
+    try:
+        data = json.loads(value)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {"revision": 0, "rules": []}
+    return {"revision": int(data.get("revision", 0)), "rules": list(data.get("rules") or [])}
+
+
+def _encode_rules(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _load_rules_data(file_path: Path | str | None = None) -> dict:
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        return _decode_rules(backend.get(ALERT_RULES_KEY))
+    path = _rules_path(file_path)
+    try:
+        return _decode_rules(path.read_bytes())
+    except OSError:
+        return {"revision": 0, "rules": []}
+
+
+def _mutate_rules(fn: Callable[[list[dict]], tuple[bool, object]], file_path: Path | str | None = None):
+    """ルール一覧の読み取り→変更→保存を、他のプロセスの変更と重ならないように行う。変更のたびに revision を1増やす。"""
+    result = None
+
+    def _apply(data: dict) -> bool:
+        nonlocal result
+        changed, result = fn(data["rules"])
+        if changed:
+            data["revision"] += 1
+        return changed
+
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        def _update(old: bytes | None) -> bytes | None:
+            data = _decode_rules(old)
+            return _encode_rules(data) if _apply(data) else None
+
+        backend.update(ALERT_RULES_KEY, _update)
+        return result
+    path = _rules_path(file_path)
+    with _file_lock(path):
+        data = _load_rules_data(file_path)
+        if _apply(data):
+            _ensure_dir(path)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(path)
+    return result
+
+
+def load_alert_rules(portfolio_id: str | None = None, file_path: Path | str | None = None) -> list[dict]:
+    """
+    アラートのルール一覧（portfolio_id を渡すとそのポートフォリオの分だけ）。
+    各要素: {"id", "portfolio_id", "kind", "threshold", "symbol"（None = ポートフォリオの全銘柄）, "created_at"}
+    """
+    rules = _load_rules_data(file_path)["rules"]
+    return [r for r in rules if portfolio_id is None or r.get("portfolio_id") == portfolio_id]
+
+
+def add_alert_rule(
+    portfolio_id: str,
+    kind: str,
+    threshold: float,
+    symbol: str | None = None,
+    file_path: Path | str | None = None,
+) -> dict:
+    """ルールを追加して返す。順位のルールの閾値は整数（N位）に丸める。"""
+    if kind not in ALERT_KIND_LABELS:
+        raise ValueError(f"未対応のアラート種別: {kind}")
+    rule = {
+        "id": str(uuid.uuid4()),
+        "portfolio_id": portfolio_id,
+        "kind": kind,
+        "threshold": int(threshold) if kind in RANK_KINDS else float(threshold),
+        "symbol": normalize_code(symbol) if symbol else None,
+        "created_at": datetime.now().isoformat(),
+    }
+
+    def _apply(rules):
+        rules.append(rule)
+        return True, rule
+
+    return _mutate_rules(_apply, file_path)
+
+
+def delete_alert_rule(rule_id: str, file_path: Path | str | None = None) -> bool:
+    """ルールを削除する。"""
+    def _apply(rules):
+        kept = [r for r in rules if r.get("id") != rule_id]
+        if len(kept) == len(rules):
+            return False, False
+        rules[:] = kept
+        return True, True
+
+    return _mutate_rules(_apply, file_path)
+
+
+def describe_rule(rule: dict) -> str:
+    """一覧表示用のルールの説明。"""
+    text = ALERT_KIND_LABELS[rule["kind"]].format(threshold=rule["threshold"])
+    return f"{rule['symbol']}: {text}" if rule.get("symbol") else f"全銘柄: {text}"
+
+
+# --- 銘柄コード → ルールの索引 ---
+
+_index_lock = threading.Lock()
+_index_cache: tuple[tuple, dict] | None = None
+
+
+def build_rule_index(rules: list[dict], portfolios: list[dict]) -> dict[str, list[tuple[dict, dict]]]:
+    """銘柄コード → [(ルール, ポートフォリオ)]。ポートフォリオ全体のルールは登録銘柄ごとに展開する。"""
+    by_id = {p.get("id"): p for p in portfolios}
+    index: dict[str, list[tuple[dict, dict]]] = {}
+    for rule in rules:
+        p = by_id.get(rule.get("portfolio_id"))
+        if p is None:
+            continue  # 削除済みのポートフォリオのルール
+        codes = {entry_code(s) for s in p.get("symbols") or []}
+        if rule.get("symbol"):
+            codes &= {rule["symbol"]}
+        for code in codes:
+            if code:
+                index.setdefault(code, []).append((rule, p))
+    return index
+
+
+def _rule_index(rules_data: dict, portfolios: list[dict]) -> dict[str, list[tuple[dict, dict]]]:
+    """ルールの revision とポートフォリオの登録銘柄が変わらない間は、前回の索引を使う。"""
+    global _index_cache
+    key = (rules_data["revision"], tuple((p.get("id"), p.get("name"), tuple(p.get("symbols") or ())) for p in portfolios))
+    with _index_lock:
+        if _index_cache is not None and _index_cache[0] == key:
+            return _index_cache[1]
+    index = build_rule_index(rules_data["rules"], portfolios)
+    with _index_lock:
+        _index_cache = (key, index)
+    return index
+
+
+# --- ランキングのスナップショットと差分 ---
+
+_state: StateBackend | None = None
+_state_lock = threading.Lock()
+
+
+def _state_backend() -> StateBackend:
+    """スナップショットの保存先。共有保存先があればそれを使い、なければデータフォルダの SQLite。"""
+    global _state
+    backend = get_backend()
+    if backend is not None:
+        return backend
+    with _state_lock:
+        if _state is None:
+            _state = SQLiteBackend(ALERT_STATE_PATH)
+        return _state
+
+
+def ranking_state(df: pd.DataFrame) -> dict[str, list]:
+    """ランキングを 銘柄コード → [順位, 配当利回り, 名称] に変換する（順位の列がなければ行の位置）。"""
+    if df is None or df.empty or "symbol" not in df.columns:
+        return {}
+    codes = df["symbol"].astype(str).map(normalize_code).to_numpy()
+    if "順位" in df.columns:
+        ranks = parse_numeric_series(df["順位"]).to_numpy()
+        ranks = np.where(np.isnan(ranks), np.arange(1, len(df) + 1), ranks)
+    else:
+        ranks = np.arange(1, len(df) + 1)
+    yield_col = next((c for c in df.columns if "配当利回り" in str(c)), None)
+    yields = parse_numeric_series(df[yield_col]).to_numpy() if yield_col is not None else np.full(len(df), np.nan)
+    name_col = next((c for c in df.columns if "名称" in str(c)), None)
+    names = df[name_col].astype(str).to_numpy() if name_col is not None else codes
+    state: dict[str, list] = {}
+    for code, rank, y, name in zip(codes, ranks, yields, names):
+        if code and code not in state:
+            state[code] = [int(rank), None if np.isnan(y) else float(y), name]
+    return state
+
+
+def _in_yield_range(kind: str, threshold, entry: list | None) -> bool:
+    if entry is None or entry[1] is None:
+        return False
+    return entry[1] >= threshold if kind == ALERT_YIELD_ABOVE else entry[1] < threshold
+
+
+def _crossed(kind: str, threshold, old: list | None, new: list | None, old_rows: int, new_rows: int) -> bool:
+    """
+    前回 → 今回で、ルールの条件をまたいだか。上位N位の判定は、その回のランキングが N 件以上あるときだけ行う。
+    前回のランキングにいなかった（利回りがなかった）銘柄は条件の外にいたとみなすので、
+    閾値を超えた状態で新しく現れた銘柄にも利回りのルールが発火する。
+    """
+    if kind in (ALERT_YIELD_ABOVE, ALERT_YIELD_BELOW):
+        return _in_yield_range(kind, threshold, new) and not _in_yield_range(kind, threshold, old)
+    old_in = old is not None and old[0] <= threshold
+    new_in = new is not None and new[0] <= threshold
+    if old_rows < threshold or new_rows < threshold:
+        return False
+    return new_in and not old_in if kind == ALERT_ENTER_TOP else old_in and not new_in
+
+
+def _alert_event(rule: dict, portfolio: dict, code: str, old: list | None, new: list | None, source: str) -> dict:
+    name = (new or old)[2]
+    text = ALERT_KIND_LABELS[rule["kind"]].format(threshold=rule["threshold"])
+    if rule["kind"] in RANK_KINDS:
+        detail = f"{old[0] if old else '圏外'}位 → {new[0] if new else '圏外'}位"
+    else:
+        detail = " → ".join("圏外" if e is None or e[1] is None else f"{e[1]:.2f}%" for e in (old, new))
+    return {
+        "fired_at": datetime.now().isoformat(),
+        "rule_id": rule["id"],
+        "portfolio_id": portfolio.get("id"),
+        "portfolio_name": portfolio.get("name", ""),
+        "symbol": code,
+        "name": name,
+        "kind": rule["kind"],
+        "threshold": rule["threshold"],
+        "old": old[:2] if old else None,
+        "new": new[:2] if new else None,
+        "source": source,
+        "message": f"［{portfolio.get('name', '')}］{name}: {text}（{detail}）",
+    }
+
+
+class FileSink:
+    """アラートを NDJSON（1行1件）でファイルに追記する。"""
+
+    def __init__(self, path: Path | str = ALERT_LOG_PATH):
+        self.path = Path(path)
+
+    def emit(self, events: list[dict]) -> None:
+        if not events:
+            return
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        with _file_lock(self.path):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+class WebhookSink:
+    """アラートを JSON（{"alerts": [...]}）で URL に POST する。"""
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, events: list[dict]) -> None:
+        if events:
+            requests.post(self.url, json={"alerts": events}, timeout=self.timeout).raise_for_status()
+
+
+def default_sinks() -> list:
+    """既定の出力先: ALERT_LOG_PATH への NDJSON と、ALERT_WEBHOOK_URL があればその Webhook。"""
+    sinks: list = [FileSink()]
+    url = os.environ.get(ALERT_WEBHOOK_ENV, "").strip()
+    if url:
+        sinks.append(WebhookSink(url))
+    return sinks
+
+
+def check_ranking(
+    df: pd.DataFrame,
+    source: str,
+    sinks: list | None = None,
+    portfolios: list[dict] | None = None,
+    rules_file: Path | str | None = None,
+) -> dict:
+    """
+    取得したランキングを取得元 source の前回のスナップショットと比べ、変わった銘柄だけをルールと照合する。
+    発火したアラートを sinks（既定は default_sinks()）に送り、
+    {"baseline": 前回がなかったか, "rows", "changed": 変わった銘柄数, "checked": 照合したルール数, "fired": [...], "errors": [...]} を返す。
+    前回のスナップショットがない取得元では、今回の内容を基準として保存するだけで発火しない。
+    """
+    rules_data = _load_rules_data(rules_file)
+    index = _rule_index(rules_data, load_portfolios() if portfolios is None else portfolios)
+    new_state = ranking_state(df)
+    new_rows = len(df) if df is not None else 0
+    result = {"baseline": False, "rows": new_rows, "changed": 0, "checked": 0, "fired": [], "errors": []}
+
+    def _diff(old_value: bytes | None) -> bytes:
+        # 差分の計算とスナップショットの置き換えを不可分に行う（同じ取得元を同時に更新しても二重に発火しない）
+        result.update(changed=0, checked=0, fired=[])
+        if not old_value:
+            result["baseline"] = True
+        else:
+            old = json.loads(old_value)
+            old_state, old_rows = old["state"], old["rows"]
+            changed = [c for c, v in new_state.items() if old_state.get(c, [None, None])[:2] != v[:2]]
+            changed += [c for c in old_state if c not in new_state]
+            result["changed"] = len(changed)
+            for code in changed:
+                for rule, portfolio in index.get(code, ()):
+                    result["checked"] += 1
+                    before, after = old_state.get(code), new_state.get(code)
+                    if _crossed(rule["kind"], rule["threshold"], before, after, old_rows, new_rows):
+                        result["fired"].append(_alert_event(rule, portfolio, code, before, after, source))
+        return json.dumps({"rows": new_rows, "state": new_state}, ensure_ascii=False).encode("utf-8")
+
+    _state_backend().update(SNAPSHOT_KEY_PREFIX + source, _diff)
+    for sink in default_sinks() if sinks is None else sinks:
+        try:
+            sink.emit(result["fired"])
+        except (OSError, requests.RequestException) as e:
+            result["errors"].append(f"{type(sink).__name__}: {e}")
+    return result
+
+
+def recent_alerts(portfolio_id: str | None = None, limit: int = 20, path: Path | str = ALERT_LOG_PATH) -> list[dict]:
+    """FileSink に出力したアラートの新しい順 limit 件（portfolio_id を渡すとそのポートフォリオの分だけ）。"""
+    path = Path(path)
+    if not path.exists() or limit <= 0:
+        return []
+    recent: list[dict] = []
+    for line in _lines_from_end(path):
+        try:
+            event = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if portfolio_id is None or event.get("portfolio_id") == portfolio_id:
+            recent.append(event)
+            if len(recent) >= limit:
+                break
+    return recent
+
+
+def _lines_from_end(path: Path, block_size: int = LOG_READ_BLOCK):
+    """ファイルの行を末尾から順に返す（ブロック単位で後ろから読むので、ログ全体は読まない）。"""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)  # 行の途中から読んだかもしれないので、先頭の断片は次のブロックとつなげる
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if tail.strip():
+            yield tail
@@ -1,17 +1,66 @@
 """
 High-Dividend Hunter: Streamlit Web UI
 """
+import collections.abc
+import csv
+import hashlib
+import io
 import re
+import typing
+import numpy as np
+import pandas as pd
 import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from main import (
     hunt_high_dividend,
     DEFAULT_URL,
     get_site_names,
     get_url_by_site_name,
-    apply_ranking_filters,
     search_site_candidates,
+    validate_site_candidates,
     NAMED_SITES,
-    get_unique_markets,
+    hunt_multiple_sites,
+    merge_site_rankings,
+    get_fetch_report,
+)
+from ranking_view import (
+    PAGE_SIZE_OPTIONS,
+    page_count,
+    get_page,
+    build_row_labels,
+    find_rank_page,
+    search_rows,
+)
+from dataset_registry import get_registry
+from enrichment import ENRICH_FIELDS, enrich_ranking
+from alerts import (
+    ALERT_KIND_LABELS,
+    RANK_KINDS,
+    add_alert_rule,
+    check_ranking,
+    delete_alert_rule,
+    describe_rule,
+    load_alert_rules,
+    recent_alerts,
+)
+from jobs import DONE, FAILED, QUEUED, CANCELLED, Job, get_job_manager
+from facet_index import (
+    FacetIndex,
+    FACET_BENEFIT,
+    FACET_INDUSTRY,
+    FACET_MARKET,
+    FACET_SECTOR,
+    FACET_SETTLEMENT,
+)
+from sort_index import SortIndex
+from search_index import RankingSearch, search_portfolios
+from portfolio_analytics import (
+    DEFAULT_SHARES,
+    entry_code,
+    project_portfolio,
+    project_portfolios,
+    portfolio_holdings,
 )
 from portfolio_data import (
     load_portfolios,
@@ -21,9 +70,553 @@ from portfolio_data import (
     add_symbol_to_portfolio,
     increment_view_count,
 )
+from portfolio_index import SORT_CREATED_AT, SORT_SYMBOLS, SORT_VIEW_COUNT, get_portfolio_index
+from portfolio_io import (
+    CSV_FIELDS,
+    PortfolioImportError,
+    export_portfolios_csv,
+    export_portfolios_ndjson,
+    import_broker_watchlist_csv,
+    import_portfolios_csv,
+    import_portfolios_ndjson,
+    open_text_upload,
+)
 
 RESULT_LIMIT_MIN, RESULT_LIMIT_MAX = 1, 9999
 DEFAULT_LIMIT = 50
+JOB_POLL_INTERVAL = 1.0  # 取得ジョブの進捗を見に行く間隔（秒）
+BEST_EFFORT_SECONDS = 10.0  # 「ベストエフォート」で先に結果を表示するまでの時間予算（秒）
+ALERT_SHOW_MAX = 10  # 取得後に画面に出すアラートの件数（すべて出力先には送る）
+MP_PAGE_SIZE = 20  # My Portfolio の一覧で1ページに表示するポートフォリオ数
+VIEWER_PAGE_SIZE = 200  # 閲覧ページで1ページに表示する銘柄数
+# 並び替えの表示名 → (索引のキー, 降順か)
+MP_SORT_OPTIONS = {
+    "作成日時（新しい順）": (SORT_CREATED_AT, True),
+    "作成日時（古い順）": (SORT_CREATED_AT, False),
+    "閲覧回数（多い順）": (SORT_VIEW_COUNT, True),
+    "閲覧回数（少ない順）": (SORT_VIEW_COUNT, False),
+    "銘柄数（多い順）": (SORT_SYMBOLS, True),
+    "銘柄数（少ない順）": (SORT_SYMBOLS, False),
+}
+
+
+def _session_id() -> str:
+    """このブラウザセッションのID（共有データセットの参照元として使う）。"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+
+def _session_alive(session_id: str) -> bool:
+    if not runtime.exists():
+        return True
+    return runtime.get_instance().is_active_session(session_id)
+
+
+def _download_accepts_callable() -> bool:
+    """st.download_button の data に関数を渡せる（押されたときに作る）バージョンか。"""
+    try:
+        from streamlit.elements.widgets.button import DownloadButtonDataType
+    except ImportError:
+        return False
+    return any(typing.get_origin(t) is collections.abc.Callable for t in typing.get_args(DownloadButtonDataType))
+
+
+DOWNLOAD_ACCEPTS_CALLABLE = _download_accepts_callable()
+
+
+def _export_button(label: str, write, encoding: str, file_name: str, mime: str, key: str) -> None:
+    """
+    write(テキストの出力先) で書いた内容のダウンロードボタン。内容はダウンロードするときだけ作る
+    （data に関数を渡せない Streamlit では「エクスポートを作成」を押したときだけ作ってボタンを出す）。
+    """
+    def build() -> bytes:
+        buf = io.StringIO()
+        write(buf)
+        return buf.getvalue().encode(encoding)
+
+    if DOWNLOAD_ACCEPTS_CALLABLE:
+        st.download_button(label, data=build, file_name=file_name, mime=mime, key=key)
+    elif st.button(f"エクスポートを作成（{file_name}）", key=f"{key}_build"):
+        st.download_button(label, data=build(), file_name=file_name, mime=mime, key=key)
+
+
+def _set_shared_dataset(state_key: str, df: pd.DataFrame, meta: dict | None = None) -> str:
+    """データセットを共有レジストリに登録し、セッションにはハンドルだけを保存する。以前のハンドルの参照は外す。"""
+    registry = get_registry()
+    sid = _session_id()
+    handle = registry.put(df, sid, meta)
+    old = st.session_state.get(state_key)
+    if old and old != handle:
+        registry.release(old, sid)
+    st.session_state[state_key] = handle
+    registry.sweep(is_alive=_session_alive)
+    return handle
+
+
+def _get_shared_dataset(state_key: str) -> pd.DataFrame | None:
+    """セッションのハンドルから共有データセットを返す。破棄済みならハンドルを消して None。"""
+    handle = st.session_state.get(state_key)
+    if not handle:
+        return None
+    df = get_registry().get(handle, _session_id())
+    if df is None:
+        st.session_state.pop(state_key, None)
+    return df
+
+
+def _current_ranking():
+    """セッションの最新ランキングとそのデータ版（共有ハンドル）を返す。未取得なら (None, None)。"""
+    ranking = _get_shared_dataset("ranking_handle")
+    if ranking is None or ranking.empty:
+        return None, None
+    return ranking, st.session_state["ranking_handle"]
+
+
+def _fetch_ranking_job(url: str | None, limit: int, time_budget: float | None = None):
+    """
+    ランキング取得ジョブの本体（1ページごとに進捗を更新し、中止されたらそこまでの行を返す）。
+    time_budget を渡すと、その秒数で取得できた分だけを返す（続きは同じURLで取り直すとチェックポイントから再開する）。
+    """
+    def run(job: Job) -> pd.DataFrame:
+        def on_page(report):
+            job.set_progress(
+                pages=report.pages_fetched + report.pages_resumed,
+                planned=report.pages_planned,
+                rows=report.rows,
+                requested=report.requested,
+            )
+
+        return hunt_high_dividend(
+            url=url, limit=limit, progress=on_page, cancel_event=job.cancel_event, time_budget=time_budget
+        )
+
+    return run
+
+
+def _multi_site_job(site_names: list[str], limit: int):
+    """複数サイト取得ジョブの本体。"""
+    def run(job: Job) -> dict[str, pd.DataFrame]:
+        return hunt_multiple_sites(
+            site_names,
+            limit=limit,
+            progress=lambda done, total: job.set_progress(sites=done, total=total),
+            cancel_event=job.cancel_event,
+        )
+
+    return run
+
+
+def _enrich_job(df: pd.DataFrame):
+    """業界・分野・株主優待の付与ジョブの本体（キャッシュにない銘柄だけ取得する）。"""
+    def run(job: Job) -> pd.DataFrame:
+        return enrich_ranking(
+            df,
+            progress=lambda done, total: job.set_progress(done=done, symbols=total),
+            cancel_event=job.cancel_event,
+        )
+
+    return run
+
+
+def _submit_job(state_key: str, fn, label: str) -> None:
+    """ジョブを投入し、ジョブIDをセッションに保存する。同じ欄の前のジョブは中止する。"""
+    jobs = get_job_manager()
+    old = st.session_state.get(state_key)
+    if old:
+        jobs.forget(old)
+    st.session_state[state_key] = jobs.submit(_session_id(), fn, label)
+
+
+def _show_job(state_key: str) -> Job | None:
+    """
+    セッションのジョブが実行中なら進捗（_job_progress）を表示して None を返す。
+    終わったジョブはセッションから外して返す（結果の受け取りは呼び出し側で1回だけ行う）。ジョブなしも None。
+    """
+    jobs = get_job_manager()
+    job = jobs.get(st.session_state.get(state_key))
+    if job is None:
+        st.session_state.pop(state_key, None)
+        return None
+    if job.finished:
+        st.session_state.pop(state_key, None)
+        jobs.forget(job.job_id)
+        return job
+    _job_progress(state_key)
+    return None
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def _job_progress(state_key: str) -> None:
+    """
+    実行中のジョブの進捗（順番待ち・取得済みページ数・件数）と中止ボタン。
+    JOB_POLL_INTERVAL ごとにこの部分だけを再実行し、ジョブが終わったら画面全体を1回再実行して結果を受け取る。
+    """
+    jobs = get_job_manager()
+    job = jobs.get(st.session_state.get(state_key))
+    if job is None or job.finished:
+        st.rerun()
+    if job.status == QUEUED:
+        ahead = jobs.position(job.job_id)
+        st.info(f"{job.label}: 順番待ちです" + (f"（前に {ahead} 件）" if ahead else ""))
+    else:
+        p = job.progress
+        if p.get("requested"):
+            frac = min(1.0, p["rows"] / p["requested"])
+            pages = f"{p['pages']} / {p['planned']} ページ" if p.get("planned") else f"{p['pages']} ページ"
+            text = f"{job.label}: {pages}・{p['rows']} / {p['requested']} 件（{job.elapsed():.0f} 秒）"
+        elif p.get("total"):
+            frac = p["sites"] / p["total"]
+            text = f"{job.label}: {p['sites']} / {p['total']} サイト（{job.elapsed():.0f} 秒）"
+        elif p.get("symbols"):
+            frac = p["done"] / p["symbols"]
+            text = f"{job.label}: {p['done']} / {p['symbols']} 銘柄（{job.elapsed():.0f} 秒）"
+        else:
+            frac, text = 0.0, f"{job.label}: 開始しています…（マナーで1秒以上待機しています）"
+        st.progress(frac, text=text)
+    if st.button("取得を中止", key=f"{state_key}_cancel"):
+        jobs.cancel(job.job_id)
+
+
+def _projection_label(proj: dict | None) -> str:
+    """一覧ボタン用の「年間配当・利回り」表記。"""
+    if not proj or not proj["n_matched"]:
+        return ""
+    y = f" / 利回り {proj['weighted_yield']:.2f}%" if proj["weighted_yield"] is not None else ""
+    return f" 年間配当 ¥{proj['annual_dividend']:,.0f}{y}"
+
+
+@st.fragment
+def _portfolio_editor() -> None:
+    """作成済みリストの名前の編集・削除。フラグメントなので、保存・削除はこの一覧だけを再実行する。"""
+    portfolios = load_portfolios()
+    for p in portfolios:
+        pid, name, symbols = p.get("id"), p.get("name", ""), p.get("symbols") or []
+        with st.expander(f"📁 {name}（{len(symbols)} 件）", expanded=False):
+            with st.form(f"edit_form_{pid}"):
+                edited = st.text_input("リスト名を編集", value=name, key=f"edit_{pid}")
+                col1, col2, _ = st.columns([1, 1, 2])
+                with col1:
+                    save_clicked = st.form_submit_button("保存")
+                with col2:
+                    pass  # 削除はフォーム外で
+                if save_clicked:
+                    if edited and edited.strip():
+                        update_portfolio(pid, name=edited.strip())
+                        st.success("リスト名を保存しました。")
+                        st.rerun(scope="fragment")
+                    else:
+                        st.error("リスト名を入力してください。")
+            if st.button("削除", key=f"del_{pid}"):
+                delete_portfolio(pid)
+                st.rerun(scope="fragment")
+            if symbols:
+                labels = [(s.split("|", 1)[0].strip() or s) if ("|" in s) else s for s in symbols]
+                st.write("登録銘柄:", ", ".join(labels))
+            else:
+                st.caption("銘柄はランキング取得ページのオプションから追加できます。")
+
+
+@st.fragment
+def _portfolio_list() -> None:
+    """
+    My Portfolio の一覧（並び替え・検索・ページ送り）。フラグメントなので、並び替えや検索はこの一覧だけを再実行する。
+    並び替えは保存先の版ごとに保っている索引から引き、表示するページの分だけを描画する。
+    """
+    index = get_portfolio_index()
+    st.write("---")
+    st.write("**作成済みポートフォリオ**")
+    # ソート機能（修正3）: 作成日時 / 閲覧回数 / 銘柄数 の昇順・降順
+    col_s1, col_s2 = st.columns([3, 1])
+    with col_s1:
+        sort_option = st.selectbox("並び替え", options=list(MP_SORT_OPTIONS), key="mp_sort")
+    sort_key, descending = MP_SORT_OPTIONS[sort_option]
+    # 検索: ポートフォリオ名・登録銘柄の表示名を索引から部分一致で引く
+    mp_query = st.text_input("ポートフォリオ・銘柄を検索", key="mp_search_q", placeholder="例: 高配当 / トヨタ / 7203")
+    matched_entries: dict[str, list[str]] = {}
+    only = None
+    if mp_query and mp_query.strip():
+        hits = search_portfolios(index.portfolios(), mp_query, index.revision)
+        matched_entries = {p.get("id"): entries for p, entries in hits}
+        only = set(matched_entries)
+        st.caption(f"検索結果: {len(only)} 件")
+    n_total = len(index) if only is None else len(only)
+    n_pages = page_count(n_total, MP_PAGE_SIZE)
+    if st.session_state.get("mp_page", 1) > n_pages:
+        st.session_state["mp_page"] = n_pages
+    with col_s2:
+        mp_page = st.number_input(f"ページ（全 {n_pages}）", min_value=1, max_value=n_pages, step=1, key="mp_page")
+    portfolios, _ = index.page(sort_key, descending, mp_page, MP_PAGE_SIZE, only)
+    ranking, ranking_version = _current_ranking()
+    projections = project_portfolios(portfolios, ranking, ranking_version) if ranking is not None else {}
+    for p in portfolios:
+        name = p.get("name", "")
+        pid = p.get("id", "")
+        n = len(p.get("symbols") or [])
+        if st.button(f"📁 {name}（{n} 件）{_projection_label(projections.get(pid))}", key=f"view_{pid}", use_container_width=True):
+            st.session_state["view_portfolio_id"] = pid
+            st.rerun()
+        if matched_entries.get(pid):
+            labels = [(s.split("|", 1)[0].strip() or s) if ("|" in s) else s for s in matched_entries[pid]]
+            st.caption("一致した銘柄: " + ", ".join(labels))
+    if n_pages > 1:
+        start = (mp_page - 1) * MP_PAGE_SIZE
+        st.caption(f"{start + 1}〜{start + len(portfolios)} 件目 / {n_total} 件")
+    if not portfolios and not (mp_query and mp_query.strip()):
+        st.caption("ポートフォリオがありません。「新規作成」で作成してください。")
+
+
+def _ranking_csv(ranking_handle: str, view: pd.DataFrame) -> str:
+    """表示中の行（絞り込み・並び順）の CSV。行の並びが前回と同じなら作り直さない（ページ移動・行の選択では同じ）。"""
+    digest = hashlib.blake2b(view.index.to_numpy().tobytes(), digest_size=16).hexdigest()
+    cached = st.session_state.get("ranking_csv")
+    if cached is None or cached[0] != (ranking_handle, digest):
+        cached = ((ranking_handle, digest), view.to_csv(index=False, encoding="utf-8-sig"))
+        st.session_state["ranking_csv"] = cached
+    return cached[1]
+
+
+@st.fragment
+def _ranking_option_forms(symbol_value: str, display_name_value: str) -> None:
+    """オプションの「ポートフォリオに追加」。フラグメントなので、送信してもこのフォームだけを再実行する。"""
+    st.write("**ポートフォリオに追加**")
+    # 銘柄コードまたは表示名のどちらかがあれば追加可能
+    can_add = (symbol_value and str(symbol_value).strip()) or (display_name_value and display_name_value.strip())
+
+    # 新規リストをその場で作成（ページ遷移なし）
+    with st.form("option_new_list_form"):
+        new_name = st.text_input("新規リスト名（任意）", key="opt_new_name", placeholder="入力して「作成して追加」で新規リストに追加")
+        if st.form_submit_button("作成して追加"):
+            if new_name and new_name.strip() and can_add:
+                p = create_portfolio(new_name.strip())
+                add_symbol_to_portfolio(p["id"], symbol_value, display_name=display_name_value or None)
+                st.success(f"「{new_name.strip()}」を作成し、銘柄を追加しました。リストを更新しました。")
+            elif not (new_name and new_name.strip()):
+                st.warning("ポートフォリオ名を入力してください。")
+            elif not can_add:
+                st.warning("この行には銘柄コードも名称も取得できません。別の行を選んでください。")
+
+    # 既存リストから選択して追加（フォームで送信して確実に反映）。新規作成の後に読むので、作ったリストもここに出る
+    portfolios = load_portfolios()
+    if portfolios:
+        st.caption("既存のリストに追加する場合")
+        with st.form("option_add_to_existing"):
+            chosen = st.selectbox(
+                "追加先",
+                [p["id"] for p in portfolios],
+                format_func=lambda pid: next((p["name"] for p in portfolios if p["id"] == pid), pid),
+                key="opt_add_select",
+            )
+            add_clicked = st.form_submit_button("追加")
+        if add_clicked:
+            if can_add and add_symbol_to_portfolio(chosen, symbol_value, display_name=display_name_value or None):
+                st.success("ポートフォリオに追加しました。")
+            elif not can_add:
+                st.warning("この行には銘柄コードも名称も取得できません。")
+            else:
+                st.error("追加に失敗しました。ポートフォリオを確認してください。")
+    else:
+        st.caption("上で新規作成すると、ここにリストが表示されます。")
+
+
+@st.fragment
+def _ranking_results(df: pd.DataFrame, ranking_handle: str) -> None:
+    """
+    取得済みランキングの絞り込み・ページ・表・オプション。
+    フラグメントなので、ここでの操作（絞り込み・ページ移動・行の選択・ソート）はこの部分だけを再実行する。
+    """
+    st.success(f"表示件数: {len(df)} 件（条件により絞り込み可）")
+
+    # 選択肢と絞り込みはデータセットごとに1回だけ作るファセット索引から引く
+    facets = get_registry().derived(ranking_handle, "facet_index", FacetIndex.build) or FacetIndex.build(df)
+    with st.expander("条件で絞り込み", expanded=False):
+        scope_label = st.radio("対象", ["上場銘柄すべて", "各市場ごとの全銘柄"], horizontal=True, key="scope_radio")
+        markets_filter = None
+        if scope_label == "各市場ごとの全銘柄":
+            market_options = facets.options(FACET_MARKET)
+            if market_options:
+                selected_markets = st.multiselect(
+                    "市場を選択（複数可）",
+                    options=market_options,
+                    default=[],
+                    key="markets_filter",
+                    help="選択した市場の銘柄だけに絞り込まれます。",
+                )
+                if selected_markets:
+                    markets_filter = selected_markets
+                else:
+                    st.caption("※1つ以上選択すると絞り込みがかかります。")
+            else:
+                st.caption("取得データから市場を抽出しています。データに「名称・コード・市場」列が含まれていれば、ここに市場一覧が表示されます。")
+        yield_min = st.number_input("配当利回り 最小（%）", value=None, min_value=0.0, max_value=100.0, step=0.1, key="y_min", placeholder="指定なし")
+        yield_max = st.number_input("配当利回り 最大（%）", value=None, min_value=0.0, max_value=100.0, step=0.1, key="y_max", placeholder="指定なし")
+        settlement_months = None
+        if facets.has(FACET_SETTLEMENT):
+            options = facets.options(FACET_SETTLEMENT)
+            if options:
+                selected = st.multiselect("決算年月", options=options, default=[], key="settlement")
+                if selected:
+                    settlement_months = selected
+        else:
+            st.caption("決算年月は取得データに含まれる場合に表示されます。")
+        industry = sector = None
+        has_benefit = None
+        if facets.options(FACET_INDUSTRY):
+            industry = st.multiselect("業界", options=facets.options(FACET_INDUSTRY), key="industry")
+        if facets.options(FACET_SECTOR):
+            sector = st.multiselect("分野", options=facets.options(FACET_SECTOR), key="sector")
+        if facets.has(FACET_BENEFIT):
+            has_benefit = st.selectbox("株主優待", options=["指定なし", "あり", "なし"], key="benefit")
+            has_benefit = {"指定なし": None, "あり": True, "なし": False}[has_benefit]
+
+    # 絞り込み（ファセット索引の行マスク）と並び替え（事前計算した並び）を合わせて、表示する行位置を決める
+    row_mask = facets.filter_mask(
+        yield_min=yield_min,
+        yield_max=yield_max,
+        settlement_months=settlement_months,
+        industry=industry or None,
+        sector=sector or None,
+        has_shareholder_benefit=has_benefit,
+        markets=markets_filter,
+    )
+    # 修正7: オプションでソート
+    sorter = get_registry().derived(ranking_handle, "sort_index", SortIndex.build) or SortIndex.build(df)
+    sort_spec = st.session_state.get("ranking_sort")
+    if sort_spec and sorter.supports(sort_spec[0]):
+        positions = sorter.order(row_mask, sort_spec[0], sort_spec[1])
+    else:
+        positions = np.flatnonzero(row_mask)
+    # 行ラベル（index）は元データの行位置のまま残し、並び替え後も同じ行を指すようにする
+    display_df = df.iloc[positions]
+
+    # 修正6: Symbol → オプション（表示用に列名変更。内部で symbol 参照するためコピーでリネーム）
+    has_symbol_col = "symbol" in display_df.columns
+    if has_symbol_col:
+        display_df = display_df.rename(columns={"symbol": "オプション"})
+
+    st.caption(f"絞り込み後: {len(display_df)} 件")
+
+    # ページング: 表示中のページ分だけを表に渡し、行ラベルもそのページ分だけ作る
+    def _request_rank_jump():
+        st.session_state["ranking_jump_pending"] = True
+
+    col_p1, col_p2, col_p3, col_p4 = st.columns([2, 2, 2, 4])
+    with col_p1:
+        page_size = st.selectbox("表示件数/ページ", PAGE_SIZE_OPTIONS, key="ranking_page_size")
+    with col_p4:
+        search_q = st.text_input("名称・コードで検索", key="ranking_search_q", placeholder="例: トヨタ / 7203")
+    with col_p3:
+        jump_rank = st.number_input(
+            "順位へジャンプ", min_value=1, value=None, step=1, key="ranking_jump_rank",
+            placeholder="順位", on_change=_request_rank_jump,
+        )
+    if search_q and search_q.strip():
+        ranking_search = get_registry().derived(ranking_handle, "search_index", RankingSearch) or RankingSearch(df)
+        display_df = search_rows(display_df, search_q, matcher=ranking_search.positions)
+        st.caption(f"検索結果: {len(display_df)} 件")
+    n_pages = page_count(len(display_df), page_size)
+    if st.session_state.pop("ranking_jump_pending", False) and jump_rank:
+        jump_page = find_rank_page(display_df, jump_rank, page_size)
+        if jump_page is not None:
+            st.session_state["ranking_page"] = jump_page
+        else:
+            st.caption(f"順位 {jump_rank} は表示中の結果にありません。")
+    if st.session_state.get("ranking_page", 1) > n_pages:
+        st.session_state["ranking_page"] = n_pages
+    with col_p2:
+        page = st.number_input(f"ページ（全 {n_pages}）", min_value=1, max_value=n_pages, step=1, key="ranking_page")
+    page_df = get_page(display_df, page, page_size)
+    row_options = list(page_df.index)
+    row_labels = build_row_labels(page_df)
+    # 表の行をクリックするとオプションが開く（Streamlit 1.35+ の selection 利用）
+    table_key = f"ranking_df_selection_{page}_{page_size}"
+
+    def _open_selected_row():
+        # 選択が変わったときだけ呼ばれる（閉じたオプションが同じ選択で開き直さない）
+        rows = st.session_state[table_key].selection.rows
+        if rows and 0 <= rows[0] < len(row_options):
+            st.session_state["option_row_index"] = row_options[rows[0]]
+
+    _use_row_click = True
+    if "オプション" in display_df.columns and _use_row_click:
+        try:
+            st.dataframe(
+                page_df,
+                use_container_width=True,
+                hide_index=True,
+                on_select=_open_selected_row,
+                selection_mode="single-row",
+                key=table_key,
+            )
+        except TypeError:
+            _use_row_click = False
+    if not _use_row_click or "オプション" not in display_df.columns:
+        st.dataframe(page_df, use_container_width=True, hide_index=True, key="ranking_df_plain")
+
+    # オプション: 行クリックで開く（上で設定） or 従来の「行を選択」＋「オプションを開く」
+    if "オプション" in display_df.columns and not _use_row_click:
+        st.write("**オプション**（行を選択して「オプションを開く」でポートフォリオに追加またはソート）")
+        def _row_label(i):
+            return row_labels.get(i, str(i))
+        def _open_option_row():
+            st.session_state["option_row_index"] = st.session_state["option_row_sel"]
+        st.selectbox("行を選択", row_options, format_func=_row_label, key="option_row_sel")
+        st.button("オプションを開く", key="open_option_btn", on_click=_open_option_row)
+    elif "オプション" in display_df.columns:
+        st.caption("👆 **上の表の行をクリック**すると、その行のオプション（ポートフォリオへ追加・ソート）が開きます。")
+
+    if st.session_state.get("option_row_index") is not None and "オプション" in display_df.columns:
+        row_idx = st.session_state["option_row_index"]
+        if row_idx in display_df.index:
+            with st.expander("オプション", expanded=True):
+                symbol_value = display_df.loc[row_idx].get("オプション", "")
+                # 銘柄名は「名称・コード・市場」列から取得（ポートフォリオ一覧で銘柄名を表示するため）
+                name_col = next((c for c in display_df.columns if "名称" in str(c) and "コード" in str(c)), None)
+                display_name_value = str(display_df.loc[row_idx].get(name_col, "")).strip() if name_col else ""
+                # 銘柄コードが空でも「名称・コード・市場」から4桁コードを抽出してフォールバック
+                if not (symbol_value and str(symbol_value).strip()) and display_name_value:
+                    m = re.search(r"\b([0-9]{4})\b", display_name_value)
+                    if m:
+                        symbol_value = f"{m.group(1)}.T"
+                sel_label = row_labels.get(row_idx) or build_row_labels(display_df.loc[[row_idx]]).get(row_idx, str(row_idx))
+                st.write(f"選択行: {sel_label}")
+
+                # 追加のフォームは別のフラグメント（送信しても表は作り直さない）
+                _ranking_option_forms(symbol_value or "", display_name_value)
+
+                st.write("**ソート**")
+                sort_options = [
+                    ("順位（昇順）", "順位", True),
+                    ("順位（降順）", "順位", False),
+                    ("名称あいうえお（昇順）", "名称・コード・市場", True),
+                    ("名称あいうえお（降順）", "名称・コード・市場", False),
+                    ("1株配当（昇順）", "1株配当", True),
+                    ("1株配当（降順）", "1株配当", False),
+                    ("取引値（昇順）", "取引値", True),
+                    ("取引値（降順）", "取引値", False),
+                ]
+                sort_cols = [c for c in display_df.columns if c != "オプション"]
+                available = [(lbl, col, asc) for lbl, col, asc in sort_options if col in sort_cols]
+
+                def _apply_sort():
+                    _, col, asc = available[st.session_state["sort_choice"]]
+                    st.session_state["ranking_sort"] = (col, asc)
+                    st.session_state["option_row_index"] = None
+
+                def _close_options():
+                    st.session_state["option_row_index"] = None
+
+                if available:
+                    st.selectbox("並び替え条件", range(len(available)), format_func=lambda i: available[i][0], key="sort_choice")
+                    st.button("ソートを適用", key="sort_apply_btn", on_click=_apply_sort)
+                st.button("オプションを閉じる", key="close_option_btn", on_click=_close_options)
+
+    st.download_button(
+        label="CSVをダウンロード",
+        data=_ranking_csv(ranking_handle, display_df),
+        file_name="high_dividend_ranking.csv",
+        mime="text/csv",
+    )
+
 
 st.set_page_config(
     page_title="High-Dividend Hunter",
@@ -53,7 +646,6 @@ st.divider()
 
 if st.session_state["main_page"] == "portfolio_create":
     st.caption("リストの作成・編集・削除ができます。")
-    portfolios = load_portfolios()
     with st.form("new_portfolio_form"):
         new_name = st.text_input("新規リスト名", placeholder="例: 高配当候補")
         if st.form_submit_button("作成"):
@@ -63,32 +655,47 @@ if st.session_state["main_page"] == "portfolio_create":
                 st.rerun()
             else:
                 st.error("リスト名を入力してください。")
-    st.divider()
-    for p in portfolios:
-        pid, name, symbols = p.get("id"), p.get("name", ""), p.get("symbols") or []
-        with st.expander(f"📁 {name}（{len(symbols)} 件）", expanded=False):
-            with st.form(f"edit_form_{pid}"):
-                edited = st.text_input("リスト名を編集", value=name, key=f"edit_{pid}")
-                col1, col2, _ = st.columns([1, 1, 2])
-                with col1:
-                    save_clicked = st.form_submit_button("保存")
-                with col2:
-                    pass  # 削除はフォーム外で
-                if save_clicked:
-                    if edited and edited.strip():
-                        update_portfolio(pid, name=edited.strip())
-                        st.success("リスト名を保存しました。")
-                        st.rerun()
-                    else:
-                        st.error("リスト名を入力してください。")
-            if st.button("削除", key=f"del_{pid}"):
-                delete_portfolio(pid)
-                st.rerun()
-            if symbols:
-                labels = [(s.split("|", 1)[0].strip() or s) if ("|" in s) else s for s in symbols]
-                st.write("登録銘柄:", ", ".join(labels))
+    with st.expander("一括インポート / エクスポート", expanded=False):
+        st.caption("NDJSON・CSV は1銘柄1行（列: " + ", ".join(CSV_FIELDS) + "）。証券会社のウォッチリストCSVは「銘柄コード」「銘柄名」の列を読み取ります。")
+        col_e1, col_e2 = st.columns(2)
+        with col_e1:
+            _export_button(
+                "NDJSON でエクスポート", export_portfolios_ndjson, "utf-8", "portfolios.ndjson", "application/x-ndjson", "export_ndjson"
+            )
+        with col_e2:
+            _export_button("CSV でエクスポート", export_portfolios_csv, "utf-8-sig", "portfolios.csv", "text/csv", "export_csv")
+        import_format = st.radio(
+            "インポート形式",
+            ["NDJSON", "CSV", "証券会社のウォッチリストCSV"],
+            horizontal=True,
+            key="import_format",
+        )
+        uploaded = st.file_uploader("ファイルを選択", type=["ndjson", "jsonl", "json", "csv", "txt"], key="import_file")
+        if import_format == "証券会社のウォッチリストCSV":
+            import_name = st.text_input("取り込み先の新規リスト名", placeholder="例: 証券会社ウォッチリスト", key="import_name")
+            import_replace = False
+        else:
+            import_replace = st.checkbox("既存のリストをすべて置き換える（バックアップからの復元）", value=False, key="import_replace")
+        if st.button("インポート", disabled=uploaded is None):
+            src = open_text_upload(uploaded)
+            try:
+                if import_format == "NDJSON":
+                    stats = import_portfolios_ndjson(src, replace=import_replace)
+                elif import_format == "CSV":
+                    stats = import_portfolios_csv(src, replace=import_replace)
+                else:
+                    stats = import_broker_watchlist_csv(src, import_name)
+            except (PortfolioImportError, UnicodeDecodeError, csv.Error) as e:
+                st.error(f"インポートできませんでした（リストは変更していません）: {e}")
             else:
-                st.caption("銘柄はランキング取得ページのオプションから追加できます。")
+                msg = f"{stats['portfolios']} 件のリスト・{stats['entries']} 銘柄を取り込みました。"
+                if stats["duplicates"]:
+                    msg += f"（重複 {stats['duplicates']} 件は除きました）"
+                st.success(msg)
+            finally:
+                src.detach()
+    st.divider()
+    _portfolio_editor()
     st.stop()
 
 if st.session_state["main_page"] == "my_portfolio":
@@ -101,8 +708,7 @@ if st.session_state["main_page"] == "my_portfolio":
         if st.session_state.get("view_count_incremented_for") != view_pid:
             increment_view_count(view_pid)
             st.session_state["view_count_incremented_for"] = view_pid
-        portfolios = load_portfolios()
-        current = next((p for p in portfolios if p.get("id") == view_pid), None)
+        current = get_portfolio_index().get(view_pid)
         if current:
             if st.button("← 一覧に戻る"):
                 st.session_state["view_portfolio_id"] = None
@@ -110,11 +716,71 @@ if st.session_state["main_page"] == "my_portfolio":
                 st.rerun()
             st.subheader(current.get("name", ""))
             symbols = current.get("symbols") or []
+            ranking, ranking_version = _current_ranking()
+            if symbols and ranking is not None:
+                # 配当収入見込み: 最新ランキングと銘柄コードで突き合わせ
+                proj = project_portfolio(current, ranking, ranking_version)
+                col_v1, col_v2, col_v3 = st.columns(3)
+                col_v1.metric(f"年間配当見込み（各{DEFAULT_SHARES}株）", f"¥{proj['annual_dividend']:,.0f}")
+                col_v2.metric("加重配当利回り", f"{proj['weighted_yield']:.2f}%" if proj["weighted_yield"] is not None else "—")
+                col_v3.metric("ランキングと一致", f"{proj['n_matched']} / {proj['n_symbols']} 銘柄")
+                if proj["sector_mix"]:
+                    st.write("**セクター構成**")
+                    st.bar_chart(pd.Series(proj["sector_mix"], name="銘柄数"))
+                with st.expander("銘柄別の内訳", expanded=False):
+                    st.dataframe(portfolio_holdings(current, ranking, ranking_version), use_container_width=True, hide_index=True)
+            elif symbols:
+                st.caption("「ランキングを取得」でデータを取得すると、年間配当見込み・加重利回り・セクター構成を表示します。")
+            with st.expander("アラート", expanded=False):
+                # ランキングを取得するたびに、前回から変わった銘柄だけをこのルールと照合する
+                for rule in load_alert_rules(view_pid):
+                    col_r1, col_r2 = st.columns([8, 1])
+                    col_r1.write(describe_rule(rule))
+                    if col_r2.button("削除", key=f"alert_del_{rule['id']}"):
+                        delete_alert_rule(rule["id"])
+                        st.rerun()
+                with st.form("alert_rule_form", clear_on_submit=True):
+                    kinds = list(ALERT_KIND_LABELS)
+                    kind = st.selectbox(
+                        "条件",
+                        options=kinds,
+                        format_func=lambda k: ALERT_KIND_LABELS[k].format(threshold="N"),
+                        key="alert_kind",
+                    )
+                    threshold = st.number_input("閾値（利回りは %、順位は N 位）", min_value=0.0, value=4.0, step=0.5, key="alert_threshold")
+                    codes = [c for c in dict.fromkeys(entry_code(s) for s in symbols) if c]
+                    target = st.selectbox("対象", options=["すべての銘柄"] + codes, key="alert_target")
+                    if st.form_submit_button("アラートを追加"):
+                        if kind in RANK_KINDS and threshold < 1:
+                            st.warning("順位の閾値は 1 以上で指定してください。")
+                        else:
+                            add_alert_rule(view_pid, kind, threshold, None if target == "すべての銘柄" else target)
+                            st.rerun()
+                history = recent_alerts(view_pid, limit=ALERT_SHOW_MAX)
+                if history:
+                    st.write("**最近のアラート**")
+                    for event in history:
+                        st.caption(f"{event['fired_at'][:16].replace('T', ' ')} {event['message']}")
             if symbols:
-                for i, s in enumerate(symbols, 1):
-                    # 保存形式 "表示名|銘柄コード" の場合は表示名を、そうでなければそのまま表示
-                    label = (s.split("|", 1)[0].strip() or s) if ("|" in s) else s
-                    st.write(f"{i}. {label}")
+                # 登録銘柄は表示するページの分だけを1つの表にする
+                n_pages = page_count(len(symbols), VIEWER_PAGE_SIZE)
+                if st.session_state.get("viewer_page", 1) > n_pages:
+                    st.session_state["viewer_page"] = n_pages
+                viewer_page = 1
+                if n_pages > 1:
+                    viewer_page = st.number_input(f"ページ（全 {n_pages}）", min_value=1, max_value=n_pages, step=1, key="viewer_page")
+                start = (viewer_page - 1) * VIEWER_PAGE_SIZE
+                window = symbols[start:start + VIEWER_PAGE_SIZE]
+                # 保存形式 "表示名|銘柄コード" の場合は表示名を、そうでなければそのまま表示
+                st.dataframe(
+                    pd.DataFrame({
+                        "No.": range(start + 1, start + len(window) + 1),
+                        "銘柄": [(s.split("|", 1)[0].strip() or s) if ("|" in s) else s for s in window],
+                        "コード": [entry_code(s) for s in window],
+                    }),
+                    use_container_width=True,
+                    hide_index=True,
+                )
             else:
                 st.caption("登録銘柄はありません。")
         else:
@@ -150,43 +816,7 @@ if st.session_state["main_page"] == "my_portfolio":
                     st.session_state["mp_open_new_dialog"] = False
                     st.rerun()
 
-    portfolios = load_portfolios()
-    st.write("---")
-    st.write("**作成済みポートフォリオ**")
-    # ソート機能（修正3）: 作成日時 / 閲覧回数 / 銘柄数 の昇順・降順
-    sort_option = st.selectbox(
-        "並び替え",
-        options=[
-            "作成日時（新しい順）",
-            "作成日時（古い順）",
-            "閲覧回数（多い順）",
-            "閲覧回数（少ない順）",
-            "銘柄数（多い順）",
-            "銘柄数（少ない順）",
-        ],
-        key="mp_sort",
-    )
-    if sort_option == "作成日時（新しい順）":
-        portfolios = sorted(portfolios, key=lambda x: x.get("created_at", ""), reverse=True)
-    elif sort_option == "作成日時（古い順）":
-        portfolios = sorted(portfolios, key=lambda x: x.get("created_at", ""))
-    elif sort_option == "閲覧回数（多い順）":
-        portfolios = sorted(portfolios, key=lambda x: x.get("view_count", 0), reverse=True)
-    elif sort_option == "閲覧回数（少ない順）":
-        portfolios = sorted(portfolios, key=lambda x: x.get("view_count", 0))
-    elif sort_option == "銘柄数（多い順）":
-        portfolios = sorted(portfolios, key=lambda x: len(x.get("symbols") or []), reverse=True)
-    else:
-        portfolios = sorted(portfolios, key=lambda x: len(x.get("symbols") or []))
-    for p in portfolios:
-        name = p.get("name", "")
-        pid = p.get("id", "")
-        n = len(p.get("symbols") or [])
-        if st.button(f"📁 {name}（{n} 件）", key=f"view_{pid}", use_container_width=True):
-            st.session_state["view_portfolio_id"] = pid
-            st.rerun()
-    if not portfolios:
-        st.caption("ポートフォリオがありません。「新規作成」で作成してください。")
+    _portfolio_list()
     st.stop()
 
 # ランキングを取得ページ
@@ -194,10 +824,56 @@ st.caption("Yahoo!ファイナンス 配当利回りランキングを取得し
 
 input_mode = st.radio(
     "取得方法",
-    options=["サイト名で選ぶ", "URLを直接入力"],
+    options=["サイト名で選ぶ", "URLを直接入力", "複数サイトをまとめて取得"],
     horizontal=True,
 )
 
+if input_mode == "複数サイトをまとめて取得":
+    # 複数サイトを並行取得し、銘柄ごとに「どのリストに載っているか」と各サイトの利回りを横並びで表示
+    site_names = get_site_names()
+    selected_sites = st.multiselect("取得するサイト（複数可）", options=site_names, default=site_names[:1], key="multi_sites")
+    multi_limit = st.number_input(
+        "各サイトの取得件数",
+        min_value=RESULT_LIMIT_MIN,
+        max_value=RESULT_LIMIT_MAX,
+        value=DEFAULT_LIMIT,
+        step=1,
+        key="multi_limit",
+    )
+    if st.button("まとめて取得", type="primary", disabled=not selected_sites):
+        _submit_job("multi_site_job_id", _multi_site_job(selected_sites, int(multi_limit)), f"{len(selected_sites)} サイトの並行取得")
+    finished = _show_job("multi_site_job_id")
+    if finished is not None:
+        if finished.status == DONE:
+            frames = finished.result
+            _set_shared_dataset("multi_site_handle", merge_site_rankings(frames))
+            st.session_state["multi_site_failed"] = [name for name, f in frames.items() if f.empty]
+        elif finished.status == FAILED:
+            st.error(f"取得中にエラーが発生しました: {finished.error}")
+        else:
+            st.info("取得を中止しました。")
+    merged = _get_shared_dataset("multi_site_handle")
+    for name in st.session_state.get("multi_site_failed") or []:
+        st.warning(f"「{name}」は取得できませんでした。")
+    if merged is not None and not merged.empty:
+        st.success(f"銘柄数: {len(merged)} 件（複数リストに掲載されている銘柄が上位）")
+        max_listed = int(merged["掲載数"].max())
+        view = merged
+        if max_listed > 1:
+            min_listed = st.slider("掲載リスト数（以上）", min_value=1, max_value=max_listed, value=1, key="multi_min_listed")
+            view = merged[merged["掲載数"] >= min_listed]
+        multi_page_size = st.selectbox("表示件数/ページ", PAGE_SIZE_OPTIONS, key="multi_page_size")
+        multi_pages = page_count(len(view), multi_page_size)
+        multi_page = st.number_input(f"ページ（全 {multi_pages}）", min_value=1, max_value=multi_pages, step=1, key="multi_page")
+        st.dataframe(get_page(view, multi_page, multi_page_size), use_container_width=True, hide_index=True)
+        st.download_button(
+            label="CSVをダウンロード",
+            data=view.to_csv(index=False, encoding="utf-8-sig"),
+            file_name="high_dividend_multi_site.csv",
+            mime="text/csv",
+        )
+    st.stop()
+
 target_url = None
 if input_mode == "サイト名で選ぶ":
     # 項目1: サイト候補（登録済み）— 常に表示
@@ -234,14 +910,20 @@ if input_mode == "サイト名で選ぶ":
                         max_results=20,
                         include_english=True,
                     )
-                    st.session_state["site_search_results"] = candidates
+                    # 候補ページを並行して先読みし、ランキング表のあるものを先に並べる
+                    if candidates:
+                        st.write(f"{len(candidates)} 件の候補ページにランキング表があるか確認しています…")
+                    checked = validate_site_candidates(candidates)
+                    st.session_state["site_search_results"] = [(title, url) for title, url, _ in checked]
+                    st.session_state["site_search_verified"] = {url for _, url, ok in checked if ok}
                     st.session_state["site_search_has_keyword"] = True
                     if not candidates:
                         status.update(label="候補が見つかりませんでした", state="complete")
                         st.warning("該当する候補が見つかりませんでした。キーワードを変えて再検索してください。")
                     else:
-                        status.update(label=f"完了（{len(candidates)} 件）", state="complete")
-                        st.success(f"{len(candidates)} 件の候補を取得しました。")
+                        n_verified = len(st.session_state["site_search_verified"])
+                        status.update(label=f"完了（{len(candidates)} 件、うちランキング表あり {n_verified} 件）", state="complete")
+                        st.success(f"{len(candidates)} 件の候補を取得しました（ランキング表あり {n_verified} 件）。")
                     st.rerun()
                 except Exception as e:
                     status.update(label="検索エラー", state="error")
@@ -253,6 +935,7 @@ if input_mode == "サイト名で選ぶ":
             st.rerun()
 
     search_results = st.session_state.get("site_search_results") or []
+    verified_urls = st.session_state.get("site_search_verified") or set()
     has_search_keyword = st.session_state.get("site_search_has_keyword", False)
 
     # 検索結果を表示するための専用欄（常に表示し、検索前は案内文・検索後は候補を表示）
@@ -266,10 +949,14 @@ if input_mode == "サイト名で選ぶ":
             "サイト候補（検索結果）",
             options=options,
             index=default_idx,
-            format_func=lambda i: search_results[i][0][:80] + ("..." if len(search_results[i][0]) > 80 else ""),
+            format_func=lambda i: ("✅ " if search_results[i][1] in verified_urls else "⚠️ ")
+            + search_results[i][0][:80]
+            + ("..." if len(search_results[i][0]) > 80 else ""),
             key="site_candidate_select",
         )
         target_url = search_results[idx][1]
+        if target_url not in verified_urls:
+            st.caption("⚠️ この候補ではランキング表を確認できませんでした（取得できない可能性があります）。")
         st.caption("上で選択した検索結果のURLでランキングを取得します。登録済みを使う場合は「サイト候補（登録済み）」を選んで取得してください。")
     else:
         st.info("キーワードを入力して「検索」を押すと、ここに検索結果の候補が表示されます。候補から選択すると、そのURLでランキングを取得できます。")
@@ -299,230 +986,77 @@ else:
         help=f"{RESULT_LIMIT_MIN}〜{RESULT_LIMIT_MAX}件の範囲で指定してください。",
     )
 
+best_effort = st.checkbox(
+    f"ベストエフォート（{BEST_EFFORT_SECONDS:.0f}秒）",
+    value=False,
+    key="best_effort",
+    help=f"{BEST_EFFORT_SECONDS:.0f}秒以内に取得できた分を先に表示し、残りはバックグラウンドで取得を続けます。",
+)
+
 if st.button("ランキングを取得", type="primary"):
-    with st.spinner("取得中… (マナーで1秒以上待機しています)"):
-        df = hunt_high_dividend(url=target_url, limit=limit)
-    if df is not None and not df.empty:
-        st.session_state["ranking_df"] = df
+    # 取得はバックグラウンドのジョブで行う（画面を操作しても止まらない）
+    st.session_state["ranking_request"] = (target_url, int(limit))
+    _submit_job(
+        "ranking_job_id",
+        _fetch_ranking_job(target_url, int(limit), BEST_EFFORT_SECONDS if best_effort else None),
+        f"ランキング取得（{int(limit)} 件）",
+    )
+finished = _show_job("ranking_job_id")
+if finished is not None:
+    df = finished.result
+    report = get_fetch_report(df)
+    request_url, request_limit = st.session_state.get("ranking_request", (target_url, int(limit)))
+    # 時間内に取得できた分だけのときは、続きのページをバックグラウンドで取得する（チェックポイントから再開）
+    continue_fetch = report is not None and report.timed_out and not report.complete and not report.cancelled
+    if continue_fetch:
+        _submit_job("ranking_job_id", _fetch_ranking_job(request_url, request_limit), f"残りの取得（{request_limit} 件）")
+    if finished.status == FAILED:
+        st.error(f"取得中にエラーが発生しました: {finished.error}")
+    elif df is not None and not df.empty:
+        _set_shared_dataset("ranking_handle", df, {"url": request_url, "report": report})
+        # ポートフォリオのアラート: 前回の取得から変わった銘柄だけをルールと照合する（途中までの結果では照合しない）
+        alert_result = check_ranking(df, request_url or DEFAULT_URL) if not continue_fetch else {"fired": [], "errors": []}
+        for event in alert_result["fired"][:ALERT_SHOW_MAX]:
+            st.warning(event["message"], icon="🔔")
+        if len(alert_result["fired"]) > ALERT_SHOW_MAX:
+            st.caption(f"ほか {len(alert_result['fired']) - ALERT_SHOW_MAX} 件のアラートはアラート履歴に記録しました。")
+        for error in alert_result["errors"]:
+            st.error(f"アラートを送信できませんでした（{error}）")
+        if continue_fetch:
+            st.info(f"{report.summary()}。残りはバックグラウンドで取得を続けています。")
+        elif report is not None and not report.complete:
+            st.warning(f"{report.summary()}。もう一度「ランキングを取得」を押すと、続きのページから再開します。")
+    elif finished.status == CANCELLED:
+        st.info("取得を中止しました。")
+    elif continue_fetch:
+        st.info(f"{BEST_EFFORT_SECONDS:.0f}秒以内には取得できませんでした。バックグラウンドで取得を続けています。")
     else:
-        st.warning("データを取得できませんでした。URLを確認するか、しばらく経ってから再試行してください。")
-
-df = st.session_state.get("ranking_df")
-if df is not None and not df.empty:
-    st.success(f"表示件数: {len(df)} 件（条件により絞り込み可）")
+        detail = f"（{report.error}）" if report is not None and report.error else ""
+        st.warning(f"データを取得できませんでした{detail}。URLを確認するか、しばらく経ってから再試行してください。")
 
-    with st.expander("条件で絞り込み", expanded=False):
-        scope_label = st.radio("対象", ["上場銘柄すべて", "各市場ごとの全銘柄"], horizontal=True, key="scope_radio")
-        markets_filter = None
-        if scope_label == "各市場ごとの全銘柄":
-            market_options = get_unique_markets(df)
-            if market_options:
-                selected_markets = st.multiselect(
-                    "市場を選択（複数可）",
-                    options=market_options,
-                    default=[],
-                    key="markets_filter",
-                    help="選択した市場の銘柄だけに絞り込まれます。",
+df, ranking_handle = _current_ranking()
+if df is not None and not df.empty and "symbol" in df.columns:
+    # ランキング表にない業界・分野・株主優待を銘柄ページから付与する（取得済みの項目はキャッシュから）
+    if any(field not in df.columns for field in ENRICH_FIELDS) and st.button(
+        "業界・分野・株主優待を付与",
+        key="enrich_btn",
+        help="銘柄ごとのプロフィール・優待ページから取得して、絞り込みに使えるようにします。一度取得した銘柄はキャッシュを使います。",
+    ):
+        _submit_job("enrich_job_id", _enrich_job(df), f"業界・分野・株主優待の付与（{len(df)} 件）")
+    finished = _show_job("enrich_job_id")
+    if finished is not None:
+        enriched = finished.result
+        if finished.status == FAILED:
+            st.error(f"付与中にエラーが発生しました: {finished.error}")
+        elif enriched is not None:
+            stats = enriched.attrs.get("enrichment")
+            meta = get_registry().meta(ranking_handle)
+            _set_shared_dataset("ranking_handle", enriched, meta)
+            if stats:
+                st.success(
+                    f"{stats['symbols']} 銘柄に付与しました（キャッシュ {stats['cached']}・取得 {stats['fetched']}・失敗 {stats['failed']}）"
+                    + ("。中止したため、残りは次回取得します。" if finished.status == CANCELLED else "")
                 )
-                if selected_markets:
-                    markets_filter = selected_markets
-                else:
-                    st.caption("※1つ以上選択すると絞り込みがかかります。")
-            else:
-                st.caption("取得データから市場を抽出しています。データに「名称・コード・市場」列が含まれていれば、ここに市場一覧が表示されます。")
-        yield_min = st.number_input("配当利回り 最小（%）", value=None, min_value=0.0, max_value=100.0, step=0.1, key="y_min", placeholder="指定なし")
-        yield_max = st.number_input("配当利回り 最大（%）", value=None, min_value=0.0, max_value=100.0, step=0.1, key="y_max", placeholder="指定なし")
-        col_settlement = None
-        for c in df.columns:
-            if "決算" in str(c) and "月" in str(c):
-                col_settlement = c
-                break
-        settlement_months = None
-        if col_settlement:
-            options = sorted(df[col_settlement].astype(str).str.strip().dropna().unique().tolist())
-            if options:
-                selected = st.multiselect("決算年月", options=options, default=[], key="settlement")
-                if selected:
-                    settlement_months = selected
-        if not col_settlement:
-            st.caption("決算年月は取得データに含まれる場合に表示されます。")
-        industry = sector = None
-        has_benefit = None
-        for c in df.columns:
-            if "業界" in str(c):
-                opts = sorted(df[c].astype(str).str.strip().dropna().unique().tolist())
-                if opts:
-                    industry = st.multiselect("業界", options=opts, key="industry")
-                break
-        for c in df.columns:
-            if "分野" in str(c):
-                opts = sorted(df[c].astype(str).str.strip().dropna().unique().tolist())
-                if opts:
-                    sector = st.multiselect("分野", options=opts, key="sector")
-                break
-        for c in df.columns:
-            if "株主優待" in str(c) or ("優待" in str(c) and "配当" not in str(c)):
-                has_benefit = st.selectbox("株主優待", options=["指定なし", "あり", "なし"], key="benefit")
-                has_benefit = {"指定なし": None, "あり": True, "なし": False}[has_benefit]
-                break
-
-    display_df = apply_ranking_filters(
-        df,
-        yield_min=yield_min,
-        yield_max=yield_max,
-        settlement_months=settlement_months,
-        industry=industry or None,
-        sector=sector or None,
-        has_shareholder_benefit=has_benefit,
-        markets=markets_filter,
-    )
-    # 修正7: オプションでソート
-    sort_spec = st.session_state.get("ranking_sort")
-    if sort_spec:
-        col_name, ascending = sort_spec
-        if col_name in display_df.columns:
-            try:
-                display_df = display_df.sort_values(by=col_name, ascending=ascending, na_position="last")
-            except Exception:
-                pass
-
-    # 修正6: Symbol → オプション（表示用に列名変更。内部で symbol 参照するためコピーでリネーム）
-    has_symbol_col = "symbol" in display_df.columns
-    if has_symbol_col:
-        display_df = display_df.rename(columns={"symbol": "オプション"})
-
-    st.caption(f"絞り込み後: {len(display_df)} 件")
-    row_options = list(display_df.index)
-    row_labels = [
-        f"{display_df.loc[i].get('順位', '')} - {str(display_df.loc[i].get('名称・コード・市場', ''))[:35]}"
-        for i in row_options
-    ]
-    # 表の行をクリックするとオプションが開く（Streamlit 1.35+ の selection 利用）
-    _use_row_click = True
-    if "オプション" in display_df.columns and _use_row_click:
-        try:
-            event = st.dataframe(
-                display_df,
-                use_container_width=True,
-                hide_index=True,
-                on_select="rerun",
-                selection_mode="single-row",
-                key="ranking_df_selection",
-            )
-            if event and getattr(event, "selection", None) and getattr(event.selection, "rows", None) and event.selection.rows:
-                sel_idx = event.selection.rows[0]
-                if 0 <= sel_idx < len(row_options):
-                    new_idx = row_options[sel_idx]
-                    # まだオプションを開いていないときだけ開く（連続 rerun を防ぐ）
-                    if st.session_state.get("option_row_index") is None or st.session_state.get("option_row_index") != new_idx:
-                        st.session_state["option_row_index"] = new_idx
-                        st.rerun()
-        except TypeError:
-            _use_row_click = False
-    if not _use_row_click or "オプション" not in display_df.columns:
-        st.dataframe(display_df, use_container_width=True, hide_index=True, key="ranking_df_plain")
-
-    # オプション: 行クリックで開く（上で設定） or 従来の「行を選択」＋「オプションを開く」
-    if "オプション" in display_df.columns and not _use_row_click:
-        st.write("**オプション**（行を選択して「オプションを開く」でポートフォリオに追加またはソート）")
-        def _row_label(i):
-            if i in row_options:
-                return row_labels[row_options.index(i)]
-            return str(i)
-        row_sel = st.selectbox("行を選択", row_options, format_func=_row_label, key="option_row_sel")
-        open_opt = st.button("オプションを開く", key="open_option_btn")
-        if open_opt:
-            st.session_state["option_row_index"] = row_sel
-            st.rerun()
-    elif "オプション" in display_df.columns:
-        st.caption("👆 **上の表の行をクリック**すると、その行のオプション（ポートフォリオへ追加・ソート）が開きます。")
-
-    if st.session_state.get("option_row_index") is not None and "オプション" in display_df.columns:
-        row_idx = st.session_state["option_row_index"]
-        if row_idx in display_df.index:
-            with st.expander("オプション", expanded=True):
-                symbol_value = display_df.loc[row_idx].get("オプション", "")
-                # 銘柄名は「名称・コード・市場」列から取得（ポートフォリオ一覧で銘柄名を表示するため）
-                name_col = next((c for c in display_df.columns if "名称" in str(c) and "コード" in str(c)), None)
-                display_name_value = str(display_df.loc[row_idx].get(name_col, "")).strip() if name_col else ""
-                # 銘柄コードが空でも「名称・コード・市場」から4桁コードを抽出してフォールバック
-                if not (symbol_value and str(symbol_value).strip()) and display_name_value:
-                    m = re.search(r"\b([0-9]{4})\b", display_name_value)
-                    if m:
-                        symbol_value = f"{m.group(1)}.T"
-                sel_label = row_labels[row_options.index(row_idx)] if row_idx in row_options else str(row_idx)
-                st.write(f"選択行: {sel_label}")
-
-                st.write("**ポートフォリオに追加**")
-                portfolios = load_portfolios()
-
-                # 銘柄コードまたは表示名のどちらかがあれば追加可能
-                can_add = (symbol_value and str(symbol_value).strip()) or (display_name_value and display_name_value.strip())
-
-                # 新規リストをその場で作成（ページ遷移なし）
-                with st.form("option_new_list_form"):
-                    new_name = st.text_input("新規リスト名（任意）", key="opt_new_name", placeholder="入力して「作成して追加」で新規リストに追加")
-                    if st.form_submit_button("作成して追加"):
-                        if new_name and new_name.strip() and can_add:
-                            p = create_portfolio(new_name.strip())
-                            add_symbol_to_portfolio(p["id"], symbol_value or "", display_name=display_name_value or None)
-                            st.success(f"「{new_name.strip()}」を作成し、銘柄を追加しました。リストを更新しました。")
-                            st.rerun()
-                        elif not (new_name and new_name.strip()):
-                            st.warning("ポートフォリオ名を入力してください。")
-                        elif not can_add:
-                            st.warning("この行には銘柄コードも名称も取得できません。別の行を選んでください。")
-
-                # 既存リストから選択して追加（フォームで送信して確実に反映）
-                if portfolios:
-                    st.caption("既存のリストに追加する場合")
-                    with st.form("option_add_to_existing"):
-                        chosen = st.selectbox(
-                            "追加先",
-                            [p["id"] for p in portfolios],
-                            format_func=lambda pid: next((p["name"] for p in portfolios if p["id"] == pid), pid),
-                            key="opt_add_select",
-                        )
-                        add_clicked = st.form_submit_button("追加")
-                    if add_clicked:
-                        if can_add and add_symbol_to_portfolio(chosen, symbol_value or "", display_name=display_name_value or None):
-                            st.success("ポートフォリオに追加しました。")
-                            st.session_state["option_row_index"] = None
-                            st.rerun()
-                        elif not can_add:
-                            st.warning("この行には銘柄コードも名称も取得できません。")
-                        else:
-                            st.error("追加に失敗しました。ポートフォリオを確認してください。")
-                else:
-                    st.caption("上で新規作成すると、ここにリストが表示されます。")
-
-                st.write("**ソート**")
-                sort_options = [
-                    ("順位（昇順）", "順位", True),
-                    ("順位（降順）", "順位", False),
-                    ("名称あいうえお（昇順）", "名称・コード・市場", True),
-                    ("名称あいうえお（降順）", "名称・コード・市場", False),
-                    ("1株配当（昇順）", "1株配当", True),
-                    ("1株配当（降順）", "1株配当", False),
-                    ("取引値（昇順）", "取引値", True),
-                    ("取引値（降順）", "取引値", False),
-                ]
-                sort_cols = [c for c in display_df.columns if c != "オプション"]
-                available = [(lbl, col, asc) for lbl, col, asc in sort_options if col in sort_cols]
-                if available:
-                    sort_choice = st.selectbox("並び替え条件", range(len(available)), format_func=lambda i: available[i][0], key="sort_choice")
-                    if st.button("ソートを適用", key="sort_apply_btn"):
-                        st.session_state["ranking_sort"] = (available[sort_choice][1], available[sort_choice][2])
-                        st.session_state["option_row_index"] = None
-                        st.rerun()
-                if st.button("オプションを閉じる", key="close_option_btn"):
-                    st.session_state["option_row_index"] = None
-                    st.rerun()
-
-    csv = display_df.to_csv(index=False, encoding="utf-8-sig")
-    st.download_button(
-        label="CSVをダウンロード",
-        data=csv,
-        file_name="high_dividend_ranking.csv",
-        mime="text/csv",
-    )
+            df, ranking_handle = _current_ranking()
+if df is not None and not df.empty:
+    _ranking_results(df, ranking_handle)
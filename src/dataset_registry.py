@@ -0,0 +1,226 @@
+"""
+取得済みランキングをプロセス全体で共有するレジストリ。
+同じ内容のデータセットは1つだけ保持し、各セッションはハンドル（文字列）と自分の絞り込み状態だけを持つ。
+どのセッションからも参照されなくなったデータセットは破棄する。
+共有保存先（STATE_BACKEND_URL）があれば登録したデータセットを Arrow IPC（メタ情報は JSON）で書き込み、
+別のレプリカでもハンドルから引けるようにする（保存先の値からコードが実行されることはない）。
+"""
+import dataclasses
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable
+
+import pandas as pd
+import pyarrow as pa
+
+from main import FetchReport
+from state_backend import StateBackend, get_backend
+
+# 参照したまま戻ってこないセッション（ブラウザを閉じた等）の参照を解放するまでの秒数
+SESSION_IDLE_TTL = 3600.0
+META_KEY = b"dataset_meta"  # Arrow のスキーマに付けるメタ情報（JSON）のキー
+_META_TYPES = {"FetchReport": FetchReport}  # メタ情報の値として復元するデータクラス
+
+
+def _freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """共有用の DataFrame を作る。Arrow 型に変換し、NumPy 配列は書き込み不可にする。"""
+    frozen = df.copy().convert_dtypes(dtype_backend="pyarrow")
+    for col in frozen.columns:
+        values = frozen[col].array
+        arr = getattr(values, "_ndarray", None)
+        if arr is not None:
+            arr.flags.writeable = False
+    return frozen
+
+
+def _encode_meta(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and type(value).__name__ in _META_TYPES:
+        return {"__dataclass__": type(value).__name__, "fields": dataclasses.asdict(value)}
+    raise TypeError(f"共有保存先に書き込めないメタ情報です: {type(value).__name__}")
+
+
+def _decode_meta(obj: dict) -> Any:
+    cls = _META_TYPES.get(obj.get("__dataclass__", ""))
+    return cls(**obj["fields"]) if cls is not None else obj
+
+
+def dumps_dataset(df: pd.DataFrame, meta: dict) -> bytes:
+    """データセットとメタ情報を Arrow IPC ストリームのバイト列にする（メタ情報はスキーマのメタデータに JSON で入れる）。"""
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    encoded = json.dumps(meta, ensure_ascii=False, default=_encode_meta).encode("utf-8")
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), META_KEY: encoded})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def loads_dataset(value: bytes) -> tuple[pd.DataFrame, dict]:
+    """dumps_dataset の逆。読めないバイト列は ValueError（pyarrow.ArrowInvalid）。"""
+    table = pa.ipc.open_stream(pa.py_buffer(value)).read_all()
+    meta = json.loads((table.schema.metadata or {}).get(META_KEY, b"{}"), object_hook=_decode_meta)
+    return table.to_pandas(), meta
+
+
+def content_key(df: pd.DataFrame) -> str:
+    """列名と値から内容のハッシュを作る（同じ内容のデータセットを1つにまとめるため）。"""
+    h = hashlib.sha1()
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:20]
+
+
+class _Entry:
+    def __init__(self, df: pd.DataFrame, meta: dict):
+        self.df = df
+        self.meta = meta
+        self.refs: dict[str, float] = {}  # セッションID → 最終参照時刻
+        self.derived: dict[str, Any] = {}
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+
+
+class DatasetRegistry:
+    """
+    ハンドル → 共有データセットの対応表。スレッドセーフ。
+
+    get() で返す DataFrame は共有データの浅いコピーなので、列の追加・削除・並び替えは呼び出し側だけに効く。
+    値の書き換え（df.loc[...] = ...）はしないこと。
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, backend: StateBackend | None = None):
+        self.idle_ttl = idle_ttl
+        self.backend = backend
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def _store_remote(self, handle: str, entry: _Entry) -> None:
+        """共有保存先に書き込む（他のレプリカが参照しなくなれば idle_ttl で消える）。"""
+        if self.backend is not None:
+            self.backend.set(f"dataset:{handle}", dumps_dataset(entry.df, entry.meta), ttl=self.idle_ttl)
+
+    def _load_remote(self, handle: str) -> _Entry | None:
+        """このプロセスにないハンドルを共有保存先から読み込んで登録する。"""
+        if self.backend is None:
+            return None
+        value = self.backend.get(f"dataset:{handle}")
+        if value is None:
+            return None
+        try:
+            df, meta = loads_dataset(value)
+        except (ValueError, TypeError):
+            return None  # 壊れた値・別形式の値は読まない（取得し直してもらう）
+        with self._lock:
+            return self._entries.setdefault(handle, _Entry(_freeze(df), meta))
+
+    def put(self, df: pd.DataFrame, session_id: str, meta: dict | None = None) -> str:
+        """データセットを登録して session_id の参照を付け、ハンドルを返す。同じ内容が登録済みならそれを共有する。"""
+        handle = content_key(df)
+        with self._lock:
+            entry = self._entries.get(handle)
+            created = entry is None
+            if created:
+                entry = self._entries[handle] = _Entry(_freeze(df), dict(meta or {}))
+            elif meta:
+                entry.meta.update(meta)
+            entry.refs[session_id] = time.monotonic()
+        if created or meta:
+            self._store_remote(handle, entry)
+        return handle
+
+    def get(self, handle: str | None, session_id: str | None = None) -> pd.DataFrame | None:
+        """ハンドルのデータセットを返す（破棄済みなら None）。session_id を渡すと参照時刻を更新する。"""
+        if not handle:
+            return None
+        if handle not in self._entries:
+            self._load_remote(handle)
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            if session_id is not None:
+                entry.refs[session_id] = time.monotonic()
+            return entry.df.copy(deep=False)
+
+    def meta(self, handle: str | None) -> dict:
+        """登録時に渡したメタ情報（取得元URL・FetchReport 等）を返す。"""
+        if handle and handle not in self._entries:
+            self._load_remote(handle)
+        with self._lock:
+            entry = self._entries.get(handle) if handle else None
+            return dict(entry.meta) if entry else {}
+
+    def acquire(self, handle: str, session_id: str) -> bool:
+        """既存データセットに session_id の参照を付ける。破棄済みなら False。"""
+        if handle not in self._entries:
+            self._load_remote(handle)
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return False
+            entry.refs[session_id] = time.monotonic()
+            return True
+
+    def release(self, handle: str | None, session_id: str) -> None:
+        """session_id の参照を外す。どこからも参照されなくなったら破棄する。"""
+        if not handle:
+            return
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return
+            entry.refs.pop(session_id, None)
+            if not entry.refs:
+                del self._entries[handle]
+
+    def derived(self, handle: str, key: str, factory: Callable[[pd.DataFrame], Any]) -> Any:
+        """データセットから作る派生物（索引など）をデータセットごとに1回だけ作って返す。破棄済みなら None。"""
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            if key in entry.derived:
+                return entry.derived[key]
+            df = entry.df
+        value = factory(df)
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None:
+                value = entry.derived.setdefault(key, value)
+        return value
+
+    def sweep(self, is_alive: Callable[[str], bool] | None = None) -> int:
+        """
+        終了したセッション（is_alive が False）と idle_ttl を超えて参照のないセッションの参照を外し、
+        参照がなくなったデータセットを破棄する。破棄した件数を返す。
+        """
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            for handle in list(self._entries):
+                entry = self._entries[handle]
+                for sid, seen in list(entry.refs.items()):
+                    if now - seen > self.idle_ttl or (is_alive is not None and not is_alive(sid)):
+                        del entry.refs[sid]
+                if not entry.refs:
+                    del self._entries[handle]
+                    evicted += 1
+        return evicted
+
+    def stats(self) -> dict:
+        """保持中のデータセット数・合計バイト数・参照セッション数。"""
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+                "sessions": len({sid for e in self._entries.values() for sid in e.refs}),
+            }
+
+
+_registry = DatasetRegistry(backend=get_backend())
+
+
+def get_registry() -> DatasetRegistry:
+    """プロセス全体で共有するレジストリを返す。"""
+    return _registry
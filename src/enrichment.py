@@ -0,0 +1,274 @@
+"""
+ランキング行への銘柄メタデータ（業界・分野・株主優待）の付与。
+Yahoo!ファイナンスのランキング表にはこれらの列がないため、銘柄ごとのプロフィール・優待ページを取得して symbol で結合する。
+取得結果は項目ごとの取得時刻つきで長期キャッシュ（STATE_BACKEND_URL、未設定ならデータフォルダの SQLite）に保存し、
+有効期限（FIELD_TTL）内の項目は取得しない。2回目以降の付与はキャッシュの一括読み取りだけで済む。
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from urllib.parse import quote
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from main import FetchError, HTTPClientError, _get_response, _normalize_cell, _soup_from_bytes
+from portfolio_data import DEFAULT_PATH
+from state_backend import SQLiteBackend, StateBackend, get_backend
+
+FIELD_INDUSTRY = "業界"  # 東証33業種
+FIELD_SECTOR = "分野"  # TOPIX-17 業種（33業種から決まる）
+FIELD_BENEFIT = "株主優待"  # あり / なし
+ENRICH_FIELDS = (FIELD_INDUSTRY, FIELD_SECTOR, FIELD_BENEFIT)
+
+SOURCE_PROFILE = "profile"
+SOURCE_INCENTIVE = "incentive"
+SOURCE_URLS = {
+    SOURCE_PROFILE: "https://finance.yahoo.co.jp/quote/{symbol}/profile",
+    SOURCE_INCENTIVE: "https://finance.yahoo.co.jp/quote/{symbol}/incentive",
+}
+FIELD_SOURCE = {FIELD_INDUSTRY: SOURCE_PROFILE, FIELD_SECTOR: SOURCE_PROFILE, FIELD_BENEFIT: SOURCE_INCENTIVE}
+
+DAY = 86400.0
+FIELD_TTL = {
+    FIELD_INDUSTRY: 30 * DAY,  # 業種の変更はまれ
+    FIELD_SECTOR: 30 * DAY,
+    FIELD_BENEFIT: 7 * DAY,  # 優待の新設・廃止は随時
+}
+
+ENRICH_WORKERS = 4  # 銘柄ページを並行して取得するスレッド数
+ENRICH_RATE = 2.0  # 銘柄ページ取得の上限（リクエスト/秒。プロセス内の全ジョブで共有）
+CACHE_KEY_PREFIX = "profile:"
+CACHE_PATH = DEFAULT_PATH.parent / "profile_cache.db"  # STATE_BACKEND_URL 未設定時のキャッシュ
+# この応答のページは「該当なし」として項目ごとの有効期限までキャッシュする（401 / 403 は拒否されただけなので次回また取得する）
+MISSING_PAGE_STATUS = frozenset({400, 404, 410})
+
+# 東証33業種 → TOPIX-17 業種
+SECTOR_OF_INDUSTRY = {
+    "水産・農林業": "食品", "食料品": "食品",
+    "鉱業": "エネルギー資源", "石油・石炭製品": "エネルギー資源",
+    "建設業": "建設・資材", "ガラス・土石製品": "建設・資材", "金属製品": "建設・資材",
+    "繊維製品": "素材・化学", "パルプ・紙": "素材・化学", "化学": "素材・化学",
+    "医薬品": "医薬品",
+    "ゴム製品": "自動車・輸送機", "輸送用機器": "自動車・輸送機",
+    "鉄鋼": "鉄鋼・非鉄", "非鉄金属": "鉄鋼・非鉄",
+    "機械": "機械",
+    "電気機器": "電機・精密", "精密機器": "電機・精密",
+    "その他製品": "情報通信・サービスその他", "情報・通信業": "情報通信・サービスその他", "サービス業": "情報通信・サービスその他",
+    "電気・ガス業": "電力・ガス",
+    "陸運業": "運輸・物流", "海運業": "運輸・物流", "空運業": "運輸・物流", "倉庫・運輸関連業": "運輸・物流",
+    "卸売業": "商社・卸売",
+    "小売業": "小売",
+    "銀行業": "銀行",
+    "証券、商品先物取引業": "金融（除く銀行）", "保険業": "金融（除く銀行）", "その他金融業": "金融（除く銀行）",
+    "不動産業": "不動産",
+}
+
+_INDUSTRY_LABELS = ("業種分類", "業種")
+_NO_BENEFIT_MARKERS = ("株主優待はありません", "優待はありません", "優待情報はありません", "株主優待を実施していません")
+_BENEFIT_MARKERS = ("優待内容", "権利確定月", "必要株数")
+
+
+class RateLimiter:
+    """トークンバケット（rate 回/秒、burst 回まで連続可）。スレッド間で共有する。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event: threading.Event | None = None) -> bool:
+        """1回分の枠が空くまで待つ。待っている間に cancel_event がセットされたら False。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                wait = (1.0 - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+_limiter = RateLimiter(ENRICH_RATE)
+_cache: StateBackend | None = None
+_cache_lock = threading.Lock()
+
+
+def _cache_backend() -> StateBackend:
+    """キャッシュの保存先。共有保存先があればそれを使い、なければデータフォルダの SQLite。"""
+    global _cache
+    backend = get_backend()
+    if backend is not None:
+        return backend
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteBackend(CACHE_PATH)
+        return _cache
+
+
+def _labeled_value(soup: BeautifulSoup, labels: tuple[str, ...]) -> str | None:
+    """見出し（th / dt など）が labels のいずれかであるセルの、隣の値。"""
+    for label in labels:
+        for node in soup.find_all(string=lambda s: _normalize_cell(s) == label):
+            el = node.parent
+            # 見出しの文字が span 等で包まれている場合は、兄弟要素が見つかるまで親をたどる
+            for _ in range(3):
+                if el is None:
+                    break
+                sibling = el.find_next_sibling()
+                if sibling is not None:
+                    text = _normalize_cell(sibling.get_text(" "))
+                    if text:
+                        return text
+                el = el.parent
+    return None
+
+
+def _parse_profile(soup: BeautifulSoup) -> dict[str, str | None]:
+    industry = _labeled_value(soup, _INDUSTRY_LABELS)
+    return {FIELD_INDUSTRY: industry, FIELD_SECTOR: SECTOR_OF_INDUSTRY.get(industry) if industry else None}
+
+
+def _parse_incentive(soup: BeautifulSoup) -> dict[str, str | None]:
+    text = _normalize_cell(soup.get_text(" "))
+    if any(m in text for m in _NO_BENEFIT_MARKERS):
+        return {FIELD_BENEFIT: "なし"}
+    if any(m in text for m in _BENEFIT_MARKERS):
+        return {FIELD_BENEFIT: "あり"}
+    return {FIELD_BENEFIT: None}
+
+
+_PARSERS = {SOURCE_PROFILE: _parse_profile, SOURCE_INCENTIVE: _parse_incentive}
+
+
+def _fetch_source(symbol: str, source: str, cancel_event: threading.Event | None) -> dict[str, str | None]:
+    """
+    銘柄の1ページを取得して項目を読み取る。ページがない（MISSING_PAGE_STATUS）銘柄は、そのページの項目をすべて値なしで返す。
+    取得できなければ FetchError。
+    """
+    if not _limiter.acquire(cancel_event):
+        raise FetchError(f"キャンセルされました: {symbol}")
+    try:
+        resp = _get_response(SOURCE_URLS[source].format(symbol=quote(symbol)), cancel_event)
+    except HTTPClientError as e:
+        if e.status_code not in MISSING_PAGE_STATUS:
+            raise
+        return {field: None for field, src in FIELD_SOURCE.items() if src == source}
+    return _PARSERS[source](_soup_from_bytes(resp.content, resp.headers.get("Content-Type")))
+
+
+def _store(backend: StateBackend, symbol: str, values: dict[str, str | None], fetched_at: float) -> None:
+    """取得した項目を、キャッシュ済みの他の項目とマージして保存する（値なし = 該当なしも保存する）。"""
+    def merge(old: bytes | None) -> bytes:
+        record = json.loads(old) if old else {}
+        record.update({field: [value, fetched_at] for field, value in values.items()})
+        return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+    backend.update(CACHE_KEY_PREFIX + symbol, merge, ttl=max(FIELD_TTL.values()))
+
+
+def cached_profiles(
+    symbols: list[str],
+    fields: tuple[str, ...] = ENRICH_FIELDS,
+    now: float | None = None,
+) -> tuple[dict[str, dict[str, str | None]], dict[str, set[str]]]:
+    """
+    キャッシュから symbols の項目を読む。(銘柄 → {項目: 値}, 銘柄 → 取得し直すページの集合) を返す。
+    期限切れの項目も値は返す（取り直しに失敗したときはその値を使う）。
+    """
+    now = time.time() if now is None else now
+    raw = _cache_backend().get_many([CACHE_KEY_PREFIX + s for s in symbols])
+    profiles: dict[str, dict[str, str | None]] = {}
+    stale: dict[str, set[str]] = {}
+    for symbol, value in zip(symbols, raw):
+        record = json.loads(value) if value else {}
+        values = {}
+        for field in fields:
+            item = record.get(field)
+            if item is None or now - item[1] > FIELD_TTL[field]:
+                stale.setdefault(symbol, set()).add(FIELD_SOURCE[field])
+            if item is not None:
+                values[field] = item[0]
+        profiles[symbol] = values
+    return profiles, stale
+
+
+def fetch_profiles(
+    stale: dict[str, set[str]],
+    progress: Callable[[int, int], None] | None = None,
+    cancel_event: threading.Event | None = None,
+) -> tuple[int, int]:
+    """
+    銘柄ごとに必要なページを取得してキャッシュに保存する（ENRICH_WORKERS 並行・ENRICH_RATE 回/秒まで）。
+    (保存した銘柄数, 失敗した銘柄数) を返す。ページがない銘柄は値なしでキャッシュし、
+    それ以外の失敗はキャッシュしない（次回また取得する）。
+    """
+    backend = _cache_backend()
+    symbols = list(stale)
+    counts = {"done": 0, "fetched": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def work(symbol: str) -> None:
+        values: dict[str, str | None] = {}
+        ok = True
+        for source in sorted(stale[symbol]):
+            if cancel_event is not None and cancel_event.is_set():
+                ok = False
+                break
+            try:
+                values.update(_fetch_source(symbol, source, cancel_event))
+            except FetchError:
+                ok = False
+        if values:
+            _store(backend, symbol, values, time.time())
+        with lock:
+            counts["done"] += 1
+            counts["fetched" if ok else "failed"] += 1
+            done = counts["done"]
+        if progress:
+            progress(done, len(symbols))
+
+    with ThreadPoolExecutor(max_workers=ENRICH_WORKERS) as executor:
+        list(executor.map(work, symbols))
+    return counts["fetched"], counts["failed"]
+
+
+def enrich_ranking(
+    df: pd.DataFrame,
+    fields: tuple[str, ...] = ENRICH_FIELDS,
+    progress: Callable[[int, int], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    fetch: bool = True,
+) -> pd.DataFrame:
+    """
+    ランキングに fields の列を symbol で結合したコピーを返す（symbol 列の前に挿入。すでにある列は上書きしない）。
+    キャッシュにない・期限切れの項目は fetch=True なら取得する。中止された場合はそこまでの結果で結合する。
+    集計は attrs["enrichment"]（symbols / cached / fetched / failed）。
+    """
+    fields = tuple(f for f in fields if f not in df.columns)
+    out = df.copy()
+    if "symbol" not in df.columns or not fields:
+        return out
+    keys = df["symbol"].astype(str).str.strip()
+    symbols = [s for s in pd.unique(keys) if s]
+    profiles, stale = cached_profiles(symbols, fields)
+    stats = {"symbols": len(symbols), "cached": len(symbols) - len(stale), "fetched": 0, "failed": 0}
+    if fetch and stale:
+        stats["fetched"], stats["failed"] = fetch_profiles(stale, progress, cancel_event)
+        profiles.update(cached_profiles(list(stale), fields)[0])
+    at = out.columns.get_loc("symbol")
+    for offset, field in enumerate(fields):
+        column = {s: values.get(field) for s, values in profiles.items()}
+        out.insert(at + offset, field, keys.map(column).astype(object))
+    out.attrs["enrichment"] = stats
+    return out
@@ -0,0 +1,152 @@
+"""
+絞り込み用のファセット索引。
+データセットごとに1回だけ「値 → 行ビットマップ」を作り、選択肢の一覧と複数条件の絞り込みを索引から答える。
+"""
+import numpy as np
+import pandas as pd
+
+from main import _extract_market_from_name_cell, parse_numeric_series
+
+# ファセット名 → 画面・apply_ranking_filters 上の意味
+FACET_SETTLEMENT = "settlement"  # 決算年月
+FACET_INDUSTRY = "industry"  # 業界
+FACET_SECTOR = "sector"  # 分野
+FACET_BENEFIT = "benefit"  # 株主優待（あり/なし）
+FACET_MARKET = "market"  # 名称・コード・市場 から抽出した市場
+
+BENEFIT_TRUE_VALUES = ("あり", "1", "true", "yes")
+MARKET_NAME_MAX = 20
+
+
+def find_settlement_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "決算" in str(c) and "月" in str(c)), None)
+
+
+def find_industry_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "業界" in str(c)), None)
+
+
+def find_sector_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "分野" in str(c)), None)
+
+
+def find_benefit_column(df: pd.DataFrame):
+    """株主優待の有無の列。「優待配当利回り」のような利回り列は対象外。"""
+    return next((c for c in df.columns if "株主優待" in str(c) or ("優待" in str(c) and "配当" not in str(c))), None)
+
+
+def find_name_market_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "名称" in str(c) and "コード" in str(c) and "市場" in str(c)), None)
+
+
+def find_yield_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "配当利回り" in str(c)), None)
+
+
+def _bitmaps(values: pd.Series) -> dict[str, np.ndarray]:
+    """値ごとの行ビットマップ（np.packbits で詰めたもの）を作る。"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    out = {}
+    for i, value in enumerate(uniques):
+        out[str(value)] = np.packbits(codes == i)
+    return out
+
+
+class FacetIndex:
+    """1つのデータセット（行の並びを変えない前提）に対するファセット索引。"""
+
+    def __init__(self, n_rows: int, columns: dict[str, object], bitmaps: dict[str, dict[str, np.ndarray]], yields: np.ndarray | None):
+        self.n_rows = n_rows
+        self.columns = columns
+        self.bitmaps = bitmaps
+        self.yields = yields
+        self._all = np.packbits(np.ones(n_rows, dtype=bool))
+        self._options: dict[str, list[str]] = {}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "FacetIndex":
+        columns: dict[str, object] = {}
+        bitmaps: dict[str, dict[str, np.ndarray]] = {}
+        for facet, finder in (
+            (FACET_SETTLEMENT, find_settlement_column),
+            (FACET_INDUSTRY, find_industry_column),
+            (FACET_SECTOR, find_sector_column),
+        ):
+            col = finder(df)
+            if col is not None:
+                columns[facet] = col
+                bitmaps[facet] = _bitmaps(df[col].astype(str).str.strip())
+        col = find_benefit_column(df)
+        if col is not None:
+            columns[FACET_BENEFIT] = col
+            truthy = df[col].astype(str).str.strip().str.lower().isin(BENEFIT_TRUE_VALUES).to_numpy()
+            bitmaps[FACET_BENEFIT] = {"あり": np.packbits(truthy), "なし": np.packbits(~truthy)}
+        col = find_name_market_column(df)
+        if col is not None:
+            columns[FACET_MARKET] = col
+            bitmaps[FACET_MARKET] = _bitmaps(df[col].astype(str).map(_extract_market_from_name_cell))
+        yield_col = find_yield_column(df)
+        yields = None
+        if yield_col is not None:
+            yields = parse_numeric_series(df[yield_col]).to_numpy(dtype="float64")
+        return cls(len(df), columns, bitmaps, yields)
+
+    def has(self, facet: str) -> bool:
+        return facet in self.bitmaps
+
+    def options(self, facet: str) -> list[str]:
+        """ファセットの選択肢（ソート済み）。市場は空文字や長すぎる値を除く。"""
+        cached = self._options.get(facet)
+        if cached is not None:
+            return cached
+        values = [v for v in self.bitmaps.get(facet, {}) if v and v != "nan"]
+        if facet == FACET_MARKET:
+            values = [v for v in values if len(v) <= MARKET_NAME_MAX]
+        self._options[facet] = sorted(values)
+        return self._options[facet]
+
+    def _any_of(self, facet: str, values) -> np.ndarray:
+        """values のいずれかに一致する行（OR）のビットマップ。"""
+        maps = self.bitmaps.get(facet, {})
+        out = np.zeros_like(self._all)
+        for v in values:
+            bm = maps.get(v)
+            if bm is not None:
+                out |= bm
+        return out
+
+    def filter_mask(
+        self,
+        yield_min: float | None = None,
+        yield_max: float | None = None,
+        settlement_months: list[str] | None = None,
+        industry: list[str] | None = None,
+        sector: list[str] | None = None,
+        has_shareholder_benefit: bool | None = None,
+        markets: list[str] | None = None,
+    ) -> np.ndarray:
+        """apply_ranking_filters と同じ条件を、ビットマップの AND で評価した行マスク（bool 配列）を返す。"""
+        bits = self._all.copy()
+        for facet, selected in (
+            (FACET_SETTLEMENT, settlement_months),
+            (FACET_INDUSTRY, industry),
+            (FACET_SECTOR, sector),
+            (FACET_MARKET, markets),
+        ):
+            if selected and self.has(facet):
+                bits &= self._any_of(facet, selected)
+        if has_shareholder_benefit is not None and self.has(FACET_BENEFIT):
+            bits &= self.bitmaps[FACET_BENEFIT]["あり" if has_shareholder_benefit else "なし"]
+        mask = np.unpackbits(bits, count=self.n_rows).astype(bool)
+        if self.yields is not None:
+            with np.errstate(invalid="ignore"):
+                mask &= ~np.isnan(self.yields)
+                if yield_min is not None:
+                    mask &= self.yields >= yield_min
+                if yield_max is not None:
+                    mask &= self.yields <= yield_max
+        return mask
+
+    def filter_positions(self, **conditions) -> np.ndarray:
+        """filter_mask に当てはまる行の位置（昇順）。"""
+        return np.flatnonzero(self.filter_mask(**conditions))
@@ -0,0 +1,191 @@
+"""
+バックグラウンドジョブ（ランキング取得など時間のかかる処理）。
+Streamlit のスクリプト実行とは別のワーカースレッドで動かし、画面はジョブIDで進捗と結果を取りに来る。
+再実行（rerun）でジョブは止まらず、複数ユーザーのジョブは依頼者ごとに順番に割り当てる。
+"""
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+JOB_WORKERS = 2  # 同時に動かすジョブ数
+JOB_MAX_PER_OWNER = 1  # 1人（セッション）が同時に使えるワーカー数
+JOB_RETENTION = 1800.0  # 終了したジョブ（結果）を残す秒数
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """1件のジョブ。fn(job) の中で job.cancel_event を見て中断し、job.set_progress で進捗を知らせる。"""
+
+    job_id: str
+    owner: str
+    label: str
+    fn: Callable[["Job"], Any]
+    status: str = QUEUED
+    progress: dict = field(default_factory=dict)
+    result: Any = None
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def set_progress(self, **values) -> None:
+        self.progress = {**self.progress, **values}
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobManager:
+    """ジョブの受付・割り当て・状態の保持。スレッドセーフ。ワーカーは最初の submit で起動する。"""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_per_owner: int = JOB_MAX_PER_OWNER, retention: float = JOB_RETENTION):
+        self.workers = workers
+        self.max_per_owner = max_per_owner
+        self.retention = retention
+        self._jobs: dict[str, Job] = {}
+        self._queues: dict[str, deque[Job]] = {}  # 依頼者 → 待ちジョブ
+        self._owners: deque[str] = deque()  # 待ちジョブのある依頼者（この順に1件ずつ割り当てる）
+        self._running: dict[str, int] = {}  # 依頼者 → 実行中の件数
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+
+    def _ensure_workers(self) -> None:
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, owner: str, fn: Callable[[Job], Any], label: str = "") -> str:
+        """ジョブを受け付けてジョブIDを返す。"""
+        job = Job(job_id=uuid.uuid4().hex, owner=owner, label=label, fn=fn)
+        with self._cond:
+            self._purge_locked()
+            self._jobs[job.job_id] = job
+            if owner not in self._queues:
+                self._queues[owner] = deque()
+                self._owners.append(owner)
+            self._queues[owner].append(job)
+            self._ensure_workers()
+            self._cond.notify()
+        return job.job_id
+
+    def get(self, job_id: str | None) -> Job | None:
+        if not job_id:
+            return None
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> int | None:
+        """待ち中のジョブが何番目に割り当てられるか（0始まり、依頼者ごとの順番を考慮したおおよその値）。"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            queues = {o: list(q) for o, q in self._queues.items()}
+            order = []
+            for owner in itertools.cycle(list(self._owners)):
+                if not any(queues.values()):
+                    break
+                if queues.get(owner):
+                    order.append(queues[owner].pop(0))
+            return next((i for i, j in enumerate(order) if j is job), None)
+
+    def cancel(self, job_id: str) -> bool:
+        """ジョブを中断する（待ち中ならそのまま取り消し）。終了済み・不明なら False。"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                queue = self._queues.get(job.owner)
+                if queue is not None and job in queue:
+                    queue.remove(job)
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            return True
+
+    def jobs_for(self, owner: str) -> list[Job]:
+        with self._cond:
+            return [j for j in self._jobs.values() if j.owner == owner]
+
+    def forget(self, job_id: str) -> None:
+        """結果を受け取ったジョブを破棄する（実行中なら中断する）。"""
+        self.cancel(job_id)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def _purge_locked(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - (job.finished_at or now) > self.retention:
+                del self._jobs[job_id]
+
+    def _next_locked(self) -> Job | None:
+        """実行枠の空いている依頼者の先頭ジョブを、依頼者の順番（ラウンドロビン）で1件取り出す。"""
+        for _ in range(len(self._owners)):
+            owner = self._owners[0]
+            self._owners.rotate(-1)
+            queue = self._queues.get(owner)
+            while queue and queue[0].status != QUEUED:
+                queue.popleft()  # 取り消し済み
+            if not queue:
+                self._queues.pop(owner, None)
+                self._owners.remove(owner)
+                continue
+            if self._running.get(owner, 0) >= self.max_per_owner:
+                continue
+            job = queue.popleft()
+            if not queue:
+                self._queues.pop(owner, None)
+                self._owners.remove(owner)
+            return job
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_locked()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_locked()
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._running[job.owner] = self._running.get(job.owner, 0) + 1
+            try:
+                result = job.fn(job)
+                status, error = (CANCELLED if job.cancel_event.is_set() else DONE), ""
+            except Exception as e:
+                result, status, error = None, FAILED, f"{type(e).__name__}: {e}"
+            with self._cond:
+                job.result, job.status, job.error = result, status, error
+                job.finished_at = time.time()
+                self._running[job.owner] -= 1
+                if not self._running[job.owner]:
+                    del self._running[job.owner]
+                self._cond.notify_all()
+
+
+_manager = JobManager()
+
+
+def get_job_manager() -> JobManager:
+    """プロセス全体で共有するジョブマネージャーを返す。"""
+    return _manager
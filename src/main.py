@@ -1,9 +1,26 @@
 """
 High-Dividend Hunter: Yahoo!ファイナンス 配当利回りランキングのスクレイピングロジック
 """
+import codecs
+import math
+import os
+import multiprocessing
+import queue
+import random
 import re
+import threading
 import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from typing import Callable
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
 import requests
+from requests.compat import chardet  # apparent_encoding と同じ推定ライブラリ（charset_normalizer / chardet）
 from bs4 import BeautifulSoup
 import pandas as pd
 
@@ -83,6 +100,74 @@ def search_site_candidates(query: str, max_results: int = 20, include_english: b
     return out
 
 
+# 検索候補の事前確認（ランキング表があるか）の設定
+VALIDATE_TIMEOUT = 8.0  # 1URLあたりの接続・読み取りのタイムアウト秒数
+VALIDATE_MAX_BYTES = 512 * 1024  # 1URLあたり読む最大バイト数（表が先頭付近にあれば十分）
+VALIDATE_WORKERS = 8
+VALIDATE_CACHE_TTL = 3600.0  # 確認結果を使い回す秒数
+
+# URL → (ランキング表があるか, 確認時刻)
+_validation_cache: dict[str, tuple[bool, float]] = {}
+_validation_lock = threading.Lock()
+
+
+def _probe_ranking_page(url: str, timeout: float = VALIDATE_TIMEOUT, max_bytes: int = VALIDATE_MAX_BYTES) -> bool:
+    """URL の先頭 max_bytes だけを読み、_find_ranking_table で見つかる表があるかを返す。失敗・HTML 以外は False。"""
+    try:
+        with requests.get(url, headers=HEADERS, timeout=timeout, stream=True) as resp:
+            if resp.status_code >= 400:
+                return False
+            ctype = resp.headers.get("Content-Type", "")
+            if ctype and "html" not in ctype.lower():
+                return False
+            deadline = time.monotonic() + timeout
+            chunks, size = [], 0
+            for chunk in resp.iter_content(chunk_size=16384):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_bytes or time.monotonic() > deadline:
+                    break
+            body = b"".join(chunks)[:max_bytes]
+    except requests.RequestException:
+        return False
+    table, header_texts = _find_ranking_table(_soup_from_bytes(body, ctype))
+    return table is not None and bool(header_texts)
+
+
+def validate_site_candidates(
+    candidates: list[tuple[str, str]],
+    max_workers: int = VALIDATE_WORKERS,
+    timeout: float = VALIDATE_TIMEOUT,
+    max_bytes: int = VALIDATE_MAX_BYTES,
+) -> list[tuple[str, str, bool]]:
+    """
+    検索候補 (タイトル, URL) を並行して先読みし、ランキング表があるかを確かめる。
+    結果は URL ごとに VALIDATE_CACHE_TTL 秒キャッシュする。
+
+    Returns:
+        (タイトル, URL, ランキング表があるか) のリスト。表のある候補を先に、それぞれ元の順序のまま並べる。
+    """
+    now = time.monotonic()
+    verdicts: dict[str, bool] = {}
+    with _validation_lock:
+        for _, url in candidates:
+            cached = _validation_cache.get(url)
+            if cached is not None and now - cached[1] <= VALIDATE_CACHE_TTL:
+                verdicts[url] = cached[0]
+    pending = list(dict.fromkeys(url for _, url in candidates if url not in verdicts))
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            results = pool.map(lambda u: _probe_ranking_page(u, timeout, max_bytes), pending)
+            for url, ok in zip(pending, results):
+                verdicts[url] = ok
+        with _validation_lock:
+            checked_at = time.monotonic()
+            for url in pending:
+                _validation_cache[url] = (verdicts[url], checked_at)
+    checked = [(title, url, verdicts.get(url, False)) for title, url in candidates]
+    return [c for c in checked if c[2]] + [c for c in checked if not c[2]]
+
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -90,13 +175,236 @@ HEADERS = {
 }
 
 
-def _get_soup(url: str) -> BeautifulSoup:
-    """指定URLにGETし、BeautifulSoupオブジェクトを返す。失敗時は例外を投げる。"""
-    time.sleep(1)  # マナー: 必ず1秒以上間隔を空ける
-    resp = requests.get(url, headers=HEADERS, timeout=15)
-    resp.raise_for_status()
-    resp.encoding = resp.apparent_encoding or "utf-8"
-    return BeautifulSoup(resp.text, "html.parser")
+# リトライ・サーキットブレーカー・チェックポイントの設定
+RETRY_ATTEMPTS = 4  # 1ページあたりの最大試行回数
+RETRY_BASE_DELAY = 1.0  # 指数バックオフの初期待ち秒数（1, 2, 4, ... + ゆらぎ）
+RETRY_MAX_DELAY = 30.0  # 1回の待ち秒数の上限（Retry-After もこれで頭打ち）
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+# 再試行する例外（一時的な失敗）。それ以外の requests.RequestException（URLの誤り・リダイレクトの繰り返し等）は再試行しない
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+BREAKER_FAILURE_THRESHOLD = 5  # 同一ホストで連続この回数失敗したら遮断
+BREAKER_COOLDOWN = 60.0  # 遮断してから試行を再開するまでの秒数
+CHECKPOINT_TTL = 600.0  # 取得済みページを再利用する秒数（中断後の再開用）
+REQUEST_INTERVAL = 1.0  # 各リクエストの前に待つ秒数（マナー。負荷試験でローカルのスタブに向ける場合のみ 0 にする）
+REQUEST_TIMEOUT = 15.0  # 1リクエストの接続・読み取りのタイムアウト秒数（時間予算があれば残り時間で頭打ち）
+
+
+class FetchError(Exception):
+    """ページ取得がリトライ後も失敗したことを表す。"""
+
+
+class HTTPClientError(FetchError):
+    """再試行しない 4xx 応答（ページがない・アクセスが拒否された等）を表す。"""
+
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"HTTP {status_code}: {url}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(FetchError):
+    """ホストのサーキットブレーカーが開いていて、リクエストを送らなかったことを表す。"""
+
+
+class DeadlineExceeded(FetchError):
+    """時間予算（time_budget）内に終わらないため、リクエストを送らなかった・打ち切ったことを表す。"""
+
+
+class _Budget:
+    """
+    取得の時間予算。締め切りまでに終わりそうにないリクエストは送らない。
+    1リクエストにかかる時間は実測の移動平均で見積もる（実測がないうちはマナー待機の分だけ）。
+    """
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.request_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def timeout(self, url: str) -> float:
+        """次のリクエストのタイムアウト秒数。マナー待機と見積もりの応答時間が残りに収まらなければ DeadlineExceeded。"""
+        remaining = self.remaining() - REQUEST_INTERVAL
+        with self._lock:
+            estimate = self.request_seconds
+        if remaining <= 0 or remaining < estimate:
+            raise DeadlineExceeded(f"時間予算内に終わらないため取得しませんでした: {url}")
+        return min(REQUEST_TIMEOUT, remaining)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.request_seconds = seconds if not self.request_seconds else 0.7 * self.request_seconds + 0.3 * seconds
+
+
+class _CircuitBreaker:
+    """ホスト単位のサーキットブレーカー。連続失敗で開き、クールダウン後に1件だけ試す（半開）。"""
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(f"{host} への接続を一時停止中です（あと {remaining:.0f} 秒）")
+            # 半開: 次の結果で閉じるか再び開く
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, _CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _get_breaker(host: str) -> _CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = _CircuitBreaker()
+        return breaker
+
+
+def _retry_after_seconds(resp: requests.Response) -> float | None:
+    """Retry-After ヘッダー（秒数 または HTTP 日付）を待ち秒数に変換する。なければ None。"""
+    value = (resp.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    """attempt 回目（0始まり）の失敗後の待ち秒数（指数バックオフ + ゆらぎ）。"""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt) + random.uniform(0, RETRY_BASE_DELAY))
+
+
+def _get_response(
+    url: str,
+    cancel_event: threading.Event | None = None,
+    budget: _Budget | None = None,
+) -> requests.Response:
+    """
+    指定URLにGETする。接続エラー・タイムアウト・429/5xx は指数バックオフ（Retry-After があれば優先）で再試行する。
+    再試行しても失敗した場合、4xx の場合（HTTPClientError）、その他の requests の例外（URLの誤り等）の場合、
+    cancel_event がセットされた場合は FetchError を投げる。
+    budget を渡すと、締め切りに収まらないリクエスト・再試行は送らずに DeadlineExceeded を投げる（タイムアウトも残り時間まで）。
+    """
+    host = urlsplit(url).netloc
+    breaker = _get_breaker(host)
+    last_error = ""
+    for attempt in range(RETRY_ATTEMPTS):
+        if cancel_event is not None and cancel_event.is_set():
+            raise FetchError(f"キャンセルされました: {url}")
+        timeout = budget.timeout(url) if budget is not None else REQUEST_TIMEOUT
+        breaker.before_request(host)
+        time.sleep(REQUEST_INTERVAL)  # マナー: 必ず1秒以上間隔を空ける
+        delay = _backoff_delay(attempt)
+        started = time.monotonic()
+        try:
+            resp = requests.get(url, headers=HEADERS, timeout=timeout)
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, requests.Timeout) and timeout < REQUEST_TIMEOUT:
+                # 残り時間で縮めたタイムアウト: ホストの失敗には数えない
+                raise DeadlineExceeded(f"時間予算を使い切ったため打ち切りました: {url}") from e
+            breaker.record_failure()
+            last_error = f"{type(e).__name__}: {e}"
+        except requests.RequestException as e:
+            raise FetchError(f"{type(e).__name__}: {e}") from e
+        else:
+            if budget is not None:
+                budget.record(time.monotonic() - started)
+            if resp.status_code in RETRYABLE_STATUS:
+                breaker.record_failure()
+                last_error = f"HTTP {resp.status_code}"
+                retry_after = _retry_after_seconds(resp)
+                if retry_after is not None:
+                    delay = min(RETRY_MAX_DELAY, retry_after)
+            elif resp.status_code >= 400:
+                breaker.record_success()  # ホストは応答している
+                raise HTTPClientError(resp.status_code, url)
+            else:
+                breaker.record_success()
+                return resp
+        if attempt < RETRY_ATTEMPTS - 1:
+            if budget is not None and delay >= budget.remaining():
+                raise DeadlineExceeded(f"時間予算内に再試行できません（{last_error}）: {url}")
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+    raise FetchError(f"{last_error}（{RETRY_ATTEMPTS} 回試行）: {url}")
+
+
+# 文字コードの判定: BOM → Content-Type の charset → 先頭の <meta charset> → 統計的な推定（最後の手段）
+SNIFF_BYTES = 4096  # <meta charset> を探す先頭のバイト数
+_CONTENT_TYPE_CHARSET_PATTERN = re.compile(r"charset\s*=\s*[\"']?([^\s;\"']+)", re.IGNORECASE)
+_META_CHARSET_PATTERN = re.compile(rb"<meta[^>]+?charset\s*=\s*[\"']?\s*([A-Za-z0-9_.:\-]+)", re.IGNORECASE)
+# ブラウザと同じく、Shift_JIS の宣言は拡張文字（丸数字・髙など）を含む cp932 として読む
+_ENCODING_ALIASES = {"shift_jis": "cp932", "sjis": "cp932", "x-sjis": "cp932", "windows-31j": "cp932", "ms932": "cp932"}
+
+
+def _normalize_encoding(name: str | bytes | None) -> str | None:
+    """宣言された文字コード名を Python のコーデック名にする。未知の名前は None。"""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode("ascii", "ignore")
+    name = _ENCODING_ALIASES.get(name.strip().lower(), name.strip())
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def _detect_encoding(content: bytes, content_type: str | None = None) -> tuple[str, str]:
+    """
+    HTML のバイト列の文字コードと、その決め方（"bom" / "header" / "meta" / "detected"）を返す。
+    本文全体を見る統計的な推定（apparent_encoding と同じ chardet / charset_normalizer）は、宣言がないときだけ行う。
+    """
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if content.startswith(bom):
+            return encoding, "bom"
+    m = _CONTENT_TYPE_CHARSET_PATTERN.search(content_type or "")
+    encoding = _normalize_encoding(m.group(1)) if m else None
+    if encoding:
+        return encoding, "header"
+    m = _META_CHARSET_PATTERN.search(content[:SNIFF_BYTES])
+    encoding = _normalize_encoding(m.group(1)) if m else None
+    if encoding:
+        return encoding, "meta"
+    detected = chardet.detect(content)["encoding"] if chardet is not None else None
+    return _normalize_encoding(detected) or "utf-8", "detected"
+
+
+def _soup_from_bytes(content: bytes, content_type: str | None = None) -> BeautifulSoup:
+    """
+    HTML のバイト列から BeautifulSoup オブジェクトを作る。
+    本文はバイト列のままパーサーに渡し、判定した文字コードで1回だけデコードする（resp.text のコピーを作らない）。
+    """
+    encoding, _ = _detect_encoding(content, content_type)
+    return BeautifulSoup(content, "html.parser", from_encoding=encoding)
 
 
 def _normalize_cell(text: str) -> str:
@@ -125,11 +433,98 @@ def _find_ranking_table(soup: BeautifulSoup):
     return None, []
 
 
-def _parse_table_rows(table, header_texts: list) -> list[dict]:
-    """テーブルからデータ行をパースし、辞書のリストを返す。"""
-    rows_data = []
+class RowColumns:
+    """
+    ランキング行を列ごとのリストに追記するビルダー。
+    列スキーマ（ヘッダー → 列名）はページごとに1回だけ決め、行ごとの辞書は作らない。
+    append() は行を溜めるだけで、flush()（extend / to_frame からも呼ぶ）でまとめて zip で列に転置する。
+    ヘッダーより多いセルがあった行のみ col_N 列を追加し、それ以前の行は None で埋める。
+    """
+
+    def __init__(self, header_texts: list[str]):
+        # 同じ見出しが複数ある場合は（辞書で行を作っていたときと同じく）後ろの列の値を採用する
+        self.header_keys = [h or f"col_{i}" for i, h in enumerate(header_texts)]
+        self.columns: dict[str, list] = {k: [] for k in self.header_keys}
+        self.columns.setdefault("symbol", [])
+        self._slot_of = {k: i for i, k in enumerate(self.header_keys)}
+        self._overflow_keys: set[str] = set()
+        self._pending: list[list[str]] = []
+        self._pending_symbols: list[str] = []
+        self.n_rows = 0
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _ensure_column(self, key: str, n_rows: int) -> list:
+        col = self.columns.get(key)
+        if col is None:
+            col = self.columns[key] = [None] * n_rows
+        return col
+
+    def append(self, cell_texts: list[str], symbol: str) -> None:
+        """1行分のセル文字列と銘柄コードを追記する（列への転置は flush でまとめて行う）。"""
+        self._pending.append(cell_texts)
+        self._pending_symbols.append(symbol)
+        self.n_rows += 1
+
+    def flush(self) -> None:
+        """溜めた行を列に転置する。セル数が揃わない行は None で埋めてから転置する。"""
+        rows = self._pending
+        if not rows:
+            return
+        start = self.n_rows - len(rows)
+        widths = {len(r) for r in rows}
+        width = max(widths)
+        if len(widths) > 1:
+            rows = [r + [None] * (width - len(r)) if len(r) < width else r for r in rows]
+        transposed = list(zip(*rows))
+        columns = self.columns
+        for key, slot in self._slot_of.items():
+            columns[key].extend(transposed[slot] if slot < width else [None] * len(rows))
+        for i in range(len(self.header_keys), width):
+            key = f"col_{i}"
+            self._ensure_column(key, start).extend(transposed[i])
+            self._overflow_keys.add(key)
+        columns["symbol"].extend(self._pending_symbols)
+        # ヘッダーにない余り列（col_N）は、このまとまりにセルがなければ None で揃える
+        for key in self._overflow_keys:
+            col = columns[key]
+            if len(col) < self.n_rows:
+                col.extend([None] * (self.n_rows - len(col)))
+        self._pending = []
+        self._pending_symbols = []
+
+    def extend(self, other: "RowColumns") -> None:
+        """別ページ分の列を後ろに連結する。列がずれている場合は None で揃える。"""
+        self.flush()
+        other.flush()
+        for key, values in other.columns.items():
+            if key not in self.columns:
+                self._overflow_keys.add(key)
+            self._ensure_column(key, self.n_rows).extend(values)
+        self.n_rows += other.n_rows
+        for col in self.columns.values():
+            if len(col) < self.n_rows:
+                col.extend([None] * (self.n_rows - len(col)))
+
+    def to_frame(self, limit: int | None = None) -> pd.DataFrame:
+        """列ごとのリストから DataFrame を作る（列順: 見出し列, col_N, symbol）。"""
+        self.flush()
+        keys = [k for k in self.columns if k != "symbol"] + ["symbol"]
+        n = self.n_rows if limit is None else min(limit, self.n_rows)
+        return pd.DataFrame({k: self.columns[k][:n] for k in keys})
+
+
+def _parse_table_rows(table, header_texts: list, max_rows: int | None = None) -> RowColumns:
+    """テーブルからデータ行をパースし、列ごとに追記した RowColumns を返す。max_rows 行に達したら残りの行は読まない。"""
+    out = RowColumns(header_texts)
     tbody = table.find("tbody") or table
     rows = tbody.find_all("tr")
+    # 「名称・コード・市場」系の列位置（リンクから銘柄コードが取れない行のフォールバック用）はページで1回だけ探す
+    name_slot = next(
+        (i for i, h in enumerate(header_texts) if "名称" in (h or "") and "コード" in (h or "")),
+        None,
+    )
 
     for tr in rows:
         cells = tr.find_all(["td", "th"])
@@ -140,53 +535,185 @@ def _parse_table_rows(table, header_texts: list) -> list[dict]:
         if cell_texts and cell_texts[0] == "順位":
             continue
         # 列数がヘッダーと揃わない場合はスキップ
-        n = min(len(header_texts), len(cell_texts))
-        if n == 0:
+        if min(len(header_texts), len(cell_texts)) == 0:
             continue
-        row_dict = {}
-        for i in range(n):
-            key = header_texts[i] or f"col_{i}"
-            row_dict[key] = cell_texts[i]
-        # 余った列は col_N で追加
-        for i in range(n, len(cell_texts)):
-            row_dict[f"col_{i}"] = cell_texts[i]
         # 銘柄コード: 先頭セル内の quote/XXXX リンクから取得（ポートフォリオ追加用）
         symbol = ""
-        if cells:
-            a = cells[0].find("a", href=True)
-            if a and "quote/" in a["href"]:
-                symbol = a["href"].rstrip("/").split("quote/")[-1].split("?")[0] or ""
+        a = cells[0].find("a", href=True)
+        if a and "quote/" in a["href"]:
+            symbol = a["href"].rstrip("/").split("quote/")[-1].split("?")[0] or ""
         # リンクから取れない場合は「名称・コード・市場」系のセルから4桁コードを抽出（フォールバック）
-        if not symbol and header_texts:
-            for i, h in enumerate(header_texts):
-                if "名称" in (h or "") and "コード" in (h or ""):
-                    cell_val = cell_texts[i] if i < len(cell_texts) else ""
-                    code = _extract_code_from_name_cell(cell_val)
-                    if code:
-                        symbol = f"{code}.T"
-                    break
-        row_dict["symbol"] = symbol
-        rows_data.append(row_dict)
-    return rows_data
+        if not symbol and name_slot is not None:
+            code = _extract_code_from_name_cell(cell_texts[name_slot] if name_slot < len(cell_texts) else "")
+            if code:
+                symbol = f"{code}.T"
+        out.append(cell_texts, symbol)
+        if max_rows is not None and len(out) >= max_rows:
+            break
+    out.flush()  # 列に転置してから返す（パースのプロセスからは列ごとのリストで受け取る）
+    return out
+
+
+# ランキングページの件数表記（例: '1～50件 / 9,999件中'）
+_PAGE_RANGE_PATTERN = re.compile(r"([\d,]+)\s*[～〜~\-－]\s*([\d,]+)\s*件\s*/\s*([\d,]+)\s*件中")
+
+
+def _parse_page_info(soup: BeautifulSoup) -> tuple[int, int] | None:
+    """1ページ目の「a～b件 / n件中」から (総件数 n, 1ページの件数 b-a+1) を読む。表記がなければ None。"""
+    for node in soup.find_all(string=re.compile("件中")):
+        # 数字が別タグに分かれている場合に備え、親要素のテキストでも探す
+        for el in (node, node.parent, getattr(node.parent, "parent", None)):
+            if el is None:
+                continue
+            text = el if isinstance(el, str) else el.get_text(" ")
+            m = _PAGE_RANGE_PATTERN.search(text)
+            if m:
+                first, last, total = (int(g.replace(",", "")) for g in m.groups())
+                if total >= 1 and last >= first:
+                    return total, last - first + 1
+                return None
+    return None
 
 
-def _fetch_one_page(url: str) -> pd.DataFrame | tuple[list[dict], list[str]] | None:
-    """1ページ分を取得。成功時は (rows, header_texts)、テーブルなし時は None。"""
+def _parse_page_bytes(
+    content: bytes,
+    content_type: str | None = None,
+    max_rows: int | None = None,
+) -> tuple[RowColumns, list[str], tuple[int, int] | None] | None:
+    """
+    1ページ分の HTML（バイト列）をパースする。戻り値は _fetch_one_page と同じ。
+    パースのプロセスプールからも呼ぶため、引数と戻り値は pickle できる形（バイト列・列ごとのリスト）だけにする。
+    """
     try:
-        soup = _get_soup(url)
+        soup = _soup_from_bytes(content, content_type)
         table, header_texts = _find_ranking_table(soup)
         if table is None or not header_texts:
             return None
-        rows = _parse_table_rows(table, header_texts)
+        rows = _parse_table_rows(table, header_texts, max_rows)
         if not rows:
             return None
-        return rows, header_texts
-    except requests.RequestException:
-        return None
+        return rows, header_texts, _parse_page_info(soup)
     except Exception:
         return None
 
 
+def _fetch_one_page(
+    url: str,
+    cancel_event: threading.Event | None = None,
+    max_rows: int | None = None,
+    budget: _Budget | None = None,
+) -> tuple[RowColumns, list[str], tuple[int, int] | None] | None:
+    """
+    1ページ分を取得。成功時は (rows, header_texts, (総件数, 1ページの件数) または None)、テーブルなし時は None。
+    max_rows を渡すとその行数までしか読まない。通信の失敗は FetchError を投げる。
+    """
+    resp = _get_response(url, cancel_event, budget)
+    return _parse_page_bytes(resp.content, resp.headers.get("Content-Type"), max_rows)
+
+
+@dataclass
+class FetchReport:
+    """ランキング取得の完了状況。hunt_high_dividend の戻り値の df.attrs["fetch_report"] に入る。"""
+
+    url: str = ""
+    requested: int = 0
+    rows: int = 0
+    pages_fetched: int = 0
+    pages_resumed: int = 0
+    pages_planned: int = 0  # 件数表記から決めた取得ページ数（表記がなければ 0）
+    total: int | None = None  # ランキングの総件数（「n件中」）
+    complete: bool = False
+    cancelled: bool = False
+    timed_out: bool = False  # 時間予算（time_budget）を使い切って途中で返した
+    failed_page: int | None = None
+    error: str = ""
+
+    def summary(self) -> str:
+        """画面表示用の1行サマリー。"""
+        head = f"{self.rows} / {self.requested} 件"
+        if self.pages_resumed:
+            head += f"（{self.pages_resumed} ページはチェックポイントから再開）"
+        if self.complete:
+            return f"取得完了: {head}"
+        if self.cancelled:
+            return f"取得を中断しました: {head}"
+        if self.timed_out:
+            return f"時間内に取得できた分のみ: {head}"
+        where = f"{self.failed_page} ページ目で" if self.failed_page else ""
+        return f"一部のみ取得: {head}。{where}失敗しました（{self.error}）"
+
+
+def get_fetch_report(df: pd.DataFrame) -> FetchReport | None:
+    """hunt_high_dividend の結果に付いている FetchReport を返す。なければ None。"""
+    return df.attrs.get("fetch_report") if df is not None else None
+
+
+@dataclass
+class _PageCheckpoint:
+    header_texts: list[str]
+    pages: dict[int, RowColumns]
+    updated_at: float
+    page_info: tuple[int, int] | None = None
+    finished: bool = False  # 最後まで取得できた取得のページ（再開には使わない。合流した呼び出しだけが再利用する）
+
+
+_checkpoints: dict[str, _PageCheckpoint] = {}
+_checkpoints_lock = threading.Lock()
+
+
+def _checkpoint_pages(
+    base_url: str,
+    reuse_finished: bool = False,
+) -> tuple[dict[int, RowColumns], list[str], tuple[int, int] | None]:
+    """
+    base_url の取得済みページ（CHECKPOINT_TTL 以内）と、1ページ目の件数表記を返す。
+    最後まで取得できた取得のページは、reuse_finished=True（同じURLの取得に合流した呼び出し）のときだけ返し、
+    それ以外では破棄する（新しい取得は最新のページを取り直す）。
+    """
+    with _checkpoints_lock:
+        cp = _checkpoints.get(base_url)
+        if cp is None or time.monotonic() - cp.updated_at > CHECKPOINT_TTL or (cp.finished and not reuse_finished):
+            _checkpoints.pop(base_url, None)
+            return {}, [], None
+        return dict(cp.pages), list(cp.header_texts), cp.page_info
+
+
+def _checkpoint_save(
+    base_url: str,
+    page: int,
+    rows: RowColumns,
+    header_texts: list[str],
+    page_info: tuple[int, int] | None = None,
+) -> None:
+    """1ページ分（途中までしか読んでいないページは保存しないこと）を保存する。"""
+    with _checkpoints_lock:
+        cp = _checkpoints.get(base_url)
+        if cp is None or cp.header_texts != header_texts:
+            cp = _checkpoints[base_url] = _PageCheckpoint(list(header_texts), {}, 0.0)
+        cp.pages[page] = rows
+        if page_info is not None:
+            cp.page_info = page_info
+        cp.updated_at = time.monotonic()
+        cp.finished = False  # この取得が途中で終われば、続きから再開できるようにする
+
+
+def _checkpoint_finish(base_url: str) -> None:
+    """最後まで取得できたことを記録する（以後、合流した呼び出し以外は再開に使わない）。"""
+    with _checkpoints_lock:
+        cp = _checkpoints.get(base_url)
+        if cp is not None:
+            cp.finished = True
+
+
+def clear_checkpoint(base_url: str | None = None) -> None:
+    """チェックポイントを破棄する。base_url を省略するとすべて破棄。"""
+    with _checkpoints_lock:
+        if base_url is None:
+            _checkpoints.clear()
+        else:
+            _checkpoints.pop(base_url, None)
+
+
 def _url_append_page(base_url: str, page: int) -> str:
     """URL に page パラメータを付与（既存クエリには & で追加）。"""
     if "?" in base_url:
@@ -194,57 +721,764 @@ def _url_append_page(base_url: str, page: int) -> str:
     return f"{base_url}?page={page}"
 
 
-def hunt_high_dividend(url: str | None = None, limit: int | None = None) -> pd.DataFrame:
+# ヘッジ取得: 2つ目の候補URLを送るまでの待ち秒数
+HEDGE_DELAY = 0.5
+# 件数表記のないページで、これより少ない行数のページを最終ページとみなす
+PAGE_SIZE_DEFAULT = 50
+# 計画したページを同時に取得する数（既定は1ページずつ。上げると各ページのマナー待機が並行して進む）
+PAGE_FETCH_CONCURRENCY = 1
+
+# 2ページ目以降のパースを動かすプロセス数（0 = 取得と同じスレッドでパース。1以上で取得とパースをパイプラインで流す）
+# 既定は「CPU数 - 1（最大4）」で、1コアの環境では 0。環境変数 PARSE_PROCESSES で上書きできる
+PARSE_PROCESSES_ENV = "PARSE_PROCESSES"
+
+
+def _default_parse_processes() -> int:
+    value = os.environ.get(PARSE_PROCESSES_ENV, "").strip()
+    if value:
+        try:
+            return max(0, int(value))
+        except ValueError:
+            pass
+    cpus = os.cpu_count() or 1
+    return min(4, cpus - 1) if cpus > 1 else 0
+
+
+PARSE_PROCESSES = _default_parse_processes()
+# パイプラインで、取得済みでパース待ちのページを溜める上限（満杯の間は取得側が待つ）
+PIPELINE_QUEUE_PAGES = 8
+
+# 要求URL → 実際にランキングを取得できたURL（次回からはこちらを直接使う）
+_preferred_urls: dict[str, str] = {}
+_preferred_lock = threading.Lock()
+
+
+def _hedged_first_page(
+    candidates: list[str],
+    max_rows: int | None = None,
+    budget: _Budget | None = None,
+) -> tuple[str, tuple] | None:
+    """
+    候補URLの1ページ目を HEDGE_DELAY ずつずらして並行取得し、最初にランキング表を返したURLとその結果を返す。
+    決まった時点で残りの候補はキャンセルする（未送信なら送らず、再試行中なら打ち切る）。全候補が失敗したら None。
+    """
+    cancel = threading.Event()
+    done: "queue.Queue[tuple[str, tuple | None]]" = queue.Queue()
+
+    def _attempt(i: int, url: str) -> None:
+        if i > 0 and cancel.wait(HEDGE_DELAY * i):
+            done.put((url, None))
+            return
+        try:
+            result = _fetch_one_page(url, cancel, max_rows, budget)
+        except FetchError:
+            result = None
+        done.put((url, result))
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        for i, url in enumerate(candidates):
+            pool.submit(_attempt, i, url)
+        for _ in candidates:
+            url, result = done.get()
+            if result is not None:
+                cancel.set()
+                return url, result
+        return None
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False)
+
+
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_pool_size = 0
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool(processes: int) -> ProcessPoolExecutor:
+    """パース用のプロセスプール（プロセス内で共有し、プロセス数が変わったときだけ作り直す）。"""
+    global _parse_pool, _parse_pool_size
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_size != processes:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False, cancel_futures=True)
+            # Streamlit のサーバーはスレッドを多く持つため fork せず spawn で起動する
+            _parse_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+            _parse_pool_size = processes
+        return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """壊れたプロセスプール（ワーカーが落ちた等）を捨てる。次の取得で作り直す。"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _ParsePipeline:
+    """
+    取得とパースのパイプライン。取得スレッドがページのバイト列を上限付きのキューに入れ、
+    パースはプロセスプールで行って列ごとのリスト（RowColumns）だけを受け取る（スープは受け渡さない）。
+    キューが満杯の間は取得側が待つため、メモリに載るページは PIPELINE_QUEUE_PAGES + 取得中 + パース中 の件数まで。
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pages: list[tuple[int, int]],
+        cancel_event,
+        fetch_workers: int,
+        processes: int,
+        budget: _Budget | None = None,
+    ):
+        self.raw: "queue.Queue[tuple | None]" = queue.Queue(maxsize=PIPELINE_QUEUE_PAGES)
+        self.stop = threading.Event()
+        self.pool = _get_parse_pool(processes)
+        self.max_parsing = processes * 2
+        self.parsing: deque = deque()  # (page, need, content, content_type, future) をページ順に
+        self.fetch_done = False
+        self.thread = threading.Thread(
+            target=self._fetch, args=(base_url, pages, cancel_event, fetch_workers, budget), name="page-fetch", daemon=True
+        )
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.raw.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch(self, base_url: str, pages: list[tuple[int, int]], cancel_event, workers: int, budget) -> None:
+        """取得側: pages を workers 件ずつ並行して取得し、ページ順にキューへ入れる。失敗したらそのページで終える。"""
+        def _download(page: int):
+            resp = _get_response(_url_append_page(base_url, page), cancel_event, budget)
+            return resp.content, resp.headers.get("Content-Type")
+
+        pool = ThreadPoolExecutor(max_workers=workers)
+        window: deque = deque()
+        todo = iter(pages)
+        try:
+            while not self.stop.is_set():
+                while len(window) < workers:
+                    item = next(todo, None)
+                    if item is None:
+                        break
+                    window.append((*item, pool.submit(_download, item[0])))
+                if not window:
+                    break
+                page, need, future = window.popleft()
+                try:
+                    content, content_type = future.result()
+                except FetchError as e:
+                    self._put((page, need, e, None))
+                    break
+                if not self._put((page, need, content, content_type)):
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._put(None)
+
+    def _submit(self, block: bool) -> bool:
+        """取得済みのページを1件パースに回す。回せるページがなければ False。"""
+        while not self.fetch_done:
+            try:
+                item = self.raw.get(timeout=0.2) if block else self.raw.get_nowait()
+            except queue.Empty:
+                if block and self.thread.is_alive():
+                    continue
+                return False
+            if item is None:
+                self.fetch_done = True
+                return False
+            page, need, content, content_type = item
+            future = None
+            if not isinstance(content, FetchError):
+                try:
+                    future = self.pool.submit(_parse_page_bytes, content, content_type, need)
+                except (BrokenProcessPool, RuntimeError):
+                    _discard_parse_pool(self.pool)  # このページは result() でこのスレッドがパースする
+            self.parsing.append((page, need, content, content_type, future))
+            return True
+        return False
+
+    def result(self, page: int):
+        """page の結果（_fetch_one_page と同じ形）。取得に失敗したページなら FetchError を投げる。"""
+        while not self.parsing:
+            if not self._submit(block=True):
+                raise FetchError(f"{page} ページ目を取得できませんでした")
+        # 次のページも先にパースへ回しておく（プロセス数の2倍まで）
+        while len(self.parsing) < self.max_parsing and self._submit(block=False):
+            pass
+        got, need, content, content_type, future = self.parsing.popleft()
+        if got != page:
+            raise FetchError(f"{page} ページ目の順序が崩れました（{got} ページ目が届きました）")
+        if isinstance(content, FetchError):
+            raise content
+        if future is not None:
+            try:
+                return future.result()
+            except (BrokenProcessPool, CancelledError):
+                _discard_parse_pool(self.pool)
+        return _parse_page_bytes(content, content_type, need)
+
+    def close(self) -> None:
+        self.stop.set()
+        for *_, future in self.parsing:
+            if future is not None:
+                future.cancel()
+        self.parsing.clear()
+        while True:
+            try:
+                self.raw.get_nowait()
+            except queue.Empty:
+                break
+
+
+def _expected_rows(page_info: tuple[int, int], page: int) -> int:
+    """件数表記から見た page ページ目の行数。"""
+    total, page_size = page_info
+    return max(0, min(page_size, total - (page - 1) * page_size))
+
+
+def _page_complete(rows: RowColumns, need: int | None, page_info: tuple[int, int] | None, page: int) -> bool:
+    """ページを最後まで読んだか（need 行で打ち切っていないか）。チェックポイントには読み切ったページだけを残す。"""
+    if need is None or len(rows) < need:
+        return True
+    return page_info is not None and len(rows) >= _expected_rows(page_info, page)
+
+
+def plan_pages(page_info: tuple[int, int], max_rows: int) -> list[tuple[int, int]]:
+    """(総件数, 1ページの件数) と取得件数から、取得するページと各ページで読む行数の一覧を返す。"""
+    total, page_size = page_info
+    target = min(total, max_rows)
+    n_pages = max(1, math.ceil(target / page_size))
+    return [(page, min(page_size, target - (page - 1) * page_size)) for page in range(1, n_pages + 1)]
+
+
+def _pull_pages(
+    base_url: str,
+    max_rows: int,
+    report: "FetchReport",
+    first_page: tuple | None = None,
+    progress: Callable[["FetchReport"], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    concurrency: int | None = None,
+    parse_processes: int | None = None,
+    budget: _Budget | None = None,
+    reuse_finished: bool = False,
+) -> tuple[RowColumns | None, list[str], bool]:
+    """
+    base_url から max_rows 行を取得する。(rows, header_texts, 最終ページまで読んだか) を返す。
+
+    1ページ目の「a～b件 / n件中」から取得するページを決め（plan_pages）、2ページ目以降は
+    concurrency 件ずつ並行して取得する（既定は PAGE_FETCH_CONCURRENCY）。最後のページは必要な行だけを読む。
+    parse_processes（既定は PARSE_PROCESSES）が1以上なら、2ページ目以降のパースはプロセスプールで行う（_ParsePipeline）。
+    件数表記のないページは、1ページずつ取得して PAGE_SIZE_DEFAULT 行未満のページで終わりとみなす。
+    1ページごとに progress(report) を呼ぶ。cancel_event がセットされたら次のページを取得せずに終える。
+    budget を渡すと、締め切りまでに終わりそうなページだけを取得し、そこまでの行を返す（report.timed_out）。
+    reuse_finished=True（同じURLの取得に合流した呼び出し）なら、最後まで取得できた取得のページも再利用する。
+    """
+    all_rows: RowColumns | None = None
+    header_texts: list[str] = []
+    saved_pages, saved_headers, saved_info = _checkpoint_pages(base_url, reuse_finished)
+
+    def _cancelled() -> bool:
+        if cancel_event is not None and cancel_event.is_set():
+            report.cancelled = True
+            report.error = "キャンセルされました"
+            return True
+        return False
+
+    def _failed(page: int, e: FetchError) -> None:
+        report.failed_page = page
+        report.error = str(e)
+        report.cancelled = cancel_event is not None and cancel_event.is_set()
+        report.timed_out = isinstance(e, DeadlineExceeded)
+
+    def _take(rows: RowColumns, headers: list[str], fetched: bool) -> None:
+        nonlocal all_rows, header_texts
+        header_texts = headers
+        if all_rows is None:
+            all_rows = RowColumns(headers)
+        all_rows.extend(rows)
+        if fetched:
+            report.pages_fetched += 1
+        else:
+            report.pages_resumed += 1
+        if progress is not None:
+            report.rows = min(len(all_rows), max_rows)
+            progress(report)
+
+    # 1ページ目: 行と件数表記を読む
+    if _cancelled():
+        return None, [], False
+    if first_page is not None:
+        rows, headers, page_info = first_page
+        fetched = True
+    elif 1 in saved_pages:
+        rows, headers, page_info = saved_pages[1], saved_headers, saved_info
+        fetched = False
+    else:
+        try:
+            result = _fetch_one_page(base_url, cancel_event, max_rows, budget)
+        except FetchError as e:
+            _failed(1, e)
+            return None, [], False
+        if result is None:
+            return None, [], True
+        rows, headers, page_info = result
+        fetched = True
+    if fetched and _page_complete(rows, max_rows, page_info, 1):
+        _checkpoint_save(base_url, 1, rows, headers, page_info)
+
+    if page_info is None:
+        _take(rows, headers, fetched)
+        return _pull_sequential(
+            base_url, max_rows, report, all_rows, header_texts, saved_pages, saved_headers, _take, _failed, _cancelled,
+            budget, cancel_event,
+        )
+
+    plan = plan_pages(page_info, max_rows)
+    report.total = page_info[0]
+    report.pages_planned = len(plan)
+    _take(rows, headers, fetched)
+
+    # 2ページ目以降: 計画したページをまとめて投入し、ページ順に連結する
+    workers = max(1, concurrency if concurrency is not None else PAGE_FETCH_CONCURRENCY)
+    stop = threading.Event()
+
+    def _fetch_page(page: int, need: int):
+        if stop.is_set():
+            raise FetchError("中止しました")
+        return _fetch_one_page(_url_append_page(base_url, page), cancel_event, need, budget)
+
+    processes = parse_processes if parse_processes is not None else PARSE_PROCESSES
+    pending = [(page, need) for page, need in plan[1:] if page not in saved_pages]
+    pipeline = pool = None
+    futures = {}
+    if processes > 0 and pending:
+        pipeline = _ParsePipeline(base_url, pending, cancel_event, workers, processes, budget)
+    elif workers > 1:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {page: pool.submit(_fetch_page, page, need) for page, need in pending}
+    try:
+        for page, need in plan[1:]:
+            if _cancelled():
+                return all_rows, header_texts, False
+            saved = saved_pages.get(page)
+            if saved is not None:
+                _take(saved, saved_headers, False)
+                continue
+            try:
+                if pipeline is not None:
+                    result = pipeline.result(page)
+                else:
+                    result = futures[page].result() if page in futures else _fetch_page(page, need)
+            except FetchError as e:
+                _failed(page, e)
+                return all_rows, header_texts, False
+            if result is None:
+                # 件数表記より早く表がなくなった（取得中にランキングが更新された等）
+                return all_rows, header_texts, True
+            rows, headers, _ = result
+            if _page_complete(rows, need, page_info, page):
+                _checkpoint_save(base_url, page, rows, headers)
+            _take(rows, headers, True)
+    finally:
+        stop.set()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if pipeline is not None:
+            pipeline.close()
+    return all_rows, header_texts, page_info[0] <= max_rows
+
+
+def _pull_sequential(
+    base_url, max_rows, report, all_rows, header_texts, saved_pages, saved_headers, take, failed, cancelled,
+    budget=None, cancel_event=None,
+):
+    """件数表記がない場合の取得（2ページ目から1ページずつ、PAGE_SIZE_DEFAULT 行未満のページで終わり）。"""
+    last_rows = len(all_rows)
+    page = 2
+    while len(all_rows) < max_rows:
+        if last_rows < PAGE_SIZE_DEFAULT:
+            return all_rows, header_texts, True
+        if cancelled():
+            return all_rows, header_texts, False
+        rows = saved_pages.get(page)
+        if rows is not None:
+            take(rows, saved_headers, False)
+        else:
+            try:
+                result = _fetch_one_page(_url_append_page(base_url, page), cancel_event, budget=budget)
+            except FetchError as e:
+                failed(page, e)
+                return all_rows, header_texts, False
+            if result is None:
+                return all_rows, header_texts, True
+            rows, headers, _ = result
+            _checkpoint_save(base_url, page, rows, headers)
+            take(rows, headers, True)
+            header_texts = headers
+        last_rows = len(rows)
+        page += 1
+    return all_rows, header_texts, last_rows < PAGE_SIZE_DEFAULT
+
+
+class _Flight:
+    """実行中の1件の取得。同じURLの後続の呼び出しはこれの完了を待って結果を共有する。"""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.done = threading.Event()
+        self.result: pd.DataFrame | None = None
+        self.listeners: list[Callable[[FetchReport], None]] = []
+
+    def notify(self, report: FetchReport) -> None:
+        """取得中の進捗を、待っている呼び出し元にも知らせる。"""
+        for listener in list(self.listeners):
+            try:
+                listener(report)
+            except Exception:
+                pass
+
+
+# 正規化URL → 実行中の取得
+_inflight: dict[str, _Flight] = {}
+_inflight_lock = threading.Lock()
+
+
+def normalize_ranking_url(url: str) -> str:
+    """同じランキングを指すURLを同じ文字列にする（スキーム・ホストを小文字、クエリを並べ替え、page と末尾の / を除く）。"""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "page")
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def _chain(*fns: Callable[[FetchReport], None]) -> Callable[[FetchReport], None]:
+    def call(report: FetchReport) -> None:
+        for fn in fns:
+            fn(report)
+
+    return call
+
+
+def _wait_flight(flight: _Flight, cancel_event: threading.Event | None, budget: _Budget | None = None) -> bool:
+    """実行中の取得の完了を待つ。待っている間に cancel_event がセットされた・時間予算を使い切ったら False。"""
+    while not flight.done.wait(0.2 if budget is None else max(0.0, min(0.2, budget.remaining()))):
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+        if budget is not None and budget.remaining() <= 0:
+            return False
+    return True
+
+
+def _shared_result(flight: _Flight, max_rows: int) -> pd.DataFrame | None:
+    """
+    完了した取得の結果から max_rows 件分を返す。中止された取得、または自分の要求の方が多く
+    最終ページまで読んでいない取得の場合は None（自分で取得し直す）。
+    """
+    df = flight.result
+    report = get_fetch_report(df)
+    if df is None or report is None or report.cancelled:
+        return None
+    if report.timed_out and report.rows < max_rows:
+        return None  # 他の呼び出しの時間予算で打ち切られた取得（続きはチェックポイントから取得する）
+    read_to_end = report.complete and (
+        report.rows < report.requested or (report.total is not None and report.total <= report.requested)
+    )
+    if max_rows > flight.max_rows and not read_to_end:
+        return None
+    out = df.head(max_rows).copy()
+    out.attrs["fetch_report"] = replace(report, requested=max_rows, rows=len(out), complete=report.complete or len(out) >= max_rows)
+    return out
+
+
+def _checkpoint_frame(url: str, max_rows: int) -> pd.DataFrame:
+    """
+    同じURLを取得中の他の呼び出しがチェックポイントに保存した、1ページ目から連続するページの行を返す。
+    時間予算内に他の取得が終わらなかったときに、そこまでの行を返すために使う。
+    """
+    with _preferred_lock:
+        base_url = _preferred_urls.get(url, url)
+    pages, headers, _ = _checkpoint_pages(base_url, reuse_finished=True)
+    report = FetchReport(url=base_url, requested=max_rows, timed_out=True, error="時間予算内に取得が終わりませんでした")
+    rows = None
+    page = 1
+    while page in pages and (rows is None or len(rows) < max_rows):
+        if rows is None:
+            rows = RowColumns(headers)
+        rows.extend(pages[page])
+        report.pages_resumed += 1
+        page += 1
+    if rows is None:
+        df = pd.DataFrame()
+        df.attrs["fetch_report"] = report
+        return df
+    return _ranking_frame(rows, max_rows, report, False)
+
+
+def hunt_high_dividend(
+    url: str | None = None,
+    limit: int | None = None,
+    progress: Callable[[FetchReport], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    time_budget: float | None = None,
+) -> pd.DataFrame:
     """
     指定されたYahoo!ファイナンスの配当利回りランキングURLからデータを取得し、
     DataFrameを返す。
 
+    各ページは一時的な失敗（接続エラー・429/5xx）をバックオフ付きで再試行する。
+    途中のページで失敗した場合はそこまでの行を返し、取得済みページはチェックポイントに残るため、
+    同じURLで再度呼ぶと失敗したページから再開する。最後まで取得できた場合はチェックポイントを破棄し、
+    次の呼び出しはすべてのページを取得し直す。
+
     Args:
-        url: 取得先URL。Noneの場合はDEFAULT_URLを使用し、失敗時はFALLBACK_URLを試行。
+        url: 取得先URL。Noneの場合はDEFAULT_URLを使用し、FALLBACK_URLと1ページ目をヘッジ取得する
+            （先にランキング表を返した方を採用し、以後はそのURLを直接使う）。
         limit: 取得件数（1〜9999）。None の場合は1ページ分（最大50件程度）のみ取得。
+        progress: 1ページ取得するごとに途中の FetchReport（pages_fetched・rows）を受け取る関数。
+        cancel_event: セットされたら次のページを取得せずに、そこまでの行を返す（report.cancelled = True）。
+        time_budget: 秒数。締め切り（呼び出しから time_budget 秒後）までに終わりそうなページだけを取得し、
+            そこまでの行を返す（report.timed_out = True, complete = False）。取得済みページはチェックポイントに残るため、
+            同じURLで time_budget なしで呼び直すと続きのページだけを取得する。
+
+    同じURL（正規化後）の取得が実行中なら、新たに取得せずその結果を共有する（件数が多い要求は、
+    実行中の取得が終わってから、その取得が保存したページの続きだけを取得する）。
 
     Returns:
         ランキングデータのDataFrame。取得失敗時は空のDataFrameを返す。
+        完了状況は df.attrs["fetch_report"]（FetchReport）で参照できる。
     """
     if limit is not None and (limit < 1 or limit > 9999):
         return pd.DataFrame()
 
+    max_rows = limit if limit is not None else 50
+    key = normalize_ranking_url(url or DEFAULT_URL)
+    budget = _Budget(time_budget) if time_budget is not None else None
+    joined = False  # 実行中の取得に合流したか（合流した取得が取得済みのページは、完了していても再利用する）
+    while True:
+        with _inflight_lock:
+            flight = _inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _inflight[key] = _Flight(max_rows)
+            elif progress is not None:
+                flight.listeners.append(progress)
+        if leader:
+            df = pd.DataFrame()
+            try:
+                df = _hunt_high_dividend(
+                    url, limit, flight.notify if progress is None else _chain(progress, flight.notify), cancel_event, budget,
+                    reuse_finished=joined,
+                )
+            finally:
+                flight.result = df
+                with _inflight_lock:
+                    _inflight.pop(key, None)
+                flight.done.set()
+            return df
+        if not _wait_flight(flight, cancel_event, budget):
+            if not (cancel_event is not None and cancel_event.is_set()):
+                return _checkpoint_frame(url or DEFAULT_URL, max_rows)
+            report = FetchReport(url=url or DEFAULT_URL, requested=max_rows, cancelled=True, error="キャンセルされました")
+            df = pd.DataFrame()
+            df.attrs["fetch_report"] = report
+            return df
+        shared = _shared_result(flight, max_rows)
+        if shared is not None:
+            return shared
+        joined = True
+        # 実行中の取得より多い件数・中止された取得の場合は、自分で取得し直す（合流した取得が保存したページはチェックポイントから再利用）
+
+
+def _hunt_high_dividend(
+    url: str | None,
+    limit: int | None,
+    progress: Callable[[FetchReport], None] | None,
+    cancel_event: threading.Event | None,
+    budget: _Budget | None = None,
+    reuse_finished: bool = False,
+) -> pd.DataFrame:
+    """hunt_high_dividend の本体（同じURLの取得をまとめずに実行する）。"""
     target_url = url or DEFAULT_URL
-    urls_to_try = [target_url]
+    candidates = [target_url]
     if target_url == DEFAULT_URL:
-        urls_to_try.append(FALLBACK_URL)
+        candidates.append(FALLBACK_URL)
+    with _preferred_lock:
+        preferred = _preferred_urls.get(target_url)
 
-    all_rows: list[dict] = []
-    header_texts: list[str] = []
     max_rows = limit if limit is not None else 50
-    page = 1
+    report = FetchReport(url=target_url, requested=max_rows)
+    remaining = list(candidates)
 
-    for base_url in urls_to_try:
-        all_rows = []
-        header_texts = []
-        page = 1
-        while len(all_rows) < max_rows:
-            page_url = _url_append_page(base_url, page) if page > 1 else base_url
-            result = _fetch_one_page(page_url)
-            if result is None:
-                break
-            rows, header_texts = result
-            if not rows:
-                break
-            all_rows.extend(rows)
-            if len(rows) < 50:
-                break
-            if limit is not None and len(all_rows) >= limit:
-                break
-            page += 1
+    # 前回ランキングを取得できたURLがあれば、まずそれだけを使う
+    if preferred:
+        report = FetchReport(url=preferred, requested=max_rows)
+        all_rows, header_texts, finished = _pull_pages(
+            preferred, max_rows, report, progress=progress, cancel_event=cancel_event, budget=budget,
+            reuse_finished=reuse_finished,
+        )
+        if all_rows and header_texts or report.cancelled or report.timed_out:
+            return _ranking_frame(all_rows or RowColumns(header_texts), limit, report, finished)
+        with _preferred_lock:
+            _preferred_urls.pop(target_url, None)
+        remaining = [u for u in candidates if u != preferred]
+
+    # 候補が複数なら1ページ目をヘッジ取得し、先に表を返したURLで続きを取得する
+    first_page = None
+    if len(remaining) > 1 and not (cancel_event is not None and cancel_event.is_set()):
+        hedged = _hedged_first_page(remaining, max_rows, budget)
+        if hedged is None:
+            remaining = []
+            report.error = "どの候補URLからもランキング表を取得できませんでした"
+            report.timed_out = budget is not None and budget.remaining() <= REQUEST_INTERVAL
+        else:
+            remaining = [hedged[0]]
+            first_page = hedged[1]
+    if remaining:
+        base_url = remaining[0]
+        report = FetchReport(url=base_url, requested=max_rows)
+        all_rows, header_texts, finished = _pull_pages(
+            base_url, max_rows, report, first_page, progress, cancel_event, budget=budget, reuse_finished=reuse_finished
+        )
         if all_rows and header_texts:
-            df = pd.DataFrame(all_rows)
-            if limit is not None:
-                df = df.head(limit)
-            return df
-        time.sleep(1)
+            with _preferred_lock:
+                _preferred_urls[target_url] = base_url
+            return _ranking_frame(all_rows, limit, report, finished)
+
+    if not report.error:
+        report.error = "ランキング表が見つかりませんでした"
+    df = pd.DataFrame()
+    df.attrs["fetch_report"] = report
+    return df
+
+
+def _ranking_frame(all_rows: RowColumns, limit: int | None, report: FetchReport, finished: bool) -> pd.DataFrame:
+    """取得した行を DataFrame にし、完了状況を report に記録して attrs に付ける。"""
+    df = all_rows.to_frame(limit)
+    report.rows = len(df)
+    report.complete = finished or len(df) >= report.requested
+    if report.complete:
+        # 最後まで取得できたら、次の取得では使わない（最新のページを取り直す。再開に使うのは失敗・中断・時間切れの後だけ）
+        _checkpoint_finish(report.url)
+    df.attrs["fetch_report"] = report
+    return df
+
+
+def hunt_multiple_sites(
+    site_names: list[str],
+    limit: int | None = None,
+    max_workers: int = 5,
+    progress: Callable[[int, int], None] | None = None,
+    cancel_event: threading.Event | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    登録済みサイトを並行して取得する。
+    progress を渡すとサイトが1つ終わるごとに (終わったサイト数, サイト数) で呼ぶ。cancel_event は各サイトの取得に渡す。
+
+    Returns:
+        サイト名 → ランキング DataFrame（取得失敗・未登録のサイトは空の DataFrame）。順序は site_names のまま。
+    """
+    names = list(dict.fromkeys(n for n in site_names if n))
+    if not names:
+        return {}
+    urls = {name: get_url_by_site_name(name) for name in names}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as pool:
+        futures = {
+            name: pool.submit(hunt_high_dividend, url, limit, cancel_event=cancel_event)
+            for name, url in urls.items()
+            if url
+        }
+        results = {}
+        for i, name in enumerate(names, 1):
+            fut = futures.get(name)
+            try:
+                results[name] = fut.result() if fut else pd.DataFrame()
+            except Exception:
+                results[name] = pd.DataFrame()
+            if progress is not None:
+                progress(i, len(names))
+    return results
+
 
-    return pd.DataFrame()
+def _site_label(site_name: str) -> str:
+    """列名用にサイト名の共通接頭辞（Yahoo!ファイナンス）を落とした短い名前を返す。"""
+    return site_name.replace("Yahoo!ファイナンス", "").strip() or site_name
+
+
+def _site_symbols(df: pd.DataFrame, name_col) -> pd.Series:
+    """symbol 列（空なら名称・コード・市場セルの4桁コード + '.T'）を返す。"""
+    symbols = df["symbol"].astype(str).str.strip() if "symbol" in df.columns else pd.Series("", index=df.index)
+    if name_col is not None:
+        missing = symbols == ""
+        if missing.any():
+            codes = df.loc[missing, name_col].astype(str).map(_extract_code_from_name_cell)
+            symbols[missing] = codes.where(codes == "", codes + ".T")
+    return symbols
+
+
+def merge_site_rankings(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    サイトごとのランキングを symbol で突き合わせ、1銘柄1行の横断ビューにまとめる。
+
+    列: symbol, 名称・コード・市場, 掲載数, 掲載リスト, 配当利回り（サイト名）...
+    各サイト内で symbol が重複する行は先頭（上位）のみ残す。利回りは float32 で保持する。
+    """
+    names_parts: list[pd.Series] = []
+    yield_parts: list[pd.Series] = []
+    labels: list[str] = []
+    for site_name, df in frames.items():
+        if df is None or df.empty:
+            continue
+        name_col = next((c for c in df.columns if "名称" in str(c) and "コード" in str(c)), None)
+        yield_col = next((c for c in df.columns if "配当利回り" in str(c)), None)
+        symbols = _site_symbols(df, name_col)
+        keep = (symbols != "") & ~symbols.duplicated()
+        if not keep.any():
+            continue
+        index = pd.Index(symbols[keep].to_numpy(), name="symbol")
+        label = _site_label(site_name)
+        labels.append(label)
+        names = df.loc[keep, name_col].astype(str).to_numpy() if name_col is not None else np.full(int(keep.sum()), "", dtype=object)
+        names_parts.append(pd.Series(names, index=index))
+        if yield_col is not None:
+            yields = parse_numeric_series(df.loc[keep, yield_col]).astype("float32").to_numpy()
+        else:
+            yields = np.full(int(keep.sum()), np.nan, dtype="float32")
+        yield_parts.append(pd.Series(yields, index=index, name=f"配当利回り（{label}）"))
+    if not yield_parts:
+        return pd.DataFrame()
+
+    # symbol をキーにしたハッシュ結合（外部結合）。掲載の有無は「サイト内に行があるか」で判定する
+    yields = pd.concat(yield_parts, axis=1, join="outer", sort=False)
+    present = pd.concat(
+        [pd.Series(True, index=part.index) for part in yield_parts], axis=1, join="outer", sort=False
+    ).notna().to_numpy()
+    names = pd.concat(names_parts)
+    names = names[~names.index.duplicated()].reindex(yields.index)
+
+    label_arr = np.array(labels, dtype=object)
+    listed = [" / ".join(label_arr[row]) for row in present]
+    merged = pd.DataFrame(
+        {
+            "名称・コード・市場": names.to_numpy(),
+            "掲載数": present.sum(axis=1).astype("int8"),
+            "掲載リスト": listed,
+        },
+        index=yields.index,
+    )
+    merged = pd.concat([merged, yields], axis=1)
+    merged["_max_yield"] = yields.max(axis=1)
+    merged = merged.sort_values(["掲載数", "_max_yield"], ascending=[False, False], na_position="last", kind="stable")
+    return merged.drop(columns=["_max_yield"]).reset_index()
 
 
 def _parse_yield_value(s: str) -> float | None:
@@ -260,6 +1494,16 @@ def _parse_yield_value(s: str) -> float | None:
         return None
 
 
+# セル先頭の数値（例: '2,345 15:00' → 2345, '+6.72%' → 6.72）
+_NUMBER_PATTERN = r"([-+]?[0-9][0-9,]*(?:\.[0-9]+)?)"
+
+
+def parse_numeric_series(s: pd.Series) -> pd.Series:
+    """文字列の列から先頭の数値を取り出して float に一括変換する。変換できない値は NaN。"""
+    extracted = s.astype(str).str.extract(_NUMBER_PATTERN, expand=False)
+    return pd.to_numeric(extracted.str.replace(",", "", regex=False), errors="coerce")
+
+
 # 市場名らしいパターン（東証PRM, 東証STD, 名証, マザーズ 等）
 _MARKET_PATTERN = re.compile(
     r"(東証(?:PRM|STD|グロース)?|名証(?:MN)?|マザーズ|札証|福証|JQS|東証)"
@@ -321,6 +1565,7 @@ def apply_ranking_filters(
     sector: list[str] | None = None,
     has_shareholder_benefit: bool | None = None,
     markets: list[str] | None = None,
+    facet_index=None,
 ) -> pd.DataFrame:
     """
     取得済みランキング DataFrame に条件をかけて絞り込む。
@@ -331,9 +1576,21 @@ def apply_ranking_filters(
         settlement_months: 決算年月で絞り込み。None は制限なし。
         industry / sector / has_shareholder_benefit: 列が存在する場合に適用。
         markets: 市場で絞り込み（例: ['東証PRM', '東証STD']）。None は制限なし（上場銘柄すべて）。
+        facet_index: df から作った FacetIndex（facet_index.py）。渡した場合は列の走査をせず索引のビットマップで絞り込む。
     """
     if df.empty:
         return df
+    if facet_index is not None and facet_index.n_rows == len(df):
+        positions = facet_index.filter_positions(
+            yield_min=yield_min,
+            yield_max=yield_max,
+            settlement_months=settlement_months,
+            industry=industry,
+            sector=sector,
+            has_shareholder_benefit=has_shareholder_benefit,
+            markets=markets,
+        )
+        return df.iloc[positions].reset_index(drop=True)
     out = df.copy()
 
     # 配当利回り
@@ -374,7 +1631,7 @@ def apply_ranking_filters(
 
     # 株主優待（列がある場合のみ）
     for c in out.columns:
-        if "株主優待" in str(c) or "優待" in str(c):
+        if "株主優待" in str(c) or ("優待" in str(c) and "配当" not in str(c)):
             if has_shareholder_benefit is True:
                 out = out[out[c].astype(str).str.strip().str.lower().isin(("あり", "1", "true", "yes"))]
             elif has_shareholder_benefit is False:
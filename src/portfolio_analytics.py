@@ -0,0 +1,212 @@
+"""
+ポートフォリオの配当収入見込み（年間配当・加重利回り・セクター構成）。
+登録銘柄と最新ランキング（配当利回り・1株配当・取引値）を銘柄コードで一括結合して算出する。
+結果は「ポートフォリオの内容 × データ版」ごとにキャッシュする。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from main import (
+    parse_numeric_series,
+    _extract_code_from_name_cell,
+    _extract_market_from_name_cell,
+)
+from portfolio_data import _symbol_from_entry
+
+# 1銘柄あたりの想定保有株数（単元株）
+DEFAULT_SHARES = 100
+# セクター列の候補（ランキングに含まれる場合に優先して使う。なければ市場で代用）
+SECTOR_COLUMNS = ("業種", "業界", "分野")
+_CACHE_MAX = 4096
+HOLDINGS_COLUMNS = ["表示名", "code", "取引値", "1株配当", "配当利回り", "年間配当", "セクター"]
+
+_lock = threading.Lock()
+_lookup_cache: OrderedDict = OrderedDict()
+_projection_cache: OrderedDict = OrderedDict()
+
+
+def normalize_code(symbol: str) -> str:
+    """'7203.T' / '7203' / 'トヨタ 7203 東証PRM' から突き合わせ用の銘柄コードを返す。"""
+    s = str(symbol or "").strip().upper()
+    if not s:
+        return ""
+    head = s.split(".", 1)[0]
+    if head.isalnum() and " " not in head:
+        return head
+    return _extract_code_from_name_cell(s)
+
+
+def entry_code(entry: str) -> str:
+    """ポートフォリオの保存形式 '表示名|銘柄コード' から突き合わせ用コードを返す。コードがなければ表示名から抽出。"""
+    return normalize_code(_symbol_from_entry(str(entry or "")))
+
+
+def _cache_put(cache: OrderedDict, key, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _CACHE_MAX:
+        cache.popitem(last=False)
+
+
+def _find_column(df: pd.DataFrame, *keywords: str):
+    for c in df.columns:
+        if all(k in str(c) for k in keywords):
+            return c
+    return None
+
+
+def build_ranking_lookup(ranking_df: pd.DataFrame) -> pd.DataFrame:
+    """ランキングを銘柄コード索引の数値テーブル（名称・取引値・1株配当・配当利回り・セクター）に変換する。"""
+    if ranking_df is None or ranking_df.empty:
+        return pd.DataFrame(columns=["名称", "取引値", "1株配当", "配当利回り", "セクター"])
+    name_col = _find_column(ranking_df, "名称", "コード")
+    if "symbol" in ranking_df.columns:
+        codes = ranking_df["symbol"].astype(str).map(normalize_code)
+    else:
+        codes = pd.Series("", index=ranking_df.index)
+    if name_col is not None:
+        missing = codes == ""
+        if missing.any():
+            codes[missing] = ranking_df.loc[missing, name_col].astype(str).map(_extract_code_from_name_cell)
+
+    def _numeric(col):
+        if col is None:
+            return pd.Series(np.nan, index=ranking_df.index)
+        return parse_numeric_series(ranking_df[col])
+
+    sector_col = next((c for key in SECTOR_COLUMNS for c in ranking_df.columns if key in str(c)), None)
+    if sector_col is not None:
+        sector = ranking_df[sector_col].astype(str).str.strip()
+    elif name_col is not None:
+        sector = ranking_df[name_col].astype(str).map(_extract_market_from_name_cell)
+    else:
+        sector = pd.Series("", index=ranking_df.index)
+
+    lookup = pd.DataFrame({
+        "code": codes.to_numpy(),
+        "名称": ranking_df[name_col].astype(str).to_numpy() if name_col is not None else "",
+        "取引値": _numeric(_find_column(ranking_df, "取引値")).to_numpy(),
+        "1株配当": _numeric(_find_column(ranking_df, "1株配当")).to_numpy(),
+        "配当利回り": _numeric(_find_column(ranking_df, "配当利回り")).to_numpy(),
+        "セクター": sector.replace("", "不明").to_numpy(),
+    })
+    lookup = lookup[lookup["code"] != ""].drop_duplicates("code").set_index("code")
+    return lookup
+
+
+def get_ranking_lookup(ranking_df: pd.DataFrame, data_version: str) -> pd.DataFrame:
+    """データ版ごとに build_ranking_lookup の結果をキャッシュして返す。"""
+    with _lock:
+        cached = _lookup_cache.get(data_version)
+    if cached is not None:
+        return cached
+    lookup = build_ranking_lookup(ranking_df)
+    with _lock:
+        _cache_put(_lookup_cache, data_version, lookup)
+    return lookup
+
+
+def _portfolio_key(p: dict, data_version: str, shares: int) -> tuple:
+    return (p.get("id"), tuple(p.get("symbols") or ()), data_version, shares)
+
+
+def project_portfolios(
+    portfolios: list[dict],
+    ranking_df: pd.DataFrame,
+    data_version: str,
+    shares: int = DEFAULT_SHARES,
+) -> dict[str, dict]:
+    """
+    複数ポートフォリオの配当収入見込みをまとめて算出する。
+
+    Returns:
+        ポートフォリオID → {"n_symbols", "n_matched", "annual_dividend", "invested",
+        "weighted_yield", "sector_mix"}。
+        annual_dividend / invested は各銘柄 shares 株保有を想定した金額（円）。
+        weighted_yield は投資額加重の配当利回り（%）。突き合わせできた銘柄がなければ None。
+    """
+    results: dict[str, dict] = {}
+    pending: list[dict] = []
+    with _lock:
+        for p in portfolios:
+            hit = _projection_cache.get(_portfolio_key(p, data_version, shares))
+            if hit is not None:
+                results[p.get("id")] = hit
+            else:
+                pending.append(p)
+    if not pending:
+        return results
+
+    lookup = get_ranking_lookup(ranking_df, data_version)
+    pids, entries = [], []
+    for p in pending:
+        syms = p.get("symbols") or []
+        pids.extend([p.get("id")] * len(syms))
+        entries.extend(syms)
+    joined = _join_entries(pids, entries, lookup, shares)
+    both = joined["年間配当"].notna() & joined["投資額"].notna()
+    joined["_div_valid"] = joined["年間配当"].where(both, 0.0)
+    joined["_inv_valid"] = joined["投資額"].where(both, 0.0)
+    totals = joined.groupby("pid", sort=False).agg(
+        n_matched=("名称", "count"),
+        annual_dividend=("年間配当", "sum"),
+        invested=("投資額", "sum"),
+        div_valid=("_div_valid", "sum"),
+        inv_valid=("_inv_valid", "sum"),
+    ).to_dict("index")
+    sector_mix: dict[str, dict] = {}
+    for (pid, sector), n in joined.dropna(subset=["名称"]).groupby(["pid", "セクター"], sort=False).size().items():
+        sector_mix.setdefault(pid, {})[sector] = int(n)
+
+    with _lock:
+        for p in pending:
+            pid = p.get("id")
+            t = totals.get(pid)
+            if t is not None:
+                res = {
+                    "n_symbols": len(p.get("symbols") or []),
+                    "n_matched": int(t["n_matched"]),
+                    "annual_dividend": float(t["annual_dividend"]),
+                    "invested": float(t["invested"]),
+                    "weighted_yield": float(t["div_valid"] / t["inv_valid"] * 100) if t["inv_valid"] > 0 else None,
+                    "sector_mix": dict(sorted(sector_mix.get(pid, {}).items(), key=lambda kv: -kv[1])),
+                }
+            else:
+                res = {
+                    "n_symbols": 0,
+                    "n_matched": 0,
+                    "annual_dividend": 0.0,
+                    "invested": 0.0,
+                    "weighted_yield": None,
+                    "sector_mix": {},
+                }
+            _cache_put(_projection_cache, _portfolio_key(p, data_version, shares), res)
+            results[pid] = res
+    return results
+
+
+def _join_entries(pids: list, entries: list[str], lookup: pd.DataFrame, shares: int) -> pd.DataFrame:
+    """(ポートフォリオID, 登録文字列) の縦持ち表をランキングの数値テーブルと結合する。"""
+    long = pd.DataFrame({"pid": pids, "entry": entries}, dtype=object)
+    long["code"] = [entry_code(e) for e in entries]
+    long["表示名"] = [e.split("|", 1)[0].strip() if "|" in e else e for e in entries]
+    joined = long.join(lookup, on="code")
+    joined["年間配当"] = joined["1株配当"] * shares
+    joined["投資額"] = joined["取引値"] * shares
+    return joined
+
+
+def portfolio_holdings(portfolio: dict, ranking_df: pd.DataFrame, data_version: str, shares: int = DEFAULT_SHARES) -> pd.DataFrame:
+    """1ポートフォリオの銘柄別明細（取引値・1株配当・配当利回り・年間配当・セクター）を返す。"""
+    entries = list(portfolio.get("symbols") or [])
+    lookup = get_ranking_lookup(ranking_df, data_version)
+    joined = _join_entries([portfolio.get("id")] * len(entries), entries, lookup, shares)
+    return joined[HOLDINGS_COLUMNS].reset_index(drop=True)
+
+
+def project_portfolio(portfolio: dict, ranking_df: pd.DataFrame, data_version: str, shares: int = DEFAULT_SHARES) -> dict:
+    """1ポートフォリオ分の project_portfolios。"""
+    return project_portfolios([portfolio], ranking_df, data_version, shares)[portfolio.get("id")]
@@ -1,12 +1,21 @@
 """
-ポートフォリオの永続化（JSON ファイル）。
+ポートフォリオの永続化（JSON ファイル、または STATE_BACKEND_URL の共有保存先）。
 削除操作以外ではリストが消えないよう、永続化パスを固定する。
 """
 import json
 import os
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Callable
+
+from state_backend import StateBackend, get_backend
+
+try:
+    import fcntl
+except ImportError:  # Windows ではファイルロックなし（1プロセスでの利用を想定）
+    fcntl = None
 
 # 環境変数 PORTFOLIO_DATA_DIR で上書き可能（例: Render の永続ボリュームパス）
 # 未設定時はアプリと同じディレクトリの data フォルダに保存（終了後も残る）
@@ -24,17 +33,93 @@ def _ensure_dir(path: Path) -> None:
 # アプリ起動時から保存先ディレクトリを存在させ、再起動後も確実に読み出せるようにする
 _ensure_dir(DEFAULT_PATH)
 
+# 共有保存先でのキー
+PORTFOLIOS_KEY = "portfolios"
+PORTFOLIOS_REVISION_KEY = "portfolios_revision"  # 一覧を書き換えるたびに新しい値にする（読み手が変更の有無を安く確かめる）
+
 
 def _get_path(file_path: Path | str | None) -> Path:
     """保存パスを返す。指定がなければ DEFAULT_PATH。"""
     return Path(file_path) if file_path else DEFAULT_PATH
 
 
+def _shared_backend(file_path: Path | str | None) -> StateBackend | None:
+    """保存先を指定していない場合に使う共有保存先（STATE_BACKEND_URL）。未設定なら None。"""
+    return None if file_path else get_backend()
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """同じ JSON ファイルを使う他のプロセスと、読み取り→書き込みが重ならないようにする。"""
+    _ensure_dir(path)
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_suffix(path.suffix + ".lock"), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_portfolios(data) -> list[dict]:
+    raw = data["portfolios"] if isinstance(data, dict) and "portfolios" in data else (data if isinstance(data, list) else [])
+    # 後方互換: created_at, view_count がない場合は付与
+    now = datetime.now().isoformat()
+    for p in raw:
+        if "created_at" not in p:
+            p["created_at"] = now
+        if "view_count" not in p:
+            p["view_count"] = 0
+    return raw
+
+
+def _decode_portfolios(value: bytes | None) -> list[dict]:
+    if not value:
+        return []
+    try:
+        return _parse_portfolios(json.loads(value))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return []
+
+
+def _encode_portfolios(portfolios: list[dict]) -> bytes:
+    return json.dumps({"portfolios": portfolios}, ensure_ascii=False).encode("utf-8")
+
+
+def _bump_revision(backend: StateBackend) -> None:
+    backend.set(PORTFOLIOS_REVISION_KEY, uuid.uuid4().hex.encode())
+
+
+def portfolios_revision(file_path: Path | str | None = None):
+    """
+    一覧の版。一覧を読み込まずに変更の有無を確かめるために使う（変わっていなければ同じ値）。
+    JSON ファイルは更新時刻・サイズ・inode（保存は一時ファイルからのリネーム）、共有保存先は書き込みごとの版キー。
+    """
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        # 読み取りだけで済ませる（SQLite の update は書き込みロックを取るため、描画のたびには使わない）
+        value = backend.get(PORTFOLIOS_REVISION_KEY)
+        if value is None:
+            # 版キーがまだない保存先（以前の版で作った一覧）では、ここで作っておく
+            value = backend.update(PORTFOLIOS_REVISION_KEY, lambda old: None if old else uuid.uuid4().hex.encode())
+        return value.decode()
+    try:
+        stat = _get_path(file_path).stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
 def load_portfolios(file_path: Path | str | None = None) -> list[dict]:
     """
     ポートフォリオ一覧を読み込む。
     各要素: {"id": str, "name": str, "symbols": list[str], "created_at": str, "view_count": int}
     """
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        return _decode_portfolios(backend.get(PORTFOLIOS_KEY))
     path = _get_path(file_path)
     if not path.exists():
         return []
@@ -43,19 +128,16 @@ def load_portfolios(file_path: Path | str | None = None) -> list[dict]:
             data = json.load(f)
     except (json.JSONDecodeError, OSError):
         return []
-    raw = data["portfolios"] if isinstance(data, dict) and "portfolios" in data else (data if isinstance(data, list) else [])
-    # 後方互換: created_at, view_count がない場合は付与
-    now = datetime.now().isoformat()
-    for p in raw:
-        if "created_at" not in p:
-            p["created_at"] = now
-        if "view_count" not in p:
-            p["view_count"] = 0
-    return raw
+    return _parse_portfolios(data)
 
 
 def save_portfolios(portfolios: list[dict], file_path: Path | str | None = None) -> None:
     """ポートフォリオ一覧を保存する。上書き破損を防ぐため一時ファイルに書き出してからリネーム。削除操作以外でリストが消えないよう、書き込み後にフラッシュする。"""
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        backend.set(PORTFOLIOS_KEY, _encode_portfolios(portfolios))
+        _bump_revision(backend)
+        return
     path = _get_path(file_path)
     _ensure_dir(path)
     tmp = path.with_suffix(path.suffix + ".tmp")
@@ -74,38 +156,71 @@ def save_portfolios(portfolios: list[dict], file_path: Path | str | None = None)
         raise
 
 
+def _mutate(fn: Callable[[list[dict]], tuple[bool, object]], file_path: Path | str | None = None):
+    """
+    一覧の読み取り→変更→保存を、他のプロセス（レプリカ）の変更と重ならないように行う。
+    fn は一覧をその場で書き換え、(保存が必要か, 戻り値) を返す。
+    """
+    result = None
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        changed = False
+
+        def _apply(old: bytes | None) -> bytes | None:
+            nonlocal result, changed
+            portfolios = _decode_portfolios(old)
+            changed, result = fn(portfolios)
+            return _encode_portfolios(portfolios) if changed else None
+
+        backend.update(PORTFOLIOS_KEY, _apply)
+        if changed:
+            _bump_revision(backend)
+        return result
+    with _file_lock(_get_path(file_path)):
+        portfolios = load_portfolios(file_path)
+        changed, result = fn(portfolios)
+        if changed:
+            save_portfolios(portfolios, file_path)
+    return result
+
+
 def create_portfolio(name: str, file_path: Path | str | None = None) -> dict:
     """新規ポートフォリオを作成して保存し、作成した辞書を返す。"""
-    portfolios = load_portfolios(file_path)
     new_id = str(uuid.uuid4())
     new_p = {"id": new_id, "name": name, "symbols": [], "created_at": datetime.now().isoformat(), "view_count": 0}
-    portfolios.append(new_p)
-    save_portfolios(portfolios, file_path)
-    return new_p
+
+    def _apply(portfolios):
+        portfolios.append(new_p)
+        return True, new_p
+
+    return _mutate(_apply, file_path)
 
 
 def update_portfolio(portfolio_id: str, name: str | None = None, symbols: list[str] | None = None, file_path: Path | str | None = None) -> bool:
     """ポートフォリオを更新。name または symbols を指定。"""
-    portfolios = load_portfolios(file_path)
-    for p in portfolios:
-        if p.get("id") == portfolio_id:
-            if name is not None:
-                p["name"] = name
-            if symbols is not None:
-                p["symbols"] = list(symbols)
-            save_portfolios(portfolios, file_path)
-            return True
-    return False
+    def _apply(portfolios):
+        for p in portfolios:
+            if p.get("id") == portfolio_id:
+                if name is not None:
+                    p["name"] = name
+                if symbols is not None:
+                    p["symbols"] = list(symbols)
+                return True, True
+        return False, False
+
+    return _mutate(_apply, file_path)
 
 
 def delete_portfolio(portfolio_id: str, file_path: Path | str | None = None) -> bool:
     """ポートフォリオを削除。"""
-    portfolios = load_portfolios(file_path)
-    new_list = [p for p in portfolios if p.get("id") != portfolio_id]
-    if len(new_list) == len(portfolios):
-        return False
-    save_portfolios(new_list, file_path)
-    return True
+    def _apply(portfolios):
+        new_list = [p for p in portfolios if p.get("id") != portfolio_id]
+        if len(new_list) == len(portfolios):
+            return False, False
+        portfolios[:] = new_list
+        return True, True
+
+    return _mutate(_apply, file_path)
 
 
 def _symbol_from_entry(entry: str) -> str:
@@ -130,29 +245,32 @@ def add_symbol_to_portfolio(
         entry = f"{display_str}|{symbol_str}" if display_str else symbol_str
     else:
         entry = f"{display_str}|"  # 銘柄コードなしで表示名のみ
-    portfolios = load_portfolios(file_path)
-    for p in portfolios:
-        if p.get("id") == portfolio_id:
-            syms = p.get("symbols") or []
-            existing_codes = {_symbol_from_entry(s) for s in syms}
-            # 同じ銘柄コード、または表示名のみの場合は同じ entry 文字列で重複判定
-            if symbol_str and symbol_str in existing_codes:
-                return True
-            if not symbol_str and any(s == entry or s.rstrip("|") == display_str for s in syms):
-                return True
-            syms.append(entry)
-            p["symbols"] = syms
-            save_portfolios(portfolios, file_path)
-            return True
-    return False
+
+    def _apply(portfolios):
+        for p in portfolios:
+            if p.get("id") == portfolio_id:
+                syms = p.get("symbols") or []
+                existing_codes = {_symbol_from_entry(s) for s in syms}
+                # 同じ銘柄コード、または表示名のみの場合は同じ entry 文字列で重複判定
+                if symbol_str and symbol_str in existing_codes:
+                    return False, True
+                if not symbol_str and any(s == entry or s.rstrip("|") == display_str for s in syms):
+                    return False, True
+                syms.append(entry)
+                p["symbols"] = syms
+                return True, True
+        return False, False
+
+    return _mutate(_apply, file_path)
 
 
 def increment_view_count(portfolio_id: str, file_path: Path | str | None = None) -> bool:
     """閲覧回数を1増やす。"""
-    portfolios = load_portfolios(file_path)
-    for p in portfolios:
-        if p.get("id") == portfolio_id:
-            p["view_count"] = p.get("view_count", 0) + 1
-            save_portfolios(portfolios, file_path)
-            return True
-    return False
+    def _apply(portfolios):
+        for p in portfolios:
+            if p.get("id") == portfolio_id:
+                p["view_count"] = p.get("view_count", 0) + 1
+                return True, True
+        return False, False
+
+    return _mutate(_apply, file_path)
@@ -0,0 +1,160 @@
+"""
+My Portfolio 一覧の並び替え索引（作成日時・閲覧回数・銘柄数）とページ単位の取得。
+保存先の版（portfolios_revision）が変わったときだけ一覧を読み直し、並びが変わったポートフォリオだけを
+ソート済みリストから外して入れ直す。画面は表示するページの分だけを受け取る。
+"""
+import threading
+from bisect import bisect_left, insort
+from pathlib import Path
+
+from portfolio_data import load_portfolios, portfolios_revision
+
+SORT_CREATED_AT = "created_at"
+SORT_VIEW_COUNT = "view_count"
+SORT_SYMBOLS = "symbols"
+REBUILD_RATIO = 0.25  # 変わったポートフォリオがこの割合を超えたら、差分の反映ではなく並べ直す
+
+
+def _sort_values(p: dict) -> dict:
+    return {
+        SORT_CREATED_AT: p.get("created_at", ""),
+        SORT_VIEW_COUNT: p.get("view_count", 0),
+        SORT_SYMBOLS: len(p.get("symbols") or []),
+    }
+
+
+class PortfolioIndex:
+    """
+    ポートフォリオ一覧と、並び替えキーごとのソート済みリスト。スレッドセーフ。
+    同じ値どうしは一覧での順（先に作成したものが先）に並べる（従来の sorted と同じ並び）。
+    昇順は (値, 順番, id)、降順は (値, -順番, id) のリストを後ろから読む。
+    """
+
+    def __init__(self):
+        self.revision = None
+        self._by_id: dict[str, dict] = {}
+        self._values: dict[str, dict] = {}
+        self._seq: dict[str, int] = {}
+        self._next_seq = 0
+        self._asc: dict[str, list[tuple]] = {}
+        self._desc: dict[str, list[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _entries(self, pid: str) -> dict[str, tuple[tuple, tuple]]:
+        seq = self._seq[pid]
+        return {key: ((v, seq, pid), (v, -seq, pid)) for key, v in self._values[pid].items()}
+
+    def _rebuild_locked(self, portfolios: list[dict]) -> None:
+        self._seq = {p["id"]: i for i, p in enumerate(portfolios)}
+        self._next_seq = len(portfolios)
+        self._values = {p["id"]: _sort_values(p) for p in portfolios}
+        self._asc = {key: [] for key in (SORT_CREATED_AT, SORT_VIEW_COUNT, SORT_SYMBOLS)}
+        self._desc = {key: [] for key in self._asc}
+        for pid in self._seq:
+            for key, (asc, desc) in self._entries(pid).items():
+                self._asc[key].append(asc)
+                self._desc[key].append(desc)
+        for key in self._asc:
+            self._asc[key].sort()
+            self._desc[key].sort()
+
+    def _remove_locked(self, pid: str) -> None:
+        for key, (asc, desc) in self._entries(pid).items():
+            for entries, item in ((self._asc[key], asc), (self._desc[key], desc)):
+                i = bisect_left(entries, item)
+                if i < len(entries) and entries[i] == item:
+                    del entries[i]
+
+    def refresh(self, portfolios: list[dict], revision=None) -> int:
+        """一覧と索引を揃える。並びの値が変わった・増えた・消えたポートフォリオの件数を返す。"""
+        portfolios = [p for p in portfolios if p.get("id")]
+        with self._lock:
+            new_values = {p["id"]: _sort_values(p) for p in portfolios}
+            changed = [pid for pid, v in new_values.items() if self._values.get(pid) != v]
+            removed = [pid for pid in self._values if pid not in new_values]
+            n_changed = len(changed) + len(removed)
+            if not self._values or n_changed > len(new_values) * REBUILD_RATIO:
+                self._rebuild_locked(portfolios)
+            else:
+                for pid in removed + changed:
+                    if pid in self._values:
+                        self._remove_locked(pid)
+                for pid in removed:
+                    del self._values[pid]
+                    del self._seq[pid]
+                for pid in changed:
+                    if pid not in self._seq:
+                        self._seq[pid] = self._next_seq
+                        self._next_seq += 1
+                    self._values[pid] = new_values[pid]
+                    for key, (asc, desc) in self._entries(pid).items():
+                        insort(self._asc[key], asc)
+                        insort(self._desc[key], desc)
+            self._by_id = {p["id"]: p for p in portfolios}
+            self.revision = revision
+        return n_changed
+
+    def get(self, pid: str | None) -> dict | None:
+        with self._lock:
+            return self._by_id.get(pid) if pid else None
+
+    def portfolios(self) -> list[dict]:
+        """一覧（保存順）。"""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def page(
+        self,
+        sort_key: str,
+        descending: bool,
+        page: int,
+        page_size: int,
+        only: set | None = None,
+    ) -> tuple[list[dict], int]:
+        """
+        sort_key の順で page ページ目（1始まり）のポートフォリオと、対象の総件数を返す。
+        only（ポートフォリオIDの集合。検索結果など）を渡すと、その中だけを数えて並べる。
+        """
+        with self._lock:
+            entries = self._desc[sort_key] if descending else self._asc[sort_key]
+            total = len(entries) if only is None else sum(1 for pid in only if pid in self._by_id)
+            start = (max(1, int(page)) - 1) * page_size
+            if only is None:
+                if descending:
+                    window = entries[max(0, len(entries) - start - page_size):max(0, len(entries) - start)][::-1]
+                else:
+                    window = entries[start:start + page_size]
+                return [self._by_id[item[2]] for item in window], total
+            ordered = reversed(entries) if descending else iter(entries)
+            out = []
+            skipped = 0
+            for item in ordered:
+                if item[2] not in only:
+                    continue
+                if skipped < start:
+                    skipped += 1
+                    continue
+                out.append(self._by_id[item[2]])
+                if len(out) >= page_size:
+                    break
+            return out, total
+
+
+_indexes: dict[str, PortfolioIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_portfolio_index(file_path: Path | str | None = None) -> PortfolioIndex:
+    """保存先ごとの索引（プロセス内で共有）。保存先の版が変わっていれば読み直して差分を反映する。"""
+    key = str(file_path or "")
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = PortfolioIndex()
+    revision = portfolios_revision(file_path)
+    if revision is None or revision != index.revision:
+        index.refresh(load_portfolios(file_path), revision)
+    return index
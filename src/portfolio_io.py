@@ -0,0 +1,312 @@
+"""
+ポートフォリオの一括エクスポート / インポート（NDJSON・CSV・証券会社のウォッチリストCSV）。
+入力は1行ずつ読み、保存先へは一時ファイルに少しずつ書き出してから最後に1回だけ置き換える
+（途中で失敗した場合は元の保存内容のまま）。
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from portfolio_data import (
+    PORTFOLIOS_KEY,
+    _bump_revision,
+    _decode_portfolios,
+    _file_lock,
+    _get_path,
+    _shared_backend,
+    _symbol_from_entry,
+    load_portfolios,
+)
+
+WRITE_BATCH = 1000  # まとめて書き込む行数
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # 共有保存先への取り込みで、これを超えたら一時ファイルに組み立てる
+CSV_FIELDS = ["portfolio_id", "portfolio_name", "created_at", "view_count", "display_name", "symbol"]
+# 証券会社のウォッチリストCSVで銘柄コード・銘柄名として扱う列名
+BROKER_CODE_COLUMNS = ("銘柄コード", "証券コード", "コード", "code", "symbol", "ティッカー", "ticker")
+BROKER_NAME_COLUMNS = ("銘柄名", "銘柄", "名称", "name")
+
+
+class PortfolioImportError(ValueError):
+    """インポートファイルの内容が不正（この場合、保存内容は変更されない）。"""
+
+
+def _split_entry(entry: str) -> tuple[str, str]:
+    """'表示名|銘柄コード' を (表示名, 銘柄コード) に分ける。"""
+    if "|" in entry:
+        name, code = entry.split("|", 1)
+        return name.strip(), code.strip()
+    return "", entry.strip()
+
+
+def _join_entry(display_name: str, symbol: str) -> str | None:
+    """add_symbol_to_portfolio と同じ保存形式の文字列にする。どちらも空なら None。"""
+    display_name, symbol = (display_name or "").strip(), (symbol or "").strip()
+    if symbol:
+        return f"{display_name}|{symbol}" if display_name else symbol
+    return f"{display_name}|" if display_name else None
+
+
+def _write_batched(out: IO[str], lines: Iterable[str]) -> None:
+    buf: list[str] = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= WRITE_BATCH:
+            out.write("".join(buf))
+            buf.clear()
+    if buf:
+        out.write("".join(buf))
+
+
+# ---- エクスポート ----
+
+def _export_records(file_path: Path | str | None) -> Iterator[dict]:
+    """1銘柄1レコード（銘柄のないポートフォリオは symbol 空の1レコード）を順に返す。"""
+    for p in load_portfolios(file_path):
+        base = {
+            "portfolio_id": p.get("id", ""),
+            "portfolio_name": p.get("name", ""),
+            "created_at": p.get("created_at", ""),
+            "view_count": p.get("view_count", 0),
+        }
+        symbols = p.get("symbols") or []
+        if not symbols:
+            yield {**base, "display_name": "", "symbol": ""}
+        for entry in symbols:
+            name, code = _split_entry(entry)
+            yield {**base, "display_name": name, "symbol": code}
+
+
+def export_portfolios_ndjson(out: IO[str], file_path: Path | str | None = None) -> int:
+    """ポートフォリオを NDJSON（1銘柄1行）で out に書き出し、行数を返す。"""
+    n = 0
+
+    def _lines():
+        nonlocal n
+        for rec in _export_records(file_path):
+            n += 1
+            yield json.dumps(rec, ensure_ascii=False) + "\n"
+
+    _write_batched(out, _lines())
+    return n
+
+
+def export_portfolios_csv(out: IO[str], file_path: Path | str | None = None) -> int:
+    """ポートフォリオを CSV（1銘柄1行、列は CSV_FIELDS）で out に書き出し、行数を返す。"""
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    n = 0
+    batch: list[dict] = []
+    for rec in _export_records(file_path):
+        batch.append(rec)
+        if len(batch) >= WRITE_BATCH:
+            writer.writerows(batch)
+            n += len(batch)
+            batch.clear()
+    writer.writerows(batch)
+    return n + len(batch)
+
+
+# ---- インポート（入力の解析） ----
+
+def _records_from_ndjson(src: IO[str]) -> Iterator[dict]:
+    for lineno, line in enumerate(src, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise PortfolioImportError(f"{lineno} 行目が JSON として読めません: {e}") from e
+        if not isinstance(rec, dict):
+            raise PortfolioImportError(f"{lineno} 行目がオブジェクトではありません")
+        yield rec
+
+
+def _records_from_csv(src: IO[str]) -> Iterator[dict]:
+    reader = csv.DictReader(src)
+    if not reader.fieldnames or "portfolio_name" not in reader.fieldnames:
+        raise PortfolioImportError(f"CSV の見出しに portfolio_name が必要です（列: {', '.join(CSV_FIELDS)}）")
+    yield from reader
+
+
+def _records_from_broker_csv(src: IO[str], portfolio_name: str) -> Iterator[dict]:
+    """証券会社のウォッチリストCSVを、1つのポートフォリオのレコードに変換する。"""
+    reader = csv.DictReader(src)
+    fields = [f.strip() for f in (reader.fieldnames or [])]
+    lowered = {f.lower(): f for f in fields}
+    code_col = next((lowered[c.lower()] for c in BROKER_CODE_COLUMNS if c.lower() in lowered), None)
+    name_col = next((lowered[c.lower()] for c in BROKER_NAME_COLUMNS if c.lower() in lowered), None)
+    if code_col is None and name_col is None:
+        raise PortfolioImportError("銘柄コードまたは銘柄名の列が見つかりません（例: 銘柄コード, 銘柄名）")
+    key = str(uuid.uuid4())
+    for row in reader:
+        row = {(k or "").strip(): (v or "").strip() for k, v in row.items()}
+        code = row.get(code_col, "") if code_col else ""
+        # 国内株の4桁（英字を含む新コードも）は Yahoo!ファイナンスの表記に合わせて .T を付ける
+        if len(code) == 4 and code.isalnum():
+            code = f"{code.upper()}.T"
+        yield {
+            "portfolio_id": key,
+            "portfolio_name": portfolio_name,
+            "display_name": row.get(name_col, "") if name_col else "",
+            "symbol": code,
+        }
+
+
+# ---- インポート（保存先への書き込み） ----
+
+def _portfolio_head(pid: str, name: str, created_at: str, view_count: int) -> str:
+    head = json.dumps(
+        {"id": pid, "name": name, "created_at": created_at, "view_count": view_count},
+        ensure_ascii=False,
+    )
+    return head[:-1] + ', "symbols": ['
+
+
+def _write_document(f: IO[str], existing: list[dict], records: Iterable[dict], stats: dict) -> None:
+    """既存分の後ろに取り込む分をつなげた保存形式（{"portfolios": [...]}）を f に少しずつ書く。"""
+    used_ids = {p.get("id") for p in existing}
+    f.write('{"portfolios": [')
+    first = True
+    for p in existing:
+        f.write(("" if first else ",\n") + json.dumps(p, ensure_ascii=False))
+        first = False
+
+    current_key = None
+    seen_keys: set[str] = set()
+    seen_codes: set[str] = set()
+    n_in_current = 0
+    buf: list[str] = []
+    now = datetime.now().isoformat()
+    for rec in records:
+        key = str(rec.get("portfolio_id") or rec.get("portfolio_name") or "")
+        name = str(rec.get("portfolio_name") or "").strip()
+        if not key or not name:
+            raise PortfolioImportError("portfolio_name が空のレコードがあります")
+        if key != current_key:
+            if key in seen_keys:
+                raise PortfolioImportError(f"ポートフォリオ「{name}」の行が連続していません。ポートフォリオごとにまとめてください")
+            if current_key is not None:
+                buf.append("]}")
+            seen_keys.add(key)
+            current_key = key
+            seen_codes.clear()
+            n_in_current = 0
+            pid = key if key not in used_ids and rec.get("portfolio_id") else str(uuid.uuid4())
+            used_ids.add(pid)
+            try:
+                view_count = int(rec.get("view_count") or 0)
+            except (TypeError, ValueError):
+                view_count = 0
+            buf.append(("" if first else ",\n") + _portfolio_head(pid, name, str(rec.get("created_at") or now), view_count))
+            first = False
+            stats["portfolios"] += 1
+        entry = _join_entry(str(rec.get("display_name") or ""), str(rec.get("symbol") or ""))
+        if entry is not None:
+            # add_symbol_to_portfolio と同じく、同じ銘柄コード（コードなしは同じ表示名）は1件にまとめる
+            dedupe_key = _symbol_from_entry(entry) if not entry.endswith("|") else entry
+            if dedupe_key in seen_codes:
+                stats["duplicates"] += 1
+            else:
+                seen_codes.add(dedupe_key)
+                buf.append(("" if n_in_current == 0 else ", ") + json.dumps(entry, ensure_ascii=False))
+                n_in_current += 1
+                stats["entries"] += 1
+        if len(buf) >= WRITE_BATCH:
+            f.write("".join(buf))
+            buf.clear()
+    if current_key is not None:
+        buf.append("]}")
+    buf.append("]}\n")
+    f.write("".join(buf))
+
+
+def _commit_records(records: Iterable[dict], file_path: Path | str | None, replace: bool) -> dict:
+    """
+    レコード列を保存先に取り込む。既存分（replace=False の場合）を書いた後、取り込む分を
+    ポートフォリオごとに少しずつ一時ファイルへ書き、最後に1回で置き換える。
+    同じポートフォリオのレコードは連続している必要がある（離れて再登場したら PortfolioImportError）。
+    """
+    stats = {"portfolios": 0, "entries": 0, "duplicates": 0}
+    backend = _shared_backend(file_path)
+    if backend is not None:
+        # 共有保存先: 一時ファイルに組み立て、読み取った時点から他の変更がなければ1回の update で置き換える
+        snapshot = backend.get(PORTFOLIOS_KEY)
+        existing = [] if replace else _decode_portfolios(snapshot)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", encoding="utf-8") as f:
+            _write_document(f, existing, records, stats)
+            f.seek(0)
+            body = f.read().encode("utf-8")
+
+        def _apply(old: bytes | None) -> bytes:
+            if old != snapshot:
+                raise PortfolioImportError("インポート中に他の変更がありました。もう一度お試しください")
+            return body
+
+        backend.update(PORTFOLIOS_KEY, _apply)
+        _bump_revision(backend)
+        return stats
+
+    path = _get_path(file_path)
+    tmp = path.with_suffix(path.suffix + ".import.tmp")
+    with _file_lock(path):
+        existing = [] if replace else load_portfolios(file_path)
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                _write_document(f, existing, records, stats)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(path)
+        except BaseException:
+            if tmp.exists():
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+            raise
+    return stats
+
+
+def import_portfolios_ndjson(src: IO[str], file_path: Path | str | None = None, replace: bool = False) -> dict:
+    """
+    export_portfolios_ndjson 形式の NDJSON を取り込む。
+
+    Args:
+        replace: True なら保存内容をインポート内容で置き換える（バックアップからの復元用）。
+            False なら既存のポートフォリオの後ろに追加する（ID が重複する場合は新しい ID を振る）。
+
+    Returns:
+        {"portfolios": 取り込んだポートフォリオ数, "entries": 銘柄数, "duplicates": 重複で除いた銘柄数}
+    """
+    return _commit_records(_records_from_ndjson(src), file_path, replace)
+
+
+def import_portfolios_csv(src: IO[str], file_path: Path | str | None = None, replace: bool = False) -> dict:
+    """export_portfolios_csv 形式の CSV を取り込む。引数・戻り値は import_portfolios_ndjson と同じ。"""
+    return _commit_records(_records_from_csv(src), file_path, replace)
+
+
+def import_broker_watchlist_csv(src: IO[str], portfolio_name: str, file_path: Path | str | None = None) -> dict:
+    """証券会社のウォッチリストCSV（銘柄コード・銘柄名の列を含むもの）を、新しいポートフォリオとして取り込む。"""
+    if not portfolio_name or not portfolio_name.strip():
+        raise PortfolioImportError("ポートフォリオ名を入力してください")
+    return _commit_records(_records_from_broker_csv(src, portfolio_name.strip()), file_path, replace=False)
+
+
+def open_text_upload(data: IO[bytes]) -> IO[str]:
+    """アップロードされたバイト列を、先頭から文字コード（UTF-8 / Shift_JIS）を判定してテキストとして読めるようにする。"""
+    head = data.read(64 * 1024)
+    data.seek(0)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # 先頭ブロックの末尾で多バイト文字が切れただけなら UTF-8 とみなす
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp932"
+    return io.TextIOWrapper(data, encoding=encoding, newline="")
@@ -0,0 +1,71 @@
+"""
+ランキング表の表示用ヘルパー（ページング・行ラベル・検索）。
+全件を Streamlit に渡さず、表示中のページ分だけを組み立てる。
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+LABEL_NAME_MAX = 35
+
+
+def _name_column(df: pd.DataFrame):
+    """「名称・コード・市場」系の列名を返す。なければ None。"""
+    for c in df.columns:
+        if "名称" in str(c) and "コード" in str(c):
+            return c
+    return None
+
+
+def page_count(n_rows: int, page_size: int) -> int:
+    """総行数とページサイズからページ数を返す（0件でも1ページ）。"""
+    if page_size < 1:
+        return 1
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def get_page(df: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    """1始まりの page 番目のスライスを返す。範囲外のページは末尾に丸める。"""
+    n_pages = page_count(len(df), page_size)
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def build_row_labels(df: pd.DataFrame) -> dict:
+    """行インデックス → 「順位 - 名称」ラベルの対応表を返す。渡した行（通常は表示中のページ）分だけ作る。"""
+    if df.empty:
+        return {}
+    ranks = df["順位"].astype(str) if "順位" in df.columns else pd.Series("", index=df.index)
+    name_col = _name_column(df)
+    names = df[name_col].astype(str).str.slice(0, LABEL_NAME_MAX) if name_col is not None else pd.Series("", index=df.index)
+    return dict(zip(df.index, ranks + " - " + names))
+
+
+def find_rank_page(df: pd.DataFrame, rank: int, page_size: int) -> int | None:
+    """順位 rank の行が何ページ目にあるかを返す。見つからなければ None。"""
+    if "順位" not in df.columns or df.empty:
+        return None
+    hits = (df["順位"].astype(str).str.strip() == str(int(rank))).to_numpy().nonzero()[0]
+    if len(hits) == 0:
+        return None
+    return int(hits[0]) // page_size + 1
+
+
+def search_rows(df: pd.DataFrame, query: str, matcher=None) -> pd.DataFrame:
+    """
+    名称・コード・市場の部分一致で行を絞り込む（大文字小文字は区別しない）。
+    matcher（query → 一致した行ラベルの配列。例: RankingSearch.positions）を渡すと列を走査せず索引で引く。
+    """
+    q = (query or "").strip()
+    if not q or df.empty:
+        return df
+    if matcher is not None:
+        return df[np.isin(df.index.to_numpy(), matcher(q))]
+    name_col = _name_column(df)
+    if name_col is None:
+        return df
+    mask = df[name_col].astype(str).str.contains(q, case=False, regex=False)
+    return df[mask]
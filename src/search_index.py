@@ -0,0 +1,180 @@
+"""
+名称・コード検索用の n-gram 転置索引。
+1文字・2文字の n-gram → 文書ID の索引から候補を絞り、最後に部分一致を確かめる。
+文書の追加・変更・削除は差分だけを索引に反映する。
+"""
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# カタカナ → ひらがな（「とよた」でも「トヨタ」でも当たるようにする）
+_KATA_TO_HIRA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def normalize_search_text(text: str) -> str:
+    """検索用の正規化（NFKC・小文字・カタカナ→ひらがな・空白の圧縮）。"""
+    s = unicodedata.normalize("NFKC", str(text or "")).lower().translate(_KATA_TO_HIRA)
+    return " ".join(s.split())
+
+
+def _grams(text: str) -> set[str]:
+    """text に含まれる1文字・2文字の n-gram。"""
+    out = set(text)
+    out.update(text[i:i + 2] for i in range(len(text) - 1))
+    return out
+
+
+class SearchIndex:
+    """文書ID → テキストの部分一致検索索引。スレッドセーフ。"""
+
+    def __init__(self):
+        self._docs: dict = {}
+        self._postings: dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _add_locked(self, doc_id, text: str) -> None:
+        self._docs[doc_id] = text
+        for g in _grams(text):
+            self._postings.setdefault(g, set()).add(doc_id)
+
+    def _remove_locked(self, doc_id) -> None:
+        text = self._docs.pop(doc_id, None)
+        if text is None:
+            return
+        for g in _grams(text):
+            posting = self._postings.get(g)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[g]
+
+    def update(self, docs: dict) -> int:
+        """文書を追加・更新する（テキストが変わったものだけ索引を張り替える）。反映した件数を返す。"""
+        changed = 0
+        with self._lock:
+            for doc_id, text in docs.items():
+                norm = normalize_search_text(text)
+                if self._docs.get(doc_id) == norm:
+                    continue
+                self._remove_locked(doc_id)
+                self._add_locked(doc_id, norm)
+                changed += 1
+        return changed
+
+    def remove(self, doc_ids) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+
+    def sync(self, docs: dict) -> int:
+        """索引の内容を docs と同じにする（docs にない文書は削除）。反映した件数を返す。"""
+        with self._lock:
+            stale = [d for d in self._docs if d not in docs]
+            for doc_id in stale:
+                self._remove_locked(doc_id)
+        return len(stale) + self.update(docs)
+
+    def search(self, query: str, limit: int | None = None) -> list:
+        """query を部分一致で含む文書IDの一覧（前方一致を先に）。"""
+        q = normalize_search_text(query)
+        if not q:
+            return []
+        with self._lock:
+            # 2文字以上の検索語は2文字 n-gram だけで候補を絞る（件数の少ない n-gram から積集合を取る）
+            query_grams = {q} if len(q) < 2 else {q[i:i + 2] for i in range(len(q) - 1)}
+            grams = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+            if not grams or grams[0] not in self._postings:
+                return []
+            candidates = set(self._postings[grams[0]])
+            for g in grams[1:]:
+                candidates &= self._postings.get(g, set())
+                if not candidates:
+                    return []
+            docs = self._docs
+            if len(q) <= 2:
+                # 検索語そのものが n-gram なので候補はすべて一致
+                hits = candidates
+            else:
+                hits = [d for d in candidates if q in docs[d]]
+            prefix, rest = [], []
+            for d in hits:
+                (prefix if docs[d].startswith(q) else rest).append(d)
+        out = prefix + rest
+        return out[:limit] if limit is not None else out
+
+
+# ランキング行用: 銘柄（symbol、なければ名称セル）→ 「名称・コード・市場 + コード」の索引。
+# 索引はデータセットごとに作り、レジストリの派生物（DatasetRegistry.derived）としてデータセットと一緒に破棄する。
+
+
+def _row_keys(df: pd.DataFrame, name_col) -> pd.Series:
+    """索引キー（symbol + 名称セル）。名称が変わった銘柄は別の文書として追加される。"""
+    names = df[name_col].astype(str) if name_col is not None else pd.Series("", index=df.index)
+    symbols = df["symbol"].astype(str).str.strip() if "symbol" in df.columns else pd.Series("", index=df.index)
+    return symbols + "\x1f" + names
+
+
+class RankingSearch:
+    """1つのデータセットの行の銘柄索引（索引キー → 行位置）。データセットにない銘柄は索引に入らない。"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.index = SearchIndex()
+        name_col = next((c for c in df.columns if "名称" in str(c) and "コード" in str(c)), None)
+        keys = _row_keys(df, name_col)
+        # 文書テキスト: 名称・コード・市場 + 銘柄コード（'.T' を除く）
+        texts = keys.str.split("\x1f", n=1).str[1] + " " + keys.str.split("\x1f", n=1).str[0].str.replace(r"\.T$", "", regex=True)
+        self.index.update(dict(zip(keys, texts)))
+        self._row_group, uniques = pd.factorize(keys)
+        self._group_of = {key: i for i, key in enumerate(uniques)}
+
+    def positions(self, query: str) -> np.ndarray:
+        """query に一致する行位置（昇順）。"""
+        groups = [self._group_of[k] for k in self.index.search(query) if k in self._group_of]
+        if not groups:
+            return np.empty(0, dtype=np.int64)
+        hit = np.zeros(len(self._group_of), dtype=bool)
+        hit[groups] = True
+        return np.flatnonzero(hit[self._row_group])
+
+
+# My Portfolio 用: ポートフォリオ名と登録銘柄の表示名の索引
+_portfolio_index = SearchIndex()
+_portfolio_index_revision = None
+
+
+def sync_portfolio_index(portfolios: list[dict], revision=None) -> SearchIndex:
+    """
+    ポートフォリオ一覧と索引を同期する（変わった名前・銘柄だけを張り替える）。
+    revision（portfolios_revision の値）を渡すと、前回の同期と同じ版なら一覧を見ずにそのまま使う。
+    """
+    global _portfolio_index_revision
+    if revision is not None and revision == _portfolio_index_revision:
+        return _portfolio_index
+    docs = {}
+    for p in portfolios:
+        pid = p.get("id")
+        docs[("p", pid, "")] = p.get("name", "")
+        for entry in p.get("symbols") or []:
+            docs[("e", pid, entry)] = entry.replace("|", " ")
+    _portfolio_index.sync(docs)
+    _portfolio_index_revision = revision
+    return _portfolio_index
+
+
+def search_portfolios(portfolios: list[dict], query: str, revision=None) -> list[tuple[dict, list[str]]]:
+    """query に名前または登録銘柄が一致するポートフォリオと、一致した銘柄の一覧を返す。"""
+    index = sync_portfolio_index(portfolios, revision)
+    by_id = {p.get("id"): p for p in portfolios}
+    matched: dict[str, list[str]] = {}
+    for kind, pid, entry in index.search(query):
+        if pid not in by_id:
+            continue
+        entries = matched.setdefault(pid, [])
+        if kind == "e":
+            entries.append(entry)
+    return [(by_id[pid], entries) for pid, entries in matched.items()]
@@ -0,0 +1,126 @@
+"""
+ランキングの並び替え用索引。
+数値列（順位・1株配当・取引値・配当利回り）は数値として、名称は読み（ひらがな）で比較するキーを
+データセットごとに1回だけ作り、昇順・降順の並び（行位置の配列）を使い回す。
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from main import parse_numeric_series
+
+NUMERIC_SORT_COLUMNS = ("順位", "1株配当", "取引値", "配当利回り")
+# 「名称・コード・市場」セルの銘柄コード以降（例: 'トヨタ自動車(株) 7203 東証PRM' → ' 7203 東証PRM'）
+_CODE_TAIL = re.compile(r"\s+[0-9][0-9A-Z]{3}\b.*$")
+# カタカナ → ひらがな
+_KATA_TO_HIRA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+_kakasi = None
+# 名称 → 読みキー（データセットが更新されても銘柄名はほぼ同じなので使い回す）
+_reading_cache: dict[str, str] = {}
+_READING_CACHE_MAX = 50000
+
+
+def _get_kakasi():
+    """pykakasi があれば漢字の読みに使う（なければ None）。"""
+    global _kakasi
+    if _kakasi is None:
+        try:
+            import pykakasi
+
+            _kakasi = pykakasi.kakasi()
+        except ImportError:
+            _kakasi = False
+    return _kakasi or None
+
+
+def name_from_cell(cell: str) -> str:
+    """「名称・コード・市場」セルから名称部分だけを返す。"""
+    return _CODE_TAIL.sub("", str(cell or "")).strip()
+
+
+def kana_reading_key(name: str) -> str:
+    """
+    名称の並び替えキー（あいうえお順）。全角英数は半角・小文字、カタカナはひらがなにそろえ、
+    pykakasi が使える場合は漢字も読み（ひらがな）に変換する。
+    """
+    name = str(name or "")
+    cached = _reading_cache.get(name)
+    if cached is not None:
+        return cached
+    s = unicodedata.normalize("NFKC", name).lower()
+    kks = _get_kakasi()
+    if kks is not None:
+        s = "".join(part["hira"] for part in kks.convert(s))
+    s = s.translate(_KATA_TO_HIRA)
+    if len(_reading_cache) >= _READING_CACHE_MAX:
+        _reading_cache.clear()
+    _reading_cache[name] = s
+    return s
+
+
+def _numeric_column(df: pd.DataFrame, key: str):
+    return next((c for c in df.columns if str(c) == key), None) or next((c for c in df.columns if key in str(c)), None)
+
+
+def _name_column(df: pd.DataFrame):
+    return next((c for c in df.columns if "名称" in str(c) and "コード" in str(c)), None)
+
+
+class SortIndex:
+    """1つのデータセット（行の並びを変えない前提）に対する並び替え索引。"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self._df = df
+        self._columns: dict[str, object] = {}
+        for key in NUMERIC_SORT_COLUMNS:
+            col = _numeric_column(df, key)
+            if col is not None:
+                self._columns[str(col)] = ("numeric", col)
+        name_col = _name_column(df)
+        if name_col is not None:
+            self._columns[str(name_col)] = ("name", name_col)
+        self._keys: dict[str, np.ndarray] = {}
+        self._perms: dict[tuple[str, bool], np.ndarray] = {}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "SortIndex":
+        return cls(df)
+
+    def supports(self, column: str) -> bool:
+        return str(column) in self._columns
+
+    def _dense_rank(self, column: str) -> np.ndarray:
+        """列の並び替えキーを、値の小さい順に 0,1,2,... とした順位（欠損は -1）にして返す。"""
+        rank = self._keys.get(column)
+        if rank is not None:
+            return rank
+        kind, col = self._columns[column]
+        if kind == "numeric":
+            values = parse_numeric_series(self._df[col])
+        else:
+            values = self._df[col].astype(str).map(name_from_cell).map(kana_reading_key).replace("", np.nan)
+        codes, _ = pd.factorize(values, sort=True, use_na_sentinel=True)
+        self._keys[column] = rank = codes.astype(np.int64)
+        return rank
+
+    def permutation(self, column: str, ascending: bool = True) -> np.ndarray:
+        """全行を column で並べた行位置の配列（同値は元の順、欠損は末尾）。列ごと・向きごとに1回だけ作る。"""
+        key = (str(column), bool(ascending))
+        perm = self._perms.get(key)
+        if perm is not None:
+            return perm
+        rank = self._dense_rank(str(column))
+        valid = np.flatnonzero(rank >= 0)
+        order = np.argsort(rank[valid] if ascending else -rank[valid], kind="stable")
+        perm = np.concatenate([valid[order], np.flatnonzero(rank < 0)])
+        self._perms[key] = perm
+        return perm
+
+    def order(self, mask: np.ndarray, column: str, ascending: bool = True) -> np.ndarray:
+        """絞り込み済みの行マスクを、並べ替え済みの行位置の配列にする（再ソートはしない）。"""
+        perm = self.permutation(column, ascending)
+        return perm[mask[perm]]
@@ -0,0 +1,243 @@
+"""
+複数のアプリ（レプリカ）で共有する状態の保存先。
+環境変数 STATE_BACKEND_URL で選ぶ（未設定なら共有しない = 従来どおり JSON ファイルとプロセス内キャッシュ）。
+
+    sqlite:////data/state.db   … 共有ボリューム上の SQLite ファイル（WAL）
+    redis://localhost:6379/0   … Redis（任意の依存: redis パッケージが必要。requirements.txt の注記を参照）
+    memory://                  … プロセス内（動作確認用）
+
+値はすべてバイト列。読み書きの単位はキーごとで、update() はキー1つの読み取り→書き込みを不可分に行う。
+"""
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+STATE_BACKEND_ENV = "STATE_BACKEND_URL"
+SQLITE_TIMEOUT = 30.0
+SQLITE_IN_CHUNK = 500  # get_many で1回の IN (...) に渡すキー数（SQLite の変数の上限より小さく）
+REDIS_UPDATE_RETRIES = 50
+
+
+class StateBackend(ABC):
+    """共有状態の保存先の共通インターフェース（get / set / delete / update を実装しないサブクラスは作れない）。"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        """key の値（なければ・期限切れなら None）。"""
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        """keys の値をまとめて返す（順序は keys と同じ）。"""
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        """key に value を書き込む（ttl 秒後に期限切れ。None なら無期限）。"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """key を削除する（なければ何もしない）。"""
+
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[bytes | None], bytes | None], ttl: float | None = None) -> bytes | None:
+        """
+        key の現在値を fn に渡し、戻り値で置き換える（他のプロセスの update と重ならない）。
+        fn が None を返したら書き込まない。書き込み後（または変更なしの場合は現在）の値を返す。
+        """
+
+
+class LocalBackend(StateBackend):
+    """プロセス内の辞書（1レプリカ・動作確認用）。"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._get_locked(key)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def update(self, key, fn, ttl=None):
+        with self._lock:
+            old = self._get_locked(key)
+            new = fn(old)
+            if new is None:
+                return old
+            self._data[key] = (new, time.time() + ttl if ttl else None)
+            return new
+
+
+class SQLiteBackend(StateBackend):
+    """
+    共有ファイル上の SQLite。update は BEGIN IMMEDIATE（書き込みロックを先に取る）で読み取り→書き込みを直列化する。
+    ネットワークファイルシステム（NFS 等）ではロックが効かないことがあるため、同じホストのボリュームで使うこと。
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 接続はスレッドごとに1本（sqlite3 の接続はスレッド間で共有しない）
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> bytes | None:
+        row = conn.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return bytes(row[0])
+
+    def _put(self, conn: sqlite3.Connection, key: str, value: bytes, ttl: float | None) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(value), time.time() + ttl if ttl else None),
+        )
+
+    def get(self, key: str) -> bytes | None:
+        return self._get(self._connect(), key)
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        conn = self._connect()
+        now = time.time()
+        found: dict[str, bytes] = {}
+        for i in range(0, len(keys), SQLITE_IN_CHUNK):
+            chunk = keys[i:i + SQLITE_IN_CHUNK]
+            rows = conn.execute(
+                f"SELECT key, value, expires FROM kv WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, value, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = bytes(value)
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        self._put(self._connect(), key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def update(self, key, fn, ttl=None):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = self._get(conn, key)
+            new = fn(old)
+            if new is not None:
+                self._put(conn, key, new, ttl)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return old if new is None else new
+
+    def purge_expired(self) -> int:
+        """期限切れの値を削除し、件数を返す。"""
+        return self._connect().execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)).rowcount
+
+
+class RedisBackend(StateBackend):
+    """Redis（RESP を話すサーバーなら可）。update は WATCH / MULTI の楽観ロックで再試行する。"""
+
+    def __init__(self, url: str, prefix: str = "hdh:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                f"{STATE_BACKEND_ENV} に Redis を使うには任意の依存パッケージ redis が必要です（pip install 'redis>=4.2'）"
+            ) from e
+        self._redis = redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self._k(key))
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return self.client.mget([self._k(key) for key in keys]) if keys else []
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        self.client.set(self._k(key), value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self._k(key))
+
+    def update(self, key, fn, ttl=None):
+        k = self._k(key)
+        with self.client.pipeline() as pipe:
+            for _ in range(REDIS_UPDATE_RETRIES):
+                try:
+                    pipe.watch(k)
+                    old = pipe.get(k)
+                    new = fn(old)
+                    if new is None:
+                        pipe.unwatch()
+                        return old
+                    pipe.multi()
+                    pipe.set(k, new, px=int(ttl * 1000) if ttl else None)
+                    pipe.execute()
+                    return new
+                except self._redis.WatchError:
+                    continue
+        raise RuntimeError(f"Redis の更新が競合し続けました: {key}")
+
+
+def open_backend(url: str) -> StateBackend:
+    """URL から保存先を作る。"""
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("memory://"):
+        return LocalBackend()
+    raise ValueError(f"未対応の {STATE_BACKEND_ENV}: {url}")
+
+
+_backend: StateBackend | None = None
+_backend_url: str | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StateBackend | None:
+    """STATE_BACKEND_URL の保存先（プロセス内で1つ）。未設定なら None。"""
+    global _backend, _backend_url
+    url = os.environ.get(STATE_BACKEND_ENV, "").strip()
+    if not url:
+        return None
+    with _backend_lock:
+        if _backend is None or _backend_url != url:
+            _backend = open_backend(url)
+            _backend_url = url
+        return _backend